@@ -1,7 +1,18 @@
-from flask import Flask
+import time
+
+from flask import Flask, g, request
 from flask_cors import CORS
 
+from app.utils.log import end_request_id, setup_logging, start_request_id
+from app.utils.metrics import IN_FLIGHT, REQUEST_LATENCY
+from app.utils.profiler import init_profiler
+from app.utils.resilience import BATCH_DEADLINE_SEC, REQUEST_DEADLINE_SEC, start_deadline, end_deadline
+
+# endpoints that get the longer batch deadline
+_BATCH_ENDPOINTS = {"main.analyze_batch_route", "main.compare_multi"}
+
 def create_app():
+    setup_logging()
     app = Flask(__name__)
     CORS(app, resources={r"/*": {"origins": "http://localhost:5173"}})
 
@@ -9,4 +20,57 @@ def create_app():
     from app.routes import main_bp
     app.register_blueprint(main_bp)
 
+    # Request id carried by every log line of the request (X-Request-ID in and out)
+    @app.before_request
+    def _start_request_id():
+        g.request_id, g._request_id_token = start_request_id(request.headers.get("X-Request-ID"))
+
+    @app.after_request
+    def _echo_request_id(response):
+        if "request_id" in g:
+            response.headers["X-Request-ID"] = g.request_id
+        return response
+
+    @app.teardown_request
+    def _end_request_id(exc):
+        token = g.pop("_request_id_token", None)
+        if token is not None:
+            end_request_id(token)
+
+    # Request-level metrics (see /metrics)
+    @app.before_request
+    def _start_request_metrics():
+        g._request_started = time.perf_counter()
+        IN_FLIGHT.inc()
+
+    @app.teardown_request
+    def _finish_request_metrics(exc):
+        started = g.pop("_request_started", None)
+        if started is not None:
+            IN_FLIGHT.dec()
+            REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint=request.endpoint or "unknown")
+
+    # Request deadline shared by every stage; clients may ask for a shorter one
+    @app.before_request
+    def _start_request_deadline():
+        seconds = BATCH_DEADLINE_SEC if request.endpoint in _BATCH_ENDPOINTS else REQUEST_DEADLINE_SEC
+        requested = request.headers.get("X-Request-Deadline", type=float)
+        if requested and requested > 0:
+            seconds = min(seconds, requested)
+        g._deadline_token = start_deadline(seconds)
+
+    @app.teardown_request
+    def _end_request_deadline(exc):
+        token = g.pop("_deadline_token", None)
+        if token is not None:
+            end_deadline(token)
+
+    # Opt-in per-request sampling profiler (PROFILE_ENABLED)
+    init_profiler(app)
+
+    # Opt-in off-peak refresh of watched places into the result cache
+    from app.services.watchlist import WATCHLIST_ENABLED, start_scheduler
+    if WATCHLIST_ENABLED:
+        start_scheduler()
+
     return app
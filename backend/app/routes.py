@@ -1,64 +1,99 @@
-from flask import Blueprint, jsonify, request
-from app.services.sentiment import analyze_sentiment
-from app.services.reviews import fetch_google_reviews, fetch_tripadvisor_reviews
-from app.services.sentiment_by_aspect import aspect_based_sentiment_analysis
-from app.services.bar_chart import generate_aspect_summary
-from app.services.recommendations import post_to_rapidapi, post_comparison_to_rapidapi
-from app.services.analytics import generate_word_cloud, frequent_phrases_analysis
-from app.utils.helpers import combine_reviews
-from app.services.emotions import detect_emotions, post_emotions_to_chatgpt
+import math
+
+from flask import Blueprint, Response, jsonify, request
+from app.services.pipeline import (
+    MAX_BATCH_LOCATIONS, MAX_COMPARE_LOCATIONS, SENTIMENT_DETAIL_LIMIT, PlaceNotFound, fetch_place, fetch_places,
+    analysis_job, analyze_batch, detail_page, compare_places, compare_many,
+)
+from app.services.result_cache import cache_key, cached_result, review_fingerprint
+from app.services.ingestion import ingest_reviews, restaurant_summary
+from app.services.trends import restaurant_trends
+from app.services.trending import areas, trending
+from app.services.watchlist import (
+    add_places, remove_place, record_request, trigger_refresh, watchlist_status,
+)
+from app.services.embeddings import SIMILAR_NPROBE, IndexNotBuilt, similar_reviews
+from app.services.reviews import fetch_google_reviews
+from app.utils.metrics import render_prometheus
+from app.utils.resilience import DeadlineExceeded, UpstreamUnavailable
 
 main_bp = Blueprint('main', __name__)
 
+def _bypass_cache(data):
+    return bool(data.get('bypass_cache')) or 'no-cache' in request.headers.get('Cache-Control', '')
+
+def _valid_dedup_threshold(value):
+    return value is None or (isinstance(value, (int, float)) and not isinstance(value, bool) and 0 < value <= 1)
+
+def _unavailable(e):
+    if isinstance(e, DeadlineExceeded):
+        return jsonify({"error": f"Request deadline exceeded: {e}", "degraded": True}), 503
+    return jsonify({"error": f"Google Places unavailable: {e}", "degraded": True}), 503
+
+def _cached_response(result, status):
+    response = jsonify(result)
+    response.headers['X-Cache'] = status
+    return response
+
 @main_bp.route('/analyze', methods=['POST'])
 def analyze():
     data = request.json
     location_id = data.get('location_id')
     if not location_id:
         return jsonify({"error": "location_id is required"}), 400
+    # detailed_sentiments is paginated per source (detail_limit 0 omits it);
+    # every page is sliced from the same cached analysis
+    detail_offset = data.get('detail_offset', 0)
+    detail_limit = data.get('detail_limit', SENTIMENT_DETAIL_LIMIT)
+    if not all(isinstance(v, int) and v >= 0 for v in (detail_offset, detail_limit)):
+        return jsonify({"error": "detail_offset and detail_limit must be non-negative integers"}), 400
+    if not _valid_dedup_threshold(data.get('dedup_threshold')):
+        return jsonify({"error": "dedup_threshold must be a number in (0, 1]"}), 400
+    # area only labels the reviews for /trending, so it is not part of the cache key
+    area = data.get('area')
+    if area is not None and not (isinstance(area, str) and area):
+        return jsonify({"error": "area must be a non-empty string"}), 400
+
+    record_request(location_id)
+    fetch, analyze_fetched = analysis_job(location_id, data.get('dedup_threshold'), area=area)
 
-    location_name, google_reviews = fetch_google_reviews(location_id)
-    if not google_reviews:
+    try:
+        result, status = cached_result(
+            cache_key("analyze", location_id, data.get('dedup_threshold')),
+            fetch, analyze_fetched, bypass=_bypass_cache(data))
+    except PlaceNotFound:
         return jsonify({"error": "No reviews found for the given location ID"}), 404
+    except UpstreamUnavailable as e:
+        return _unavailable(e)
 
-    # Clean reviews
-    google_reviews = [str(review) if review is not None else "" for review in google_reviews]
-    tripadvisor_reviews = fetch_tripadvisor_reviews(location_name)
-
-    google_sentiment = analyze_sentiment(google_reviews)
-    overall_sentiment = google_sentiment['average_sentiment']
-    if tripadvisor_reviews:
-        tripadvisor_sentiment = analyze_sentiment(tripadvisor_reviews)
-        overall_sentiment = (google_sentiment['average_sentiment'] + tripadvisor_sentiment['average_sentiment']) / 2
-    else:
-        tripadvisor_sentiment = {"average_sentiment": 0, "detailed_sentiments": []}
-        overall_sentiment = google_sentiment['average_sentiment']
-    
-    all_reviews = combine_reviews(tripadvisor_reviews, google_reviews)
-
-    emotions = detect_emotions(all_reviews)
-    recommendations = post_to_rapidapi(google_reviews)
-    word_cloud = generate_word_cloud(all_reviews)
-    aspect_results = aspect_based_sentiment_analysis(all_reviews)
-    summary_ascepct = generate_aspect_summary(aspect_results)
-    aspect_word_cloud_base64 = generate_word_cloud(aspect_results)
-    what_emotions_says = post_emotions_to_chatgpt(emotions)
+    return _cached_response(detail_page(result, detail_offset, detail_limit), status)
 
+@main_bp.route('/analyze/batch', methods=['POST'])
+def analyze_batch_route():
+    data = request.json or {}
+    location_ids = data.get('location_ids')
+    if not isinstance(location_ids, list) or not location_ids \
+            or not all(isinstance(i, str) and i for i in location_ids):
+        return jsonify({"error": "location_ids must be a non-empty list of non-empty strings"}), 400
+    if len(location_ids) > MAX_BATCH_LOCATIONS:
+        return jsonify({"error": f"At most {MAX_BATCH_LOCATIONS} location_ids per batch"}), 400
+    if not _valid_dedup_threshold(data.get('dedup_threshold')):
+        return jsonify({"error": "dedup_threshold must be a number in (0, 1]"}), 400
+    area = data.get('area')
+    if area is not None and not (isinstance(area, str) and area):
+        return jsonify({"error": "area must be a non-empty string"}), 400
+
+    results = analyze_batch(
+        location_ids,
+        dedup_threshold=data.get('dedup_threshold'),
+        include_llm=bool(data.get('include_llm', False)),
+        include_word_clouds=bool(data.get('include_word_clouds', False)),
+        area=area,
+    )
     return jsonify({
-        "aspect_analysis": {
-            "summary": aspect_results,
-            "summary_ascepct": summary_ascepct,
-            "word_cloud": aspect_word_cloud_base64
-        },
-        "location_name": location_name,
-        "google_sentiment": google_sentiment,
-        "tripadvisor_sentiment": tripadvisor_sentiment,
-        "overall_sentiment": overall_sentiment,
-        "word_cloud": word_cloud,
-        "recommendations": recommendations,
-        "frequent_phrases_analysis": frequent_phrases_analysis(all_reviews),
-        "emotions": emotions,
-        "what_emotions_says": what_emotions_says,
+        "results": results,
+        "succeeded": sum(1 for r in results.values() if "error" not in r),
+        "failed": sum(1 for r in results.values() if "error" in r),
     })
 
 @main_bp.route('/compare', methods=['POST'])
@@ -66,65 +101,189 @@ def compare():
     data = request.json
     location_id1 = data.get('location_id1')
     location_id2 = data.get('location_id2')
-    print(location_id1, location_id2)
     if not location_id1 or not location_id2:
         return jsonify({"error": "Both location_id1 and location_id2 are required"}), 400
+    if not _valid_dedup_threshold(data.get('dedup_threshold')):
+        return jsonify({"error": "dedup_threshold must be a number in (0, 1]"}), 400
 
-    
-    location_name1, google_reviews1 = fetch_google_reviews(location_id1)
-    if not google_reviews1:
-        return jsonify({"error": f"No reviews found for location_id1: {location_id1}"}), 404
+    def fetch():
+        places = []
+        for field, location_id in (("location_id1", location_id1), ("location_id2", location_id2)):
+            try:
+                places.append(fetch_place(location_id, data.get('dedup_threshold')))
+            except PlaceNotFound:
+                raise PlaceNotFound(f"No reviews found for {field}: {location_id}")
+        return places, review_fingerprint(places[0]["all_reviews"], places[1]["all_reviews"])
 
-    tripadvisor_reviews1 = fetch_tripadvisor_reviews(location_name1)
-    all_reviews1 = combine_reviews(tripadvisor_reviews1, google_reviews1)
+    try:
+        result, status = cached_result(
+            cache_key("compare", location_id1, location_id2, data.get('dedup_threshold')),
+            fetch, lambda places: compare_places(*places), bypass=_bypass_cache(data))
+    except PlaceNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except UpstreamUnavailable as e:
+        return _unavailable(e)
 
-    
-    location_name2, google_reviews2 = fetch_google_reviews(location_id2)
-    if not google_reviews2:
-        return jsonify({"error": f"No reviews found for location_id2: {location_id2}"}), 404
+    return _cached_response(result, status)
 
-    tripadvisor_reviews2 = fetch_tripadvisor_reviews(location_name2)
-    all_reviews2 = combine_reviews(tripadvisor_reviews2, google_reviews2)
+@main_bp.route('/compare/multi', methods=['POST'])
+def compare_multi():
+    data = request.json or {}
+    location_ids = data.get('location_ids')
+    if not isinstance(location_ids, list) or not all(isinstance(i, str) and i for i in location_ids) \
+            or len(set(location_ids)) < 2:
+        return jsonify({"error": "location_ids must list at least two distinct non-empty strings"}), 400
+    location_ids = list(dict.fromkeys(location_ids))
+    if len(location_ids) > MAX_COMPARE_LOCATIONS:
+        return jsonify({"error": f"At most {MAX_COMPARE_LOCATIONS} location_ids per comparison"}), 400
+    top_aspects = data.get('top_aspects', 10)
+    if not isinstance(top_aspects, int) or top_aspects < 1:
+        return jsonify({"error": "top_aspects must be a positive integer"}), 400
+    if not _valid_dedup_threshold(data.get('dedup_threshold')):
+        return jsonify({"error": "dedup_threshold must be a number in (0, 1]"}), 400
+    include_llm = bool(data.get('include_llm', True))
 
-    
-    comparison_result = post_comparison_to_rapidapi(
-        reviews1=all_reviews1,
-        reviews2=all_reviews2,
-        location_name1=location_name1,
-        location_name2=location_name2
-    )
+    def fetch():
+        places, errors, upstream_down = [], {}, False
+        for location_id, place in zip(location_ids, fetch_places(location_ids, data.get('dedup_threshold'))):
+            if isinstance(place, Exception):
+                errors[location_id] = str(place)
+                upstream_down = upstream_down or isinstance(place, UpstreamUnavailable)
+            else:
+                places.append(place)
+        if len(places) < 2:
+            # a timeout or open breaker says nothing about whether the places have reviews
+            if upstream_down:
+                raise UpstreamUnavailable(f"fewer than two locations could be fetched: {errors}")
+            raise PlaceNotFound(f"Fewer than two locations had reviews: {errors}")
+        return (places, errors), review_fingerprint(*(place["all_reviews"] for place in places))
+
+    def analyze_fetched(fetched):
+        places, errors = fetched
+        result = compare_many(places, top_aspects=top_aspects, include_llm=include_llm)
+        result["errors"] = errors
+        return result
+
+    try:
+        result, status = cached_result(
+            cache_key("compare_multi", tuple(location_ids), data.get('dedup_threshold'), top_aspects, include_llm),
+            fetch, analyze_fetched, bypass=_bypass_cache(data))
+    except PlaceNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except UpstreamUnavailable as e:
+        return _unavailable(e)
+
+    return _cached_response(result, status)
+
+@main_bp.route('/ingest', methods=['POST'])
+def ingest():
+    data = request.json or {}
+    rows = data.get('reviews')
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"error": "reviews must be a non-empty list"}), 400
+    try:
+        result = ingest_reviews(rows)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+@main_bp.route('/restaurants/<path:restaurant>/summary', methods=['GET'])
+def restaurant_summary_route(restaurant):
+    summary = restaurant_summary(restaurant, top_n=request.args.get('top_n', 5, type=int))
+    if summary is None:
+        return jsonify({"error": f"No ingested reviews for restaurant: {restaurant}"}), 404
+    return jsonify(summary)
+
+@main_bp.route('/restaurants/<path:restaurant>/trends', methods=['GET'])
+def restaurant_trends_route(restaurant):
+    top_aspects = request.args.get('top_aspects', '5')
+    if not top_aspects.isdecimal():
+        return jsonify({"error": "top_aspects must be a non-negative integer"}), 400
+    try:
+        trends = restaurant_trends(
+            restaurant,
+            granularity=request.args.get('granularity', 'month'),
+            window=max(1, request.args.get('window', 3, type=int)),
+            top_aspects=int(top_aspects),
+            since=request.args.get('since'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if trends is None:
+        return jsonify({"error": f"No dated, ingested reviews for restaurant: {restaurant}"}), 404
+    return jsonify(trends)
+
+@main_bp.route('/trending', methods=['GET'])
+def trending_route():
+    hours = request.args.get('hours', 24, type=float)
+    top_n = request.args.get('top_n', 10, type=int)
+    if hours is None or not math.isfinite(hours) or hours <= 0 or top_n is None or not 1 <= top_n <= 100:
+        return jsonify({"error": "hours must be a positive number and top_n between 1 and 100"}), 400
+    area = request.args.get('area') or None
+    result = trending(area=area, hours=hours, top_n=top_n)
+    if result is None:
+        return jsonify({"error": f"No analysed reviews for area: {area}"}), 404
+    result["areas"] = areas()
+    return jsonify(result)
+
+@main_bp.route('/similar', methods=['POST'])
+def similar():
+    data = request.json or {}
+    query = (data.get('query') or '').strip()
+    if not query:
+        return jsonify({"error": "query is required"}), 400
+    k = data.get('k', 10)
+    if not isinstance(k, int) or not 1 <= k <= 100:
+        return jsonify({"error": "k must be an integer between 1 and 100"}), 400
+    # the upper bound (the index's nlist) is checked by search_corpus
+    nprobe = data.get('nprobe', SIMILAR_NPROBE)
+    if isinstance(nprobe, bool) or not isinstance(nprobe, int) or nprobe < 1:
+        return jsonify({"error": "nprobe must be a positive integer"}), 400
+
+    live_reviews = None
+    if data.get('location_id'):
+        try:
+            _, live_reviews = fetch_google_reviews(data['location_id'])
+        except UpstreamUnavailable as e:
+            return _unavailable(e)
+
+    try:
+        result = similar_reviews(
+            query, k=k, restaurant=data.get('restaurant'),
+            live_reviews=live_reviews,
+            live_fingerprint=review_fingerprint(live_reviews) if live_reviews else None,
+            nprobe=nprobe,
+        )
+    except IndexNotBuilt as e:
+        return jsonify({"error": str(e)}), 503
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+@main_bp.route('/watchlist', methods=['GET'])
+def watchlist_route():
+    return jsonify(watchlist_status())
+
+@main_bp.route('/watchlist', methods=['POST'])
+def watchlist_add():
+    data = request.json or {}
+    place_ids = data.get('place_ids')
+    if not isinstance(place_ids, list) or not place_ids or not all(isinstance(p, str) and p for p in place_ids):
+        return jsonify({"error": "place_ids must be a non-empty list of place ids"}), 400
+    return jsonify({"added": add_places(place_ids)})
+
+@main_bp.route('/watchlist/refresh', methods=['POST'])
+def watchlist_refresh():
+    if not trigger_refresh():
+        return jsonify({"error": "Watchlist scheduler is not running (set WATCHLIST_ENABLED)"}), 409
+    return jsonify({"scheduled": True}), 202
+
+@main_bp.route('/watchlist/<place_id>', methods=['DELETE'])
+def watchlist_remove(place_id):
+    if not remove_place(place_id):
+        return jsonify({"error": f"Not on the watchlist: {place_id}"}), 404
+    return jsonify({"removed": place_id})
 
-    
-    google_sentiment1 = analyze_sentiment(google_reviews1)
-    overall_sentiment1 = google_sentiment1['average_sentiment']
-    if tripadvisor_reviews1:
-        tripadvisor_sentiment1 = analyze_sentiment(tripadvisor_reviews1)
-        overall_sentiment1 = (google_sentiment1['average_sentiment'] + tripadvisor_sentiment1['average_sentiment']) / 2
-    emotions1 = detect_emotions(all_reviews1)
-    what_emotions_says1 = post_emotions_to_chatgpt(emotions1)
-
-    google_sentiment2 = analyze_sentiment(google_reviews2)
-    overall_sentiment2 = google_sentiment2['average_sentiment']
-    if tripadvisor_reviews2:
-        tripadvisor_sentiment2 = analyze_sentiment(tripadvisor_reviews2)
-        overall_sentiment2 = (google_sentiment2['average_sentiment'] + tripadvisor_sentiment2['average_sentiment']) / 2
-    emotions2 = detect_emotions(all_reviews2)
-    what_emotions_says2 = post_emotions_to_chatgpt(emotions2)
-
-    
-    comparison_result["location1"] = {
-        "name": location_name1,
-        "google_sentiment": google_sentiment1,
-        "overall_sentiment": overall_sentiment1,
-        "emotions": emotions1,
-        "what_emotions_says1": what_emotions_says1
-    }
-    comparison_result["location2"] = {
-        "name": location_name2,
-        "google_sentiment": google_sentiment2,
-        "overall_sentiment": overall_sentiment2,
-        "emotions": emotions2,
-        "what_emotions_says2": what_emotions_says2
-    }
-
-    return jsonify(comparison_result)
+@main_bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
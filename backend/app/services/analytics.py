@@ -1,17 +1,19 @@
 import io
 import os
-import re
 import base64
 from collections import Counter
 from pathlib import Path
 
-import numpy as np
 from wordcloud import WordCloud
-from sklearn.feature_extraction.text import CountVectorizer
 
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
+from app.services.phrases import top_phrases_from_terms, top_noun_chunks
+from app.services.term_matrix import build_term_matrix
+from app.utils.inference_profile import load_inference_profile
+from app.utils.metrics import BATCH_SIZE, TOKENS_PROCESSED, stage_timer, timed_stage
+
 # ---------------- DistilBERT loader (lazy singletons) ----------------
 _BERT_DIR = Path("models/bert_sentiment")
 _FALLBACK = "distilbert-base-uncased"   # only used if local fine-tuned model not found
@@ -24,6 +26,8 @@ _infer_device = torch.device("cpu") if _USE_CPU_INFERENCE else (
     else torch.device("mps") if torch.backends.mps.is_available()
     else torch.device("cpu")
 )
+_empty_mps_cache = _infer_device.type == "mps"
+_profile = load_inference_profile()     # same per-host settings as app.services.sentiment
 
 def _load_bert_once():
     global _tokenizer, _model
@@ -46,110 +50,97 @@ def _load_bert_once():
     os.environ["DISABLE_TQDM"] = "1"
     return _tokenizer, _model
 
-def _bert_predict_labels(texts, batch_size=16, max_len=256):
+@timed_stage("distilbert_phrases")
+def _bert_predict_labels(texts, batch_size=None, max_len=None):
     """
     Returns a list of string labels: 'pos' | 'neu' | 'neg'
     """
     tok, mdl = _load_bert_once()
     preds = []
-    try:
-        tok.model_max_length = max_len
-    except Exception:
-        pass
+    batch_size = batch_size or _profile["batch_size"]
+    max_len = max_len or _profile["max_len"]
+    grad_context = torch.inference_mode if _profile["inference_mode"] else torch.no_grad
 
     for i in range(0, len(texts), batch_size):
         chunk = [str(t) if t is not None else "" for t in texts[i:i+batch_size]]
-        enc = tok(chunk, truncation=True, padding=True, return_tensors='pt')
+        enc = tok(chunk, truncation=True, max_length=max_len, padding=True, return_tensors='pt')
         enc = {k: v.to(_infer_device) for k, v in enc.items()}
-        with torch.no_grad():
+        BATCH_SIZE.observe(len(chunk), model="phrases")
+        TOKENS_PROCESSED.inc(int(enc["input_ids"].numel()), model="phrases")
+        with grad_context():
             logits = mdl(**enc).logits
             ids = logits.argmax(dim=-1).cpu().numpy().tolist()
         preds.extend(ids)
         del enc, logits
-        if torch.backends.mps.is_available():
-            try:
-                torch.mps.empty_cache()
-            except Exception:
-                pass
+        if _empty_mps_cache:
+            torch.mps.empty_cache()
 
     id2label = {0: 'neg', 1: 'neu', 2: 'pos'}
     return [id2label[int(i)] for i in preds]
 
 # ---------------- Existing features ----------------
-def generate_word_cloud(reviews):
-    text = ' '.join(map(str, reviews))
-    wordcloud = WordCloud(width=800, height=400, background_color='white').generate(text)
+@timed_stage("word_cloud")
+def generate_word_cloud(reviews, terms=None):
+    """
+    Word cloud of reviews as a base64 PNG, drawn from the word counts of
+    their term matrix (built here unless `terms` is given).
+    """
+    if terms is None:
+        terms = build_term_matrix(reviews)
+    wordcloud = WordCloud(width=800, height=400, background_color='white')
+    frequencies = Counter({w: c for w, c in terms.word_counts().items() if w not in wordcloud.stopwords})
+    wordcloud.generate_from_frequencies(dict(frequencies.most_common(wordcloud.max_words)))
     img = io.BytesIO()
     wordcloud.to_image().save(img, format='PNG')
     img.seek(0)
     return base64.b64encode(img.getvalue()).decode('utf-8')
 
-def most_common_words(reviews, n=10):
-    text = ' '.join(map(str, reviews))
-    vectorizer = CountVectorizer(stop_words='english')
-    word_counts = vectorizer.fit_transform([text])
-    word_freq = zip(vectorizer.get_feature_names_out(), word_counts.toarray()[0])
-    sorted_words = sorted(word_freq, key=lambda x: x[1], reverse=True)[:n]
-    return [{"word": w, "count": int(c)} for w, c in sorted_words]
-
-def _clean_for_ngrams(s: str) -> str:
-    s = re.sub(r"http\S+", " ", s)
-    s = re.sub(r"[^A-Za-z0-9\s]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip().lower()
-    return s
-
-def _top_phrases_ngram(docs, top_n=5):
-    """
-    Fallback phrase extractor: top 1–2 gram phrases using CountVectorizer.
-    """
-    if not docs:
-        return []
-    vec = CountVectorizer(stop_words='english', ngram_range=(1,2), min_df=1, max_features=5000)
-    X = vec.fit_transform([_clean_for_ngrams(t) for t in docs])
-    sums = np.asarray(X.sum(axis=0)).ravel()
-    vocab = np.array(vec.get_feature_names_out())
-    order = np.argsort(-sums)[:top_n]
-    return [(vocab[i], int(sums[i])) for i in order]
-
-def frequent_phrases_analysis(reviews, top_n=5, use_spacy=False):
+def frequent_phrases_analysis(reviews, top_n=5, use_spacy=False, labels=None, terms=None):
     """
     Uses DistilBERT to split reviews into positive vs negative buckets,
     then extracts top phrases from each bucket.
 
+    Phrases are ranked by distinctiveness against the corpus-wide
+    background stats (see app.services.phrases), not by raw counts.
     If use_spacy=True and spaCy is installed with en_core_web_sm,
     we extract noun chunks; otherwise we fall back to 1–2 gram phrases.
+
+    Pass labels ('pos' | 'neu' | 'neg' per review) when sentiment has
+    already been predicted, to skip the DistilBERT pass here, and terms
+    (the reviews' TermMatrix) when it has already been built.
     """
     if not reviews:
         return {"top_compliments": [], "top_complaints": []}
 
-    labels = _bert_predict_labels(reviews)
-    pos_docs = [r for r, lab in zip(reviews, labels) if lab == 'pos']
-    neg_docs = [r for r, lab in zip(reviews, labels) if lab == 'neg']
+    if labels is None:
+        labels = _bert_predict_labels(reviews)
+    # one pass, so labels may be a generator; the buckets only hold row numbers
+    pos_rows, neg_rows = [], []
+    for i, lab in enumerate(labels):
+        if lab == 'pos':
+            pos_rows.append(i)
+        elif lab == 'neg':
+            neg_rows.append(i)
 
-    # spaCy noun-chunk extraction (optional)
-    if use_spacy:
-        try:
-            import spacy
-            nlp = spacy.load("en_core_web_sm")
-            def noun_chunks(docs):
-                counts = Counter()
-                for d in docs:
-                    for nc in nlp(str(d)).noun_chunks:
-                        phrase = re.sub(r"\s+", " ", nc.text.strip().lower())
-                        if 2 <= len(phrase) <= 80:
-                            counts[phrase] += 1
-                return counts.most_common(top_n)
-            pos_phr = noun_chunks(pos_docs)
-            neg_phr = noun_chunks(neg_docs)
-        except Exception:
-            # fallback to n-grams if spaCy not available
-            pos_phr = _top_phrases_ngram(pos_docs, top_n=top_n)
-            neg_phr = _top_phrases_ngram(neg_docs, top_n=top_n)
-    else:
-        pos_phr = _top_phrases_ngram(pos_docs, top_n=top_n)
-        neg_phr = _top_phrases_ngram(neg_docs, top_n=top_n)
+    with stage_timer("phrases"):
+        pos_phr, neg_phr = _extract_phrases(reviews, pos_rows, neg_rows, top_n, use_spacy, terms)
 
     return {
         "top_compliments": [{"phrase": p, "count": c} for p, c in pos_phr],
         "top_complaints":  [{"phrase": p, "count": c} for p, c in neg_phr]
     }
+
+def _extract_phrases(reviews, pos_rows, neg_rows, top_n, use_spacy, terms):
+    # spaCy noun-chunk extraction (optional)
+    if use_spacy:
+        try:
+            pos_phr = top_noun_chunks([reviews[i] for i in pos_rows], top_n=top_n)
+            neg_phr = top_noun_chunks([reviews[i] for i in neg_rows], top_n=top_n)
+            return pos_phr, neg_phr
+        except Exception:
+            pass  # fallback to n-grams if spaCy not available
+    if terms is None:
+        terms = build_term_matrix(reviews)
+    pos_phr = top_phrases_from_terms(terms, pos_rows, top_n=top_n)
+    neg_phr = top_phrases_from_terms(terms, neg_rows, top_n=top_n)
+    return pos_phr, neg_phr
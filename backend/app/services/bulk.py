@@ -0,0 +1,198 @@
+# Bulk analysis of large review exports
+# -------------------------------------------------------------------
+# Streams a CSV in chunks and scores every review with the same
+# service functions the API uses:
+#   - DistilBERT sentiment in the main process (batched inference)
+#   - NRC emotions and spaCy aspects in a process pool, overlapped
+#     with the sentiment pass of the same chunk
+# Per-review scores are written as one Parquet part per chunk (same
+# columns as store/review_scores.csv); per-restaurant aggregates are
+# folded from the parts at the end.
+#
+# Output directory layout:
+#   parts/part-00000.parquet   per-review scores of chunk 0, ...
+#   checkpoint.json            input fingerprint, chunk size, finished chunks
+#   restaurant_aggregates.parquet
+#
+# A part is renamed into place before the checkpoint records it, so an
+# interrupted run resumes from the first unfinished chunk.
+# -------------------------------------------------------------------
+
+import os
+import json
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.services.emotions import detect_emotions_per_review
+from app.services.sentiment import analyze_sentiment
+from app.services.ingestion import SCORE_COLUMNS, review_hash
+from app.utils.nlp import chunk_aspects, load_spacy_once
+from app.utils.nrc_lexicon import EMOTIONS
+
+_CATEGORIES = ["Positive", "Neutral", "Negative"]
+_TOP_ASPECTS = 10
+
+
+def _lexical_features(texts):
+    """Emotion counts and noun-chunk aspects per review (runs in a worker process)."""
+    nlp = load_spacy_once()
+    emotions = detect_emotions_per_review(texts)
+    aspects = ["|".join(chunk_aspects(doc))
+               for doc in nlp.pipe(texts, disable=["ner"])]
+    return emotions, aspects
+
+
+def _warm_worker():
+    load_spacy_once()
+
+
+def _input_fingerprint(path):
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _load_checkpoint(out_dir, fingerprint, chunk_size):
+    path = out_dir / "checkpoint.json"
+    if path.exists():
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if checkpoint["input"] == fingerprint and checkpoint["chunk_size"] == chunk_size:
+            return checkpoint
+        print("[!] Input or chunk size changed since the last run; starting over")
+        for part in (out_dir / "parts").glob("part-*.parquet"):
+            part.unlink()
+    return {"input": fingerprint, "chunk_size": chunk_size, "done": [], "rows": 0}
+
+
+def _save_checkpoint(out_dir, checkpoint):
+    tmp = out_dir / "checkpoint.json.tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, out_dir / "checkpoint.json")
+
+
+def _score_chunk(chunk, pool, workers):
+    """Per-review scores (SCORE_COLUMNS) of one CSV chunk."""
+    chunk = chunk.dropna(subset=["Restaurant", "Review"])
+    texts = chunk["Review"].astype(str).tolist()
+    slices = [texts[i::workers] for i in range(workers)] if texts else []
+    futures = [pool.submit(_lexical_features, s) for s in slices if s]
+
+    sentiment = analyze_sentiment(texts)["detailed_sentiments"]
+
+    emotions, aspects = [None] * len(texts), [None] * len(texts)
+    for i, future in enumerate(futures):
+        e, a = future.result()
+        emotions[i::workers], aspects[i::workers] = e, a
+
+    scores = pd.DataFrame({
+        "review_hash": [review_hash(r, t) for r, t in zip(chunk["Restaurant"], texts)],
+        "Restaurant": chunk["Restaurant"].astype(str).tolist(),
+        "Time": chunk["Time"].astype("string").tolist() if "Time" in chunk else [None] * len(texts),
+        "sentiment_score": np.array([d["sentiment_score"] for d in sentiment], dtype=np.float32),
+        "sentiment_category": [d["sentiment_category"] for d in sentiment],
+    })
+    for emotion in EMOTIONS:
+        scores[emotion] = np.array([e.get(emotion, 0) for e in emotions], dtype=np.int32)
+    scores["aspects"] = aspects
+    return scores[SCORE_COLUMNS]
+
+
+def _partial_aggregates(part):
+    """Per-restaurant sums of one part, and its (restaurant, aspect) mention counts."""
+    for category in _CATEGORIES:
+        part[category] = (part["sentiment_category"] == category).astype(np.int64)
+    sums = part.groupby("Restaurant").agg(
+        review_count=("sentiment_score", "size"),
+        sentiment_sum=("sentiment_score", "sum"),
+        **{c: (c, "sum") for c in _CATEGORIES + EMOTIONS},
+    )
+    aspects = part[["Restaurant", "aspects"]].assign(aspect=part["aspects"].str.split("|")).explode("aspect")
+    aspects = aspects[aspects["aspect"].notna() & (aspects["aspect"] != "")]
+    return sums, aspects.groupby(["Restaurant", "aspect"]).size()
+
+
+def write_aggregates(out_dir):
+    """Fold all parts into restaurant_aggregates.parquet, one part in memory at a time."""
+    sums, mentions = [], []
+    for part_path in sorted((out_dir / "parts").glob("part-*.parquet")):
+        s, m = _partial_aggregates(pd.read_parquet(part_path))
+        sums.append(s)
+        mentions.append(m)
+    if not sums:
+        return None
+
+    totals = pd.concat(sums).groupby(level=0).sum()
+    totals["average_sentiment"] = totals["sentiment_sum"] / totals["review_count"]
+    totals["avg_star_count"] = (totals["average_sentiment"] + 1.0) * 2.5
+    aspect_totals = pd.concat(mentions).groupby(level=[0, 1]).sum()
+    top = (aspect_totals.sort_values(ascending=False)
+           .groupby(level=0).head(_TOP_ASPECTS)
+           .reset_index(name="mentions"))
+    totals["top_aspects"] = (top.assign(entry=top["aspect"] + ":" + top["mentions"].astype(str))
+                             .groupby("Restaurant")["entry"].agg("|".join))
+    totals = totals.drop(columns="sentiment_sum").reset_index()
+    totals.to_parquet(out_dir / "restaurant_aggregates.parquet", index=False)
+    return totals
+
+
+def run_bulk(input_csv, out_dir, chunk_size=5000, workers=None):
+    """
+    Score every review of input_csv into out_dir (see module header).
+
+    Args:
+        input_csv (str): CSV with Restaurant and Review columns (Time optional)
+        out_dir (str | Path): output directory; reused to resume a run
+        chunk_size (int): rows per chunk / Parquet part
+        workers (int | None): processes for the emotion and aspect stages
+
+    Returns:
+        dict: chunks processed / skipped, rows written and restaurants aggregated
+    """
+    out_dir = Path(out_dir)
+    (out_dir / "parts").mkdir(parents=True, exist_ok=True)
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    checkpoint = _load_checkpoint(out_dir, _input_fingerprint(input_csv), chunk_size)
+    done = set(checkpoint["done"])
+
+    processed = skipped = rows_this_run = 0
+    started = time.perf_counter()
+    # spawn, not fork: the parent already runs torch/BLAS thread pools, which
+    # can deadlock in a forked child; workers only ever load spaCy and the lexicon
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_warm_worker) as pool:
+        reader = pd.read_csv(input_csv, chunksize=chunk_size,
+                             usecols=lambda c: c in ("Restaurant", "Review", "Time"))
+        for index, chunk in enumerate(reader):
+            if index in done:
+                skipped += 1
+                continue
+            scores = _score_chunk(chunk, pool, workers)
+
+            part = out_dir / "parts" / f"part-{index:05d}.parquet"
+            tmp = part.with_suffix(".parquet.tmp")
+            scores.to_parquet(tmp, index=False)
+            os.replace(tmp, part)
+
+            done.add(index)
+            checkpoint["done"] = sorted(done)
+            checkpoint["rows"] += len(scores)
+            _save_checkpoint(out_dir, checkpoint)
+            processed += 1
+            rows_this_run += len(scores)
+            elapsed = time.perf_counter() - started
+            print(f"chunk {index}: {len(scores)} reviews ({checkpoint['rows']} total, "
+                  f"{rows_this_run / max(elapsed, 1e-9):.1f} reviews/s this run)")
+
+    aggregates = write_aggregates(out_dir)
+    return {
+        "chunks_processed": processed,
+        "chunks_skipped": skipped,
+        "rows": checkpoint["rows"],
+        "restaurants": 0 if aggregates is None else len(aggregates),
+    }
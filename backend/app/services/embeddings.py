@@ -0,0 +1,317 @@
+# Review embeddings and approximate nearest-neighbour search
+# -------------------------------------------------------------------
+# Reviews are embedded with the fine-tuned DistilBERT encoder from
+# models/bert_sentiment (masked mean of the last hidden layer, L2
+# normalised) and stored as a memory-mapped float16 matrix. Search uses
+# an inverted-file (IVF) index in plain NumPy: spherical k-means
+# centroids, and rows stored grouped by their nearest centroid so each
+# probed list is one contiguous slice of the memmap.
+#
+# Index layout (EMBEDDING_INDEX_DIR, default models/review_index):
+#   vectors.f16     [n, dim] float16, rows grouped by IVF list
+#   centroids.npy   [nlist, dim] float32
+#   offsets.npy     [nlist + 1] start row of each list
+#   rows.npy        [n] row of each vector in trip_res_reviews.csv
+#   restaurant.npy  [n] restaurant code of each vector
+#   meta.json       n, dim, restaurants, model version, corpus fingerprint
+#
+# Build offline with:  python -m app.services.embeddings
+# -------------------------------------------------------------------
+
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+
+from app.services import reviews as review_source
+from app.services.sentiment import _INFER_DEVICE, _load_model_once, model_version
+from app.utils.metrics import BATCH_SIZE, TOKENS_PROCESSED, record_cache, timed_stage
+
+_CORPUS_PATH = Path("trip_res_reviews.csv")
+_INDEX_DIR = Path(os.getenv("EMBEDDING_INDEX_DIR", "models/review_index"))
+SIMILAR_NPROBE = int(os.getenv("SIMILAR_NPROBE", "8"))
+_KMEANS_SAMPLE = 20000
+_KMEANS_ITERATIONS = 15
+_LIVE_CACHE_MAX = 256
+
+# Lazy singletons
+_index = None
+_index_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+_live_vectors = OrderedDict()   # review fingerprint -> embeddings of a place's live reviews
+_live_lock = threading.Lock()
+
+
+class IndexNotBuilt(Exception):
+    """Raised when the review index is missing or was built with another model."""
+
+
+def embed_texts(texts, batch_size=32, max_len=256):
+    """
+    Embed texts with the sentiment model's encoder.
+
+    Returns:
+        np.ndarray: [len(texts), dim] float32, L2-normalised rows
+    """
+    tokenizer, model = _load_model_once()
+    encoder = model.base_model
+    out = []
+    for i in range(0, len(texts), batch_size):
+        chunk = [str(t) if t is not None else "" for t in texts[i:i + batch_size]]
+        enc = tokenizer(chunk, truncation=True, max_length=max_len, padding=True, return_tensors='pt')
+        enc = {k: v.to(_INFER_DEVICE) for k, v in enc.items()}
+        BATCH_SIZE.observe(len(chunk), model="embedding")
+        TOKENS_PROCESSED.inc(int(enc["input_ids"].numel()), model="embedding")
+        with torch.no_grad():
+            hidden = encoder(input_ids=enc["input_ids"], attention_mask=enc["attention_mask"]).last_hidden_state
+            mask = enc["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+            pooled = torch.nn.functional.normalize(pooled, dim=-1)
+        out.append(pooled.cpu().numpy().astype(np.float32))
+    if not out:
+        return np.zeros((0, model.config.hidden_size), dtype=np.float32)
+    return np.vstack(out)
+
+
+def _spherical_kmeans(X, k, iterations=_KMEANS_ITERATIONS, seed=0):
+    """k-means on the unit sphere (cosine similarity); X is [n, dim] float32."""
+    rng = np.random.default_rng(seed)
+    centroids = X[rng.choice(len(X), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(X @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, X)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # re-seed empty lists with random points
+        sums[empty] = X[rng.choice(len(X), size=int(empty.sum()), replace=False)]
+        norms[empty] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+def _assign(vectors, centroids, chunk=8192):
+    return np.concatenate([
+        np.argmax(vectors[i:i + chunk].astype(np.float32) @ centroids.T, axis=1)
+        for i in range(0, len(vectors), chunk)
+    ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+
+def _corpus_fingerprint():
+    st = _CORPUS_PATH.stat()
+    return f"{st.st_size}:{int(st.st_mtime)}"
+
+
+def build_index(batch_size=32, nlist=None):
+    """
+    Embed every review in the corpus and write the IVF index to _INDEX_DIR.
+
+    Args:
+        batch_size (int): texts per forward pass
+        nlist (int | None): number of IVF lists (default ~ 2 * sqrt(n))
+    """
+    df = pd.read_csv(_CORPUS_PATH, usecols=["Restaurant", "Review"])
+    df = df.dropna(subset=["Review"])
+    texts = df["Review"].astype(str).tolist()
+    n = len(texts)
+    if n == 0:
+        raise ValueError(f"No reviews in {_CORPUS_PATH}")
+    restaurants, codes = np.unique(df["Restaurant"].astype(str).to_numpy(), return_inverse=True)
+
+    _INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    first = embed_texts(texts[:batch_size], batch_size=batch_size)
+    dim = first.shape[1]
+
+    # embed in corpus order into a scratch memmap, then regroup by IVF list
+    scratch_path = _INDEX_DIR / "vectors.unordered.f16"
+    scratch = np.memmap(scratch_path, dtype=np.float16, mode="w+", shape=(n, dim))
+    scratch[:len(first)] = first
+    step = batch_size * 32
+    for start in range(len(first), n, step):
+        scratch[start:start + step] = embed_texts(texts[start:start + step], batch_size=batch_size)
+        print(f"embedded {min(start + step, n)}/{n}")
+    scratch.flush()
+
+    nlist = nlist or max(1, min(n, int(2 * np.sqrt(n))))
+    sample = np.random.default_rng(0).choice(n, size=min(n, _KMEANS_SAMPLE), replace=False)
+    centroids = _spherical_kmeans(scratch[np.sort(sample)].astype(np.float32), nlist)
+    assign = _assign(scratch, centroids)
+    order = np.argsort(assign, kind="stable")
+    offsets = np.searchsorted(assign[order], np.arange(nlist + 1)).astype(np.int64)
+
+    vectors = np.memmap(_INDEX_DIR / "vectors.f16", dtype=np.float16, mode="w+", shape=(n, dim))
+    for start in range(0, n, 65536):
+        vectors[start:start + 65536] = scratch[order[start:start + 65536]]
+    vectors.flush()
+    del vectors, scratch
+    scratch_path.unlink()
+
+    np.save(_INDEX_DIR / "centroids.npy", centroids)
+    np.save(_INDEX_DIR / "offsets.npy", offsets)
+    np.save(_INDEX_DIR / "rows.npy", df.index.to_numpy()[order].astype(np.int64))
+    np.save(_INDEX_DIR / "restaurant.npy", codes[order].astype(np.int32))
+    with open(_INDEX_DIR / "meta.json", "w") as f:
+        json.dump({
+            "n": n,
+            "dim": dim,
+            "nlist": nlist,
+            "restaurants": restaurants.tolist(),
+            "model_version": model_version(),
+            "fingerprint": _corpus_fingerprint(),
+        }, f)
+    print(f"Indexed {n} reviews into {nlist} lists at {_INDEX_DIR}")
+
+
+def _load_index_once():
+    """Open the memory-mapped index (lazy)."""
+    global _index
+    if _index is not None:
+        return _index
+    with _index_lock:
+        if _index is not None:
+            return _index
+        meta_path = _INDEX_DIR / "meta.json"
+        if not meta_path.exists():
+            raise IndexNotBuilt(f"No review index at {_INDEX_DIR}; run `python -m app.services.embeddings`")
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["model_version"] != model_version():
+            raise IndexNotBuilt("Review index was built with a different model; rebuild it")
+        if _CORPUS_PATH.exists() and meta["fingerprint"] != _corpus_fingerprint():
+            logger.warning("Review index is older than the review corpus; newly ingested reviews are not searchable")
+        _index = {
+            "meta": meta,
+            "vectors": np.memmap(_INDEX_DIR / "vectors.f16", dtype=np.float16, mode="r",
+                                 shape=(meta["n"], meta["dim"])),
+            "centroids": np.load(_INDEX_DIR / "centroids.npy"),
+            "offsets": np.load(_INDEX_DIR / "offsets.npy"),
+            "rows": np.load(_INDEX_DIR / "rows.npy", mmap_mode="r"),
+            "restaurant": np.load(_INDEX_DIR / "restaurant.npy"),
+            "restaurant_codes": {name: i for i, name in enumerate(meta["restaurants"])},
+        }
+    return _index
+
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def search_corpus(query_vector, k=10, restaurant=None, nprobe=SIMILAR_NPROBE):
+    """
+    Approximate top-k corpus reviews by cosine similarity.
+
+    With a restaurant filter, that restaurant's reviews are scored
+    exactly instead of probing IVF lists.
+
+    Returns:
+        (list[dict], int): matches (review, restaurant, score, source) and
+        the number of vectors scored
+
+    Raises:
+        ValueError: if nprobe is not between 1 and the index's nlist.
+    """
+    index = _load_index_once()
+    vectors, offsets = index["vectors"], index["offsets"]
+    nlist = len(index["centroids"])
+    if not 1 <= nprobe <= nlist:
+        raise ValueError(f"nprobe must be between 1 and {nlist}")
+
+    if restaurant is not None:
+        code = index["restaurant_codes"].get(restaurant)
+        if code is None:
+            return [], 0
+        candidates = np.flatnonzero(index["restaurant"] == code)
+        block = vectors[candidates]
+    else:
+        lists = _top_k(index["centroids"] @ query_vector, nprobe)
+        candidates = np.concatenate([np.arange(offsets[l], offsets[l + 1]) for l in lists])
+        # each list is contiguous in the memmap, so read slice by slice
+        block = np.concatenate([vectors[offsets[l]:offsets[l + 1]] for l in lists])
+
+    scores = block.astype(np.float32) @ query_vector
+    best = _top_k(scores, k)
+
+    reviews_df = review_source.reviews_df
+    names = index["meta"]["restaurants"]
+    matches = []
+    for i in best:
+        pos = candidates[i]
+        matches.append({
+            "review": str(reviews_df["Review"].iloc[int(index["rows"][pos])]),
+            "restaurant": names[int(index["restaurant"][pos])],
+            "score": float(scores[i]),
+            "source": "tripadvisor",
+        })
+    return matches, len(candidates)
+
+
+def search_reviews(query_vector, reviews, fingerprint, k=10, source="google"):
+    """Exact top-k over a small set of live reviews; their embeddings are cached by fingerprint."""
+    with _live_lock:
+        vectors = _live_vectors.get(fingerprint)
+        if vectors is not None:
+            _live_vectors.move_to_end(fingerprint)
+    record_cache("live_embeddings", hit=vectors is not None)
+    if vectors is None:
+        vectors = embed_texts(reviews)
+        with _live_lock:
+            _live_vectors[fingerprint] = vectors
+            while len(_live_vectors) > _LIVE_CACHE_MAX:
+                _live_vectors.popitem(last=False)
+    scores = vectors @ query_vector
+    return [{"review": str(reviews[i]), "score": float(scores[i]), "source": source}
+            for i in _top_k(scores, k)]
+
+
+@timed_stage("similar_reviews")
+def similar_reviews(query, k=10, restaurant=None, live_reviews=None, live_fingerprint=None,
+                    nprobe=SIMILAR_NPROBE):
+    """
+    Reviews most similar to a free-text query.
+
+    Args:
+        query (str): e.g. "slow service"
+        k (int): number of matches
+        restaurant (str | None): only search this restaurant's corpus reviews
+        live_reviews (list[str] | None): a place's live Google reviews to include
+        live_fingerprint (str | None): cache key for live_reviews' embeddings
+        nprobe (int): IVF lists to probe (higher = better recall, slower)
+
+    Returns:
+        dict: query, results (best first) and the number of vectors scored
+
+    Raises:
+        IndexNotBuilt: if the corpus index is needed but not available.
+        ValueError: if nprobe is out of range (see search_corpus).
+    """
+    query_vector = embed_texts([query])[0]
+    matches, searched = [], 0
+    if live_reviews:
+        matches += search_reviews(query_vector, live_reviews, live_fingerprint, k)
+        searched += len(live_reviews)
+    try:
+        corpus, n = search_corpus(query_vector, k, restaurant, nprobe)
+    except IndexNotBuilt:
+        if not live_reviews:
+            raise
+        corpus, n = [], 0
+    matches += corpus
+    searched += n
+    matches.sort(key=lambda m: m["score"], reverse=True)
+    return {"query": query, "results": matches[:k], "searched": searched}
+
+
+if __name__ == "__main__":
+    build_index()
@@ -0,0 +1,143 @@
+# Joint aspect / emotion analysis over one spaCy pass
+# -------------------------------------------------------------------
+# Each review is parsed once. From the same docs we derive the aspect
+# summary (noun chunks) and an aspect x emotion matrix: every NRC
+# emotion hit in a sentence is credited to each noun-chunk aspect of
+# that sentence. Hits are collected as (aspect, emotion, count) triples
+# and summed into the sparse matrix once per chunk of docs, so memory
+# does not grow with the review count (only with the number of
+# distinct aspects).
+#
+# The attribution needs sentence boundaries and noun chunks, which the
+# review-level term matrix does not have, so the lookup here runs on
+# the spaCy tokens. Per-place emotion totals are not taken from this
+# pass but from the shared term matrix (emotions.detect_emotions).
+# -------------------------------------------------------------------
+
+import string
+from itertools import islice
+
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
+
+from app.services.emotions import _stop_words
+from app.services.sentiment_by_aspect import aspect_summary, update_aspect_totals
+from app.utils.helpers import chunked
+from app.utils.nlp import chunk_aspects, load_spacy_once
+from app.utils.nrc_lexicon import EMOTIONS, load_lexicon_ids
+from app.utils.metrics import timed_stage
+
+_PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
+
+
+@timed_stage("emotion_aspects")
+def crosstab_docs(docs, aspect_totals=None, doc_aspects=None):
+    """
+    Sparse aspect x emotion matrix of parsed reviews.
+
+    Args:
+        docs (iterable[spacy.tokens.Doc]): consumed once, chunk by chunk
+        aspect_totals (dict | None): if given, also folds each doc's
+            aspects into it (see update_aspect_totals)
+        doc_aspects (list | None): if given, the aspect mentions of each
+            doc are appended to it
+
+    Returns:
+        (scipy.sparse.csr_matrix, list[str]): [n_aspects, n_emotions]
+        co-occurrence counts and the aspect of each matrix row.
+    """
+    lexicon = load_lexicon_ids()
+    stop_words = _stop_words()
+    matrix = csr_matrix((0, len(EMOTIONS)), dtype=np.int64)
+    vocab = {}
+
+    for chunk in chunked(docs):
+        rows, cols, counts = [], [], []
+        for doc in chunk:
+            if aspect_totals is not None:
+                update_aspect_totals(doc, aspect_totals)
+            if doc_aspects is not None:
+                doc_aspects.append(chunk_aspects(doc))
+            for sent in doc.sents:
+                hits = [e for token in sent if token.lower_ not in stop_words
+                        for e in lexicon.get(token.lower_.translate(_PUNCTUATION_TABLE), ())]
+                if not hits:
+                    continue
+                aspects = set(chunk_aspects(sent))
+                if not aspects:
+                    continue
+                per_emotion = np.bincount(hits, minlength=len(EMOTIONS))
+                present = np.flatnonzero(per_emotion)
+                for aspect in aspects:
+                    rows.extend([vocab.setdefault(aspect, len(vocab))] * len(present))
+                    cols.extend(present)
+                    counts.extend(per_emotion[present])
+
+        matrix.resize((len(vocab), len(EMOTIONS)))
+        matrix = matrix + coo_matrix((np.asarray(counts, dtype=np.int64), (rows, cols)),
+                                     shape=matrix.shape).tocsr()   # duplicate triples are summed
+    return matrix, list(vocab)
+
+
+def summarize_crosstab(matrix, aspects, top_n=5, max_aspects=15):
+    """
+    JSON view of the aspect x emotion matrix.
+
+    Returns:
+        dict: emotions, the most emotion-laden aspects with their rows,
+        and per emotion the aspects that drive it (count and share of that
+        emotion's attributed hits)
+    """
+    if matrix.shape[0] == 0:
+        return {"emotions": list(EMOTIONS), "aspects": [], "matrix": [], "drivers": {}}
+    dense_totals = np.asarray(matrix.sum(axis=1)).ravel()
+    top_rows = np.argsort(-dense_totals, kind="stable")[:max_aspects]
+
+    drivers = {}
+    column_totals = np.asarray(matrix.sum(axis=0)).ravel()
+    csc = matrix.tocsc()
+    for j, emotion in enumerate(EMOTIONS):
+        col = csc[:, j]
+        if col.nnz == 0:
+            continue
+        order = np.argsort(-col.data, kind="stable")[:top_n]
+        drivers[emotion] = [
+            {"aspect": aspects[col.indices[k]], "count": int(col.data[k]),
+             "share": float(col.data[k] / column_totals[j])}
+            for k in order
+        ]
+
+    return {
+        "emotions": list(EMOTIONS),
+        "aspects": [aspects[i] for i in top_rows],
+        "matrix": matrix[top_rows].toarray().tolist(),
+        "drivers": drivers,
+    }
+
+
+@timed_stage("spacy_aspects")
+def aspect_emotion_analysis_many(review_lists, review_aspects=None):
+    """
+    Aspect summary and aspect x emotion cross-tab for several review
+    lists, with one streamed spaCy pass over their union.
+
+    Args:
+        review_lists (list[list[str]]): One review list per location.
+        review_aspects (list | None): if given, gets one list per review
+            list with the aspect mentions of each review.
+
+    Returns:
+        list[tuple[dict, dict]]: per list, the aspect summary (see
+        summarize_aspects) and the cross-tab (see summarize_crosstab).
+    """
+    nlp = load_spacy_once()
+    docs = nlp.pipe(str(r) for reviews in review_lists for r in reviews)
+    results = []
+    for reviews in review_lists:
+        aspect_totals = {}
+        doc_aspects = [] if review_aspects is not None else None
+        matrix, aspects = crosstab_docs(islice(docs, len(reviews)), aspect_totals, doc_aspects)
+        if review_aspects is not None:
+            review_aspects.append(doc_aspects)
+        results.append((aspect_summary(aspect_totals), summarize_crosstab(matrix, aspects)))
+    return results
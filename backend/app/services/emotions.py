@@ -1,12 +1,16 @@
-from app.utils.nrc_lexicon import load_nrc_lexicon
+from app.utils.nrc_lexicon import EMOTIONS, load_lexicon_ids
 from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import string
-from collections import Counter
-import requests
+from functools import lru_cache
+import numpy as np
+from scipy.sparse import csr_matrix
 import json
 import os
+import logging
 from dotenv import load_dotenv
+from app.services.term_matrix import build_term_matrix
+from app.utils.log import log_event
+from app.utils.metrics import timed_stage
+from app.utils.resilience import UpstreamUnavailable, guarded_post
 
 # Load environment variables from .env file
 load_dotenv()
@@ -22,31 +26,66 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
-def detect_emotions(reviews):
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=1)
+def _stop_words():
+    return set(stopwords.words("english"))
+
+
+def _emotion_matrix(terms):
+    """[n_terms, n_emotions] NRC associations of the non-stop-word unigrams of a TermMatrix."""
+    lexicon = load_lexicon_ids()
+    stop_words = _stop_words()
+    rows, cols = [], []
+    for j in np.flatnonzero(terms.unigram):
+        word = terms.terms[j]
+        if word in stop_words:
+            continue
+        for e in lexicon.get(word, ()):
+            rows.append(j)
+            cols.append(e)
+    return csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)),
+                      shape=(len(terms.terms), len(EMOTIONS)))
+
+
+@timed_stage("emotions")
+def detect_emotions(reviews, terms=None):
     """
     Detect emotions in a list of reviews using the NRC Emotion Lexicon.
 
     Args:
         reviews (list): List of review texts.
+        terms (TermMatrix | None): term counts of reviews, if already built
+            (see app.services.term_matrix).
 
     Returns:
         dict: Emotion counts aggregated across all reviews.
     """
-    nrc_lexicon = load_nrc_lexicon()
-    emotion_counts = Counter()
-    stop_words = set(stopwords.words("english"))
-    punctuation_table = str.maketrans("", "", string.punctuation)
+    if terms is None:
+        terms = build_term_matrix(reviews)
+    totals = _emotion_matrix(terms).T @ terms.totals()
+    return {emotion: int(n) for emotion, n in zip(EMOTIONS, totals) if n}
+
+
+@timed_stage("emotions")
+def detect_emotions_per_review(reviews, terms=None):
+    """
+    Like detect_emotions, but one emotion count dict per review.
 
-    for review in reviews:
-        tokens = word_tokenize(review.lower())
-        filtered_tokens = [word.translate(punctuation_table) for word in tokens if word not in stop_words]
-        for word in filtered_tokens:
-            if word in nrc_lexicon:
-                for emotion in nrc_lexicon[word]:
-                    emotion_counts[emotion] += 1
+    Args:
+        reviews (list): List of review texts.
+        terms (TermMatrix | None): term counts of reviews, if already built.
 
-    return dict(emotion_counts)
+    Returns:
+        list[dict]: Emotion counts of each review, in input order.
+    """
+    if terms is None:
+        terms = build_term_matrix(reviews)
+    per_review = (terms.counts @ _emotion_matrix(terms)).toarray()
+    return [{EMOTIONS[j]: int(row[j]) for j in np.flatnonzero(row)} for row in per_review]
 
+@timed_stage("llm_emotion_summary")
 def post_emotions_to_chatgpt(emotions):
     """
     Sends emotions data to ChatGPT via RapidAPI and generates a summary of customer sentiments.
@@ -70,15 +109,17 @@ def post_emotions_to_chatgpt(emotions):
     }
 
     try:
-        response = requests.post(RAPIDAPI_URL, json=payload, headers=HEADERS)
+        response = guarded_post(RAPIDAPI_URL, json=payload, headers=HEADERS)
         response_data = response.json()
 
         if response_data.get("status") and "result" in response_data:
             return response_data["result"]
         else:
-            print("API responded but status is False or 'result' key is missing.")
+            log_event(logger, logging.WARNING, "rapidapi returned no result", stage="llm_emotion_summary")
             return "Unable to generate a summary. Please try again later."
 
-    except Exception as e:
-        print(f"Error posting to RapidAPI: {e}")
+    except UpstreamUnavailable:
+        raise
+    except Exception:
+        log_event(logger, logging.ERROR, "rapidapi request failed", stage="llm_emotion_summary", exc_info=True)
         return "Failed to connect to the API. Please check your setup."
\ No newline at end of file
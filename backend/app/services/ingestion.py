@@ -0,0 +1,285 @@
+# Incremental review ingestion with maintained per-restaurant aggregates
+# -------------------------------------------------------------------
+# New TripAdvisor-style rows are appended to trip_res_reviews.csv, only
+# the new rows are scored, and running per-restaurant aggregates
+# (sentiment sums/counts, emotion counts, aspect mentions, phrase
+# counts) are updated in place. Restaurant summaries are then a lookup
+# into the aggregates instead of a re-analysis of the whole CSV.
+#
+# Store layout (REVIEW_STORE_DIR, default ./store):
+#   review_scores.csv          one row of scores per ingested review
+#   restaurant_aggregates.json running aggregates keyed by restaurant
+#
+# Scored reviews also feed the corpus-wide trending sketches
+# (app.services.trending), by their Time and optional Area column.
+# -------------------------------------------------------------------
+
+import os
+import json
+import hashlib
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.services import reviews as review_source
+from app.services.sentiment import analyze_sentiment
+from app.services.emotions import detect_emotions_per_review
+from app.services.phrases import count_phrases, rank_phrases
+from app.services.term_matrix import build_term_matrix
+from app.services.trending import record_reviews
+from app.utils.nlp import chunk_aspects, load_spacy_once
+from app.utils.nrc_lexicon import EMOTIONS
+
+_STORE_DIR = Path(os.getenv("REVIEW_STORE_DIR", "store"))
+_SCORES_PATH = _STORE_DIR / "review_scores.csv"
+_AGGREGATES_PATH = _STORE_DIR / "restaurant_aggregates.json"
+
+SCORE_COLUMNS = ["review_hash", "Restaurant", "Time", "sentiment_score",
+                 "sentiment_category", *EMOTIONS, "aspects"]
+_TIME_FORMAT = "%m/%d/%Y %H:%M"     # as in trip_res_reviews.csv
+
+_lock = threading.Lock()
+_aggregates = None      # restaurant -> aggregate dict (lazy)
+_seen_hashes = None     # review hashes already in the store (lazy)
+
+
+def review_hash(restaurant, review):
+    return hashlib.sha1(f"{restaurant}\x1f{review}".encode("utf-8")).hexdigest()[:16]
+
+
+def parse_review_times(values):
+    """Review Time column as datetimes (NaT where unparseable)."""
+    times = pd.to_datetime(values, format=_TIME_FORMAT, errors="coerce")
+    unparsed = times.isna() & values.notna()
+    if unparsed.any():
+        # rows ingested through /ingest may use other formats (e.g. ISO 8601)
+        times[unparsed] = pd.to_datetime(values[unparsed], errors="coerce", format="mixed")
+    return times
+
+
+def _record_trending(rows, scores, details):
+    """Feed scored rows into the trending sketches, one call per area."""
+    timestamps = [None if pd.isna(t) else t.timestamp() for t in parse_review_times(scores["Time"])]
+    areas = rows["Area"].tolist() if "Area" in rows else [None] * len(rows)
+    by_area = {}
+    for i, area in enumerate(areas):
+        by_area.setdefault(area if isinstance(area, str) and area else None, []).append(i)
+    texts = rows["Review"].astype(str)
+    restaurants = rows["Restaurant"].astype(str)
+    categories = scores["sentiment_category"]
+    for area, index in by_area.items():
+        record_reviews([texts.iat[i] for i in index], [details[i]["aspects"] for i in index],
+                       [categories.iat[i] for i in index], area=area,
+                       timestamps=[timestamps[i] for i in index],
+                       restaurants=[restaurants.iat[i] for i in index])
+
+
+def _empty_aggregate():
+    return {
+        "review_count": 0,
+        "sentiment_sum": 0.0,
+        "sentiment_categories": {"Positive": 0, "Neutral": 0, "Negative": 0},
+        "emotions": {},
+        "aspects": {},              # aspect -> {"mentions", "sentiment_sum"}
+        "compliment_phrases": {},
+        "complaint_phrases": {},
+        "updated_at": None,
+    }
+
+
+def _load_store_once():
+    global _aggregates, _seen_hashes
+    if _aggregates is not None:
+        return _aggregates, _seen_hashes
+    if _AGGREGATES_PATH.exists():
+        with open(_AGGREGATES_PATH) as f:
+            _aggregates = json.load(f)
+    else:
+        _aggregates = {}
+    if _SCORES_PATH.exists():
+        _seen_hashes = set(pd.read_csv(_SCORES_PATH, usecols=["review_hash"])["review_hash"])
+    else:
+        _seen_hashes = set()
+    return _aggregates, _seen_hashes
+
+
+def _save_aggregates():
+    _STORE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = _AGGREGATES_PATH.with_suffix(".json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(_aggregates, f)
+    os.replace(tmp, _AGGREGATES_PATH)
+
+
+def _bump(counts, key, by=1):
+    counts[key] = counts.get(key, 0) + by
+
+
+def score_reviews(rows):
+    """
+    Score review rows (DataFrame with Restaurant, Review and optional Time).
+
+    Returns:
+        (pd.DataFrame, list[dict]): per-review scores (SCORE_COLUMNS) and,
+        per review, its aspect mentions and phrase counts.
+    """
+    texts = rows["Review"].astype(str).tolist()
+    sentiment = analyze_sentiment(texts)["detailed_sentiments"]
+
+    scores = pd.DataFrame({
+        "review_hash": [review_hash(r, t) for r, t in zip(rows["Restaurant"], texts)],
+        "Restaurant": rows["Restaurant"].astype(str).tolist(),
+        "Time": rows["Time"].tolist() if "Time" in rows else [None] * len(texts),
+        "sentiment_score": [d["sentiment_score"] for d in sentiment],
+        "sentiment_category": [d["sentiment_category"] for d in sentiment],
+    })
+    # one tokenisation shared by the emotion and phrase counts
+    terms = build_term_matrix(texts)
+    emotions = detect_emotions_per_review(texts, terms=terms)
+    for emotion in EMOTIONS:
+        scores[emotion] = [e.get(emotion, 0) for e in emotions]
+
+    nlp = load_spacy_once()
+    aspects = [chunk_aspects(doc) for doc in nlp.pipe(texts, disable=["ner"])]
+    scores["aspects"] = ["|".join(a) for a in aspects]
+
+    # phrase counts on the fixed corpus vocabulary (see app.services.phrases)
+    X, phrase_terms = count_phrases(texts, terms=terms)
+    details = []
+    for i in range(len(texts)):
+        cols = slice(X.indptr[i], X.indptr[i + 1])
+        phrases = {str(phrase_terms[j]): int(c) for j, c in zip(X.indices[cols], X.data[cols])}
+        details.append({"aspects": aspects[i], "phrases": phrases})
+    return scores[SCORE_COLUMNS], details
+
+
+def _fold_into_aggregates(scores, details):
+    """Add scored reviews to the running per-restaurant aggregates."""
+    now = datetime.now(timezone.utc).isoformat()
+    touched = set()
+    for row, detail in zip(scores.itertuples(index=False), details):
+        agg = _aggregates.setdefault(row.Restaurant, _empty_aggregate())
+        agg["review_count"] += 1
+        agg["sentiment_sum"] += float(row.sentiment_score)
+        _bump(agg["sentiment_categories"], row.sentiment_category)
+        for emotion in EMOTIONS:
+            n = int(getattr(row, emotion))
+            if n:
+                _bump(agg["emotions"], emotion, n)
+        for aspect in detail["aspects"]:
+            a = agg["aspects"].setdefault(aspect, {"mentions": 0, "sentiment_sum": 0.0})
+            a["mentions"] += 1
+            a["sentiment_sum"] += float(row.sentiment_score)
+        bucket = {"Positive": "compliment_phrases", "Negative": "complaint_phrases"}.get(row.sentiment_category)
+        if bucket:
+            for phrase, n in detail["phrases"].items():
+                _bump(agg[bucket], phrase, n)
+        agg["updated_at"] = now
+        touched.add(row.Restaurant)
+    return touched
+
+
+def ingest_reviews(rows, append_to_csv=True):
+    """
+    Ingest new review rows: append them to the review CSV, score only the
+    new rows and update the per-restaurant aggregates.
+
+    Args:
+        rows (pd.DataFrame | list[dict]): needs Restaurant and Review columns;
+            Reviewer, Rating, Metadata, Time and Pictures are kept if present.
+            An optional Area column labels the rows for /trending.
+        append_to_csv (bool): False when the rows are already in the CSV
+            (e.g. when rebuilding the store).
+
+    Returns:
+        dict: counts of received / ingested / skipped rows and touched restaurants
+    """
+    rows = pd.DataFrame(rows)
+    if rows.empty:
+        return {"received": 0, "ingested": 0, "skipped": 0, "restaurants": []}
+    missing = {"Restaurant", "Review"} - set(rows.columns)
+    if missing:
+        raise ValueError(f"Missing required columns: {sorted(missing)}")
+    received = len(rows)
+    rows = rows.dropna(subset=["Restaurant", "Review"]).reset_index(drop=True)
+
+    with _lock:
+        _, seen = _load_store_once()
+        hashes = np.array([review_hash(r, t) for r, t in zip(rows["Restaurant"], rows["Review"].astype(str))])
+        fresh = ~pd.Series(hashes).duplicated().to_numpy() & np.array([h not in seen for h in hashes], dtype=bool)
+        rows = rows[fresh].reset_index(drop=True)
+        if rows.empty:
+            return {"received": received, "ingested": 0, "skipped": received, "restaurants": []}
+
+        scores, details = score_reviews(rows)
+
+        if append_to_csv:
+            csv_rows = rows.reindex(columns=review_source.reviews_df.columns)
+            csv_rows.to_csv(review_source.file_path, mode="a", header=False, index=False)
+            review_source.reviews_df = pd.concat([review_source.reviews_df, csv_rows], ignore_index=True)
+
+        _STORE_DIR.mkdir(parents=True, exist_ok=True)
+        scores.to_csv(_SCORES_PATH, mode="a", header=not _SCORES_PATH.exists(), index=False)
+        seen.update(scores["review_hash"])
+        touched = _fold_into_aggregates(scores, details)
+        _save_aggregates()
+        _record_trending(rows, scores, details)
+
+    return {
+        "received": received,
+        "ingested": len(rows),
+        "skipped": received - len(rows),
+        "restaurants": sorted(touched),
+    }
+
+
+def rebuild_store(chunk_size=1000):
+    """Score the whole review CSV from scratch into an empty store (one-off bootstrap)."""
+    global _aggregates, _seen_hashes
+    with _lock:
+        for path in (_SCORES_PATH, _AGGREGATES_PATH):
+            if path.exists():
+                path.unlink()
+        _aggregates, _seen_hashes = None, None
+    df = review_source.reviews_df
+    for start in range(0, len(df), chunk_size):
+        ingest_reviews(df.iloc[start:start + chunk_size], append_to_csv=False)
+
+
+def restaurant_summary(restaurant, top_n=5):
+    """
+    Summary of one restaurant served from the maintained aggregates.
+
+    Returns:
+        dict | None: None if the restaurant has no ingested reviews.
+    """
+    aggregates, _ = _load_store_once()
+    agg = aggregates.get(restaurant)
+    if agg is None:
+        return None
+
+    n = agg["review_count"]
+    avg_sentiment = agg["sentiment_sum"] / max(1, n)
+    top_aspects = Counter({a: v["mentions"] for a, v in agg["aspects"].items()}).most_common(top_n)
+    return {
+        "restaurant": restaurant,
+        "review_count": n,
+        "average_sentiment": avg_sentiment,
+        "avg_star_count": (avg_sentiment + 1.0) * 2.5,
+        "sentiment_category_group": agg["sentiment_categories"],
+        "emotions": agg["emotions"],
+        "top_aspects": [
+            {"aspect": a, "mention_count": m,
+             "average_sentiment": agg["aspects"][a]["sentiment_sum"] / m}
+            for a, m in top_aspects
+        ],
+        "top_compliments": [{"phrase": p, "count": c}
+                            for p, c in rank_phrases(agg["compliment_phrases"], top_n=top_n)],
+        "top_complaints": [{"phrase": p, "count": c}
+                           for p, c in rank_phrases(agg["complaint_phrases"], top_n=top_n)],
+        "updated_at": agg["updated_at"],
+    }
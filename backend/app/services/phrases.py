@@ -0,0 +1,255 @@
+# Phrase-mining engine backed by corpus-wide n-gram statistics
+# -------------------------------------------------------------------
+# The vocabulary and background counts are computed once from
+# trip_res_reviews.csv and cached on disk. Per request we only run a
+# fixed-vocabulary transform and rank phrases by how distinctive they
+# are against the background corpus, so generic terms such as "food"
+# or "good" no longer dominate the compliments/complaints lists.
+# -------------------------------------------------------------------
+
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+
+from app.utils.nlp import load_spacy_once
+from app.utils.metrics import record_cache
+
+_CORPUS_PATH = Path("trip_res_reviews.csv")
+_STATS_PATH = Path("models/phrase_stats.npz")
+_NGRAM_RANGE = (1, 2)
+_MIN_DF = 3           # drop phrases seen in fewer than 3 corpus reviews
+_PRIOR_STRENGTH = 500.0
+
+# Lazy singletons
+_vectorizer = None
+_terms = None
+_bg_counts = None     # total occurrences of each vocab term in the corpus
+_bg_idf = None        # smoothed idf of each vocab term
+
+
+def clean_for_ngrams(s: str) -> str:
+    s = re.sub(r"http\S+", " ", s)
+    s = re.sub(r"[^A-Za-z0-9\s]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip().lower()
+    return s
+
+
+def _corpus_fingerprint():
+    st = _CORPUS_PATH.stat()
+    return f"{st.st_size}:{int(st.st_mtime)}"
+
+
+def build_background_stats():
+    """
+    Fit the phrase vocabulary on the full review corpus and save the
+    background term counts / document frequencies to _STATS_PATH.
+    """
+    reviews = pd.read_csv(_CORPUS_PATH)["Review"].dropna().astype(str).tolist()
+    vec = CountVectorizer(stop_words='english', ngram_range=_NGRAM_RANGE,
+                          min_df=_MIN_DF, preprocessor=clean_for_ngrams)
+    X = vec.fit_transform(reviews)
+    terms = vec.get_feature_names_out().astype(str)
+    counts = np.asarray(X.sum(axis=0)).ravel().astype(np.int64)
+    df = np.bincount(X.indices, minlength=len(terms)).astype(np.int64)
+
+    _STATS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        _STATS_PATH,
+        terms=terms, counts=counts, df=df,
+        n_docs=np.int64(X.shape[0]),
+        fingerprint=np.array(_corpus_fingerprint()),
+    )
+    return terms, counts, df, X.shape[0]
+
+
+def _load_background_once():
+    """Load (or build on first use) the corpus vocabulary and background stats."""
+    global _vectorizer, _terms, _bg_counts, _bg_idf
+    if _vectorizer is not None:
+        return _vectorizer, _terms, _bg_counts, _bg_idf
+
+    stats = None
+    if _STATS_PATH.exists():
+        stats = np.load(_STATS_PATH, allow_pickle=False)
+        if _CORPUS_PATH.exists() and str(stats["fingerprint"]) != _corpus_fingerprint():
+            stats = None  # corpus changed since the stats were built
+    record_cache("phrase_stats", hit=stats is not None)
+    if stats is not None:
+        terms, counts, df, n_docs = stats["terms"], stats["counts"], stats["df"], int(stats["n_docs"])
+    else:
+        terms, counts, df, n_docs = build_background_stats()
+
+    _vectorizer = CountVectorizer(stop_words='english', ngram_range=_NGRAM_RANGE,
+                                  preprocessor=clean_for_ngrams,
+                                  vocabulary={t: i for i, t in enumerate(terms.tolist())})
+    _terms = terms
+    _bg_counts = counts.astype(np.float64)
+    _bg_idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+    return _vectorizer, _terms, _bg_counts, _bg_idf
+
+
+def _log_odds_z(counts, bg_counts):
+    """
+    Log-odds ratio with an informative Dirichlet prior (Monroe et al., 2008),
+    comparing the request's phrase counts against the background corpus.
+    Returns the z-score of each term; higher = more distinctive.
+    """
+    n, N = counts.sum(), bg_counts.sum()
+    alpha = _PRIOR_STRENGTH * bg_counts / N
+    a0 = alpha.sum()
+    fg = np.log(counts + alpha) - np.log(n + a0 - counts - alpha)
+    bg = np.log(bg_counts + alpha) - np.log(N + a0 - bg_counts - alpha)
+    var = 1.0 / (counts + alpha) + 1.0 / (bg_counts + alpha)
+    return (fg - bg) / np.sqrt(var)
+
+
+def count_phrases(docs, terms=None):
+    """
+    Count corpus-vocabulary phrases per doc.
+
+    Args:
+        docs (iterable[str]): Review texts.
+        terms (TermMatrix | None): term counts of docs, if already built
+            (app.services.term_matrix); its columns are mapped onto the
+            vocabulary instead of transforming docs again.
+
+    Returns:
+        (scipy.sparse.csr_matrix, np.ndarray): [n_docs, n_terms] counts and the terms.
+    """
+    vec, vocab_terms, _, _ = _load_background_once()
+    if terms is None:
+        return vec.transform([str(d) for d in docs]).tocsr(), vocab_terms
+    columns = terms.column_map(vec.vocabulary)
+    known = np.flatnonzero(columns >= 0)
+    return terms.counts[:, known].tocsr(), vocab_terms[columns[known]]
+
+
+def term_phrase_counts(terms, rows=None):
+    """
+    Total corpus-vocabulary phrase counts of docs, read off their
+    TermMatrix instead of tokenising them again.
+
+    Args:
+        terms (TermMatrix): term counts of the docs (app.services.term_matrix)
+        rows (array-like | None): the docs to count (indices or boolean
+            mask); None counts every doc
+
+    Returns:
+        (np.ndarray, int): per-term counts aligned with the vocabulary and
+        the number of docs.
+    """
+    vec, vocab_terms, _, _ = _load_background_once()
+    columns = terms.column_map(vec.vocabulary)
+    known = columns >= 0
+    totals = terms.totals(rows)
+    counts = np.bincount(columns[known], weights=totals[known], minlength=len(vocab_terms)).astype(np.int64)
+    if rows is None:
+        n_docs = len(terms)
+    else:
+        rows = np.asarray(rows)
+        n_docs = int(rows.sum()) if rows.dtype == bool else len(rows)
+    return counts, n_docs
+
+
+def rank_phrases(counts, top_n=5, scoring="log_odds", min_count=1):
+    """
+    Rank phrases given their total counts over a set of docs.
+
+    Args:
+        counts (np.ndarray | dict): per-term counts aligned with the corpus
+            vocabulary, or a {phrase: count} mapping.
+        top_n (int): Number of phrases to return.
+        scoring (str): "log_odds" (default) or "tfidf".
+        min_count (int): Minimum count for a phrase to be ranked.
+
+    Returns:
+        list[tuple[str, int]]: (phrase, count), most distinctive first.
+    """
+    vec, terms, bg_counts, bg_idf = _load_background_once()
+    if isinstance(counts, dict):
+        dense = np.zeros(len(terms), dtype=np.float64)
+        for phrase, c in counts.items():
+            i = vec.vocabulary.get(phrase)
+            if i is not None:
+                dense[i] += c
+        counts = dense
+    counts = np.asarray(counts, dtype=np.float64)
+    if not counts.any():
+        return []
+
+    if scoring == "tfidf":
+        scores = counts * bg_idf
+    else:
+        scores = _log_odds_z(counts, bg_counts)
+    scores[counts < min_count] = -np.inf
+
+    k = min(top_n, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return []
+    idx = np.argpartition(-scores, k - 1)[:k]
+    idx = idx[np.argsort(-scores[idx])]
+    return [(str(terms[i]), int(counts[i])) for i in idx]
+
+
+def top_phrases_from_terms(terms, rows=None, top_n=5, scoring="log_odds", min_count=None):
+    """
+    Rank the most distinctive 1–2 gram phrases in the `rows` of a
+    TermMatrix (see term_phrase_counts).
+
+    Args:
+        terms (TermMatrix): term counts of the docs
+        rows (array-like | None): the docs to rank (None: every doc)
+        top_n (int): Number of phrases to return.
+        scoring (str): "log_odds" (default) or "tfidf".
+        min_count (int): Minimum occurrences in docs; defaults to 2 when
+            there are enough docs, else 1.
+
+    Returns:
+        list[tuple[str, int]]: (phrase, count in docs), best first.
+    """
+    return _top_counted(*term_phrase_counts(terms, rows), top_n, scoring, min_count)
+
+
+def _top_counted(counts, n_docs, top_n, scoring, min_count):
+    if not n_docs:
+        return []
+    if min_count is None:
+        min_count = 2 if n_docs >= 10 else 1
+    return rank_phrases(counts, top_n=top_n, scoring=scoring, min_count=min_count)
+
+
+def top_noun_chunks(docs, top_n=5):
+    """
+    Rank spaCy noun chunks by count weighted with the background idf,
+    so chunks that appear in every review ("the food") sink.
+    """
+    if not docs:
+        return []
+    nlp = load_spacy_once()
+    vec, _, _, bg_idf = _load_background_once()
+    vocab = vec.vocabulary
+    max_idf = float(bg_idf.max())
+
+    counts = Counter()
+    for doc in nlp.pipe((str(d) for d in docs), disable=["ner"]):
+        for nc in doc.noun_chunks:
+            phrase = re.sub(r"\s+", " ", nc.text.strip().lower())
+            if 2 <= len(phrase) <= 80:
+                counts[phrase] += 1
+
+    def idf(phrase):
+        i = vocab.get(clean_for_ngrams(phrase))
+        return float(bg_idf[i]) if i is not None else max_idf
+
+    ranked = sorted(counts.items(), key=lambda kv: kv[1] * idf(kv[0]), reverse=True)
+    return ranked[:top_n]
+
+
+if __name__ == "__main__":
+    # Prebuild the background stats, e.g. after replacing the CSV
+    terms, _, _, n_docs = build_background_stats()
+    print(f"Saved {len(terms)} phrases from {n_docs} reviews to {_STATS_PATH}")
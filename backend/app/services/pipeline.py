@@ -0,0 +1,698 @@
+# Shared analysis pipeline for one or many locations
+# -------------------------------------------------------------------
+# Fetching is done per place (with bounded concurrency for batches);
+# the expensive stages (DistilBERT, spaCy) run once over the union of
+# all places' reviews and the results are split back per location.
+#
+# Optional stages (LLM calls, word clouds) run against the request
+# deadline: when the budget is short, the upstream is failing or all
+# LLM slots are busy, they are skipped or served from the local
+# summariser / last good value; results that lost information are
+# flagged with "degraded".
+# -------------------------------------------------------------------
+
+import os
+import copy
+import time
+import threading
+import contextvars
+from collections import OrderedDict
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+
+from app.services.sentiment import analyze_sentiment_many
+from app.services.reviews import fetch_google_reviews, fetch_tripadvisor_reviews
+from app.services.bar_chart import generate_aspect_summary
+from app.services.analytics import generate_word_cloud, frequent_phrases_analysis
+from app.services.emotions import detect_emotions, post_emotions_to_chatgpt
+from app.services.emotion_aspects import aspect_emotion_analysis_many
+from app.services.result_cache import review_fingerprint
+from app.services.term_matrix import build_term_matrix
+from app.services.trending import record_reviews
+from app.services.recommendations import (
+    post_to_rapidapi, post_comparison_to_rapidapi, post_multi_comparison_to_rapidapi,
+)
+from app.services.summarizer import (
+    SUMMARY_MODE, SUMMARY_RACE_TIMEOUT_SEC, SUMMARY_SOURCE,
+    local_multi_comparison, local_recommendations, summarize_emotions,
+)
+from app.utils.nrc_lexicon import EMOTIONS
+from app.utils.nlp import chunk_aspects, load_spacy_once
+from app.utils.helpers import dedupe_sources
+from app.utils.resilience import (
+    DeadlineExceeded, Saturated, StageTimeout, UpstreamUnavailable, mark_degraded, remaining_budget,
+)
+
+BATCH_FETCH_CONCURRENCY = int(os.getenv("BATCH_FETCH_CONCURRENCY", "8"))
+MAX_BATCH_LOCATIONS = int(os.getenv("MAX_BATCH_LOCATIONS", "50"))
+MAX_COMPARE_LOCATIONS = int(os.getenv("MAX_COMPARE_LOCATIONS", "12"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MIN_BUDGET_SEC = float(os.getenv("LLM_MIN_BUDGET_SEC", "2"))
+WORD_CLOUD_MIN_BUDGET_SEC = float(os.getenv("WORD_CLOUD_MIN_BUDGET_SEC", "1"))
+# Default page size of detailed_sentiments in /analyze results (per source)
+SENTIMENT_DETAIL_LIMIT = int(os.getenv("SENTIMENT_DETAIL_LIMIT", "1000"))
+
+# Bounded pool for RapidAPI calls: a slow upstream can occupy at most
+# LLM_MAX_CONCURRENCY threads; further calls are skipped, not queued.
+_llm_pool = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+_llm_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+# Last successful LLM output per (location, field), used when a call is skipped
+_LAST_GOOD_MAX = 2048
+_last_good = OrderedDict()
+_last_good_lock = threading.Lock()
+
+LLM_PLACEHOLDERS = {
+    "recommendations": {
+        "title": "Recommendations temporarily unavailable",
+        "overall_aspect": "N/A",
+        "for_owners": [],
+        "for_customers": []
+    },
+    "what_emotions_says": "Summary temporarily unavailable. Please try again later.",
+    "comparison": {
+        "comparison": {
+            "overall_sentiment": {
+                "business1": "N/A",
+                "business2": "N/A",
+                "better_business": "N/A"
+            },
+            "aspect_comparison": []
+        },
+        "recommendations": {
+            "for_business1": [],
+            "for_business2": []
+        }
+    },
+    "benchmark": {
+        "title": "Benchmark summary temporarily unavailable",
+        "overall_aspect": "N/A",
+        "for_places": []
+    },
+}
+
+# Error values the RapidAPI helpers return instead of raising
+_LLM_ERROR_TEXTS = {
+    "Unable to generate a summary. Please try again later.",
+    "Failed to connect to the API. Please check your setup.",
+}
+_LLM_ERROR_TITLES = {"Invalid JSON response", "Failed to fetch recommendations", "Request failed"}
+
+_CODE_TO_LABEL = ["neg", "neu", "pos"]     # sentiment._LABELS index -> phrase-stage label
+_CODE_TO_CATEGORY = ["Negative", "Neutral", "Positive"]
+
+
+class PlaceNotFound(Exception):
+    """Raised when Google returns no reviews for a location id."""
+
+
+def fetch_place(location_id, dedup_threshold=None, area=None):
+    """
+    Fetch and de-duplicate the Google and TripAdvisor reviews of one place.
+
+    Args:
+        area (str | None): caller-supplied area of the place; only labels
+            its reviews for /trending (see app.services.trending)
+
+    Returns:
+        dict with keys: location_id, location_name, google_reviews,
+        tripadvisor_reviews, all_reviews, deduplication, area
+
+    Raises:
+        PlaceNotFound: if no Google reviews were found.
+    """
+    location_name, google_reviews = fetch_google_reviews(location_id)
+    if not google_reviews:
+        raise PlaceNotFound(f"No reviews found for location_id: {location_id}")
+
+    # Clean reviews
+    google_reviews = [str(review) if review is not None else "" for review in google_reviews]
+    tripadvisor_reviews = fetch_tripadvisor_reviews(location_name)
+
+    # Collapse exact and near-duplicate reviews before any inference
+    tripadvisor_reviews, google_reviews, all_reviews, dedup_stats = dedupe_sources(
+        tripadvisor_reviews, google_reviews, dedup_threshold)
+
+    return {
+        "location_id": location_id,
+        "location_name": location_name,
+        "google_reviews": google_reviews,
+        "tripadvisor_reviews": tripadvisor_reviews,
+        "all_reviews": all_reviews,
+        "deduplication": dedup_stats,
+        "area": area,
+    }
+
+
+def fetch_places(location_ids, dedup_threshold=None, max_workers=BATCH_FETCH_CONCURRENCY, area=None):
+    """
+    Fetch several places concurrently.
+
+    Returns:
+        list: a place dict (see fetch_place) or an Exception per location id,
+        in input order.
+    """
+    def fetch(location_id):
+        try:
+            return fetch_place(location_id, dedup_threshold, area)
+        except Exception as e:
+            return e
+
+    if not location_ids:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(location_ids)))) as pool:
+        # copy the context per task so the request deadline is visible in the workers
+        futures = [pool.submit(contextvars.copy_context().run, fetch, location_id)
+                   for location_id in location_ids]
+        return [f.result() for f in futures]
+
+
+def place_terms(place):
+    """
+    The term matrix of a fetched place's reviews (see app.services.term_matrix),
+    built on first use and kept on the place so that phrases, emotions and
+    word clouds share one tokenisation.
+    """
+    terms = place.get("term_matrix")
+    if terms is None:
+        terms = place["term_matrix"] = build_term_matrix(place["all_reviews"])
+    return terms
+
+
+def analyze_places(places, detail_offset=0, detail_limit=SENTIMENT_DETAIL_LIMIT):
+    """
+    Run sentiment, emotion, aspect and phrase analysis for several fetched
+    places with one shared DistilBERT pass and one shared spaCy pass.
+
+    The model passes stream the reviews in chunks and fold them into
+    running totals. Still proportional to the review count: the fetched
+    review lists (deduplication needs them whole), each place's sparse
+    TermMatrix and, with detail_limit=None, every detailed_sentiments
+    entry. The summariser stops splitting sentences at its graph cap.
+
+    Args:
+        places (list[dict]): output of fetch_place; each also gets
+            review_labels (see review_categories)
+        detail_offset (int): first review of the detailed_sentiments page
+        detail_limit (int | None): page size; None returns every review
+
+    Returns:
+        list[dict]: one analysis result per place, in input order
+    """
+    # one DistilBERT pass over [google_1, tripadvisor_1, google_2, ...];
+    # labels keeps one byte per review for the phrase stage
+    sentiment_lists = []
+    for place in places:
+        sentiment_lists.extend([place["google_reviews"], place["tripadvisor_reviews"]])
+    labels = [bytearray() for _ in sentiment_lists]
+    sentiments = analyze_sentiment_many(sentiment_lists, detail_offset, detail_limit, labels)
+
+    # one spaCy pass over every place's combined reviews: aspects and the
+    # aspect x emotion cross-tab come from the same docs
+    review_aspects = []
+    lexical = aspect_emotion_analysis_many([place["all_reviews"] for place in places], review_aspects)
+
+    results = []
+    for i, place in enumerate(places):
+        google_sentiment, tripadvisor_sentiment = sentiments[2 * i], sentiments[2 * i + 1]
+        # emotion totals come from the shared term matrix, as on /compare and
+        # /compare/multi, so a place reports the same counts on every endpoint
+        aspects, emotion_aspects = lexical[i]
+        emotions = detect_emotions(place["all_reviews"], terms=place_terms(place))
+        if place["tripadvisor_reviews"]:
+            if place["google_reviews"]:
+                overall_sentiment = (google_sentiment['average_sentiment'] + tripadvisor_sentiment['average_sentiment']) / 2
+            else:
+                overall_sentiment = tripadvisor_sentiment['average_sentiment']
+        else:
+            tripadvisor_sentiment = {"average_sentiment": 0, "detailed_sentiments": []}
+            overall_sentiment = google_sentiment['average_sentiment']
+
+        # all_reviews == tripadvisor_reviews + google_reviews (see dedupe_sources),
+        # so the phrase stage and the trending sketches can reuse the labels predicted above
+        place["review_labels"] = labels[2 * i + 1] + labels[2 * i]
+        place_labels = (_CODE_TO_LABEL[c] for c in place["review_labels"])
+        record_reviews(place["all_reviews"], review_aspects[i], review_categories(place),
+                       area=place.get("area"), restaurants=repeat(place["location_name"]))
+
+        results.append({
+            "aspect_analysis": {
+                "summary": aspects,
+                "summary_ascepct": generate_aspect_summary(aspects),
+            },
+            "location_name": place["location_name"],
+            "google_sentiment": google_sentiment,
+            "tripadvisor_sentiment": tripadvisor_sentiment,
+            "overall_sentiment": overall_sentiment,
+            "frequent_phrases_analysis": frequent_phrases_analysis(
+                place["all_reviews"], labels=place_labels, terms=place_terms(place)),
+            "emotions": emotions,
+            "emotion_aspects": emotion_aspects,
+            "deduplication": place["deduplication"],
+            "degraded": False,
+        })
+    return results
+
+
+def review_categories(place):
+    """
+    Sentiment category of each of a place's all_reviews, from the one byte
+    per review that analyze_places keeps in place["review_labels"].
+    """
+    return (_CODE_TO_CATEGORY[c] for c in place["review_labels"])
+
+
+def analyze_place(place, detail_offset=0, detail_limit=SENTIMENT_DETAIL_LIMIT):
+    """Analysis of a single fetched place (see analyze_places)."""
+    return analyze_places([place], detail_offset, detail_limit)[0]
+
+
+def analysis_job(location_id, dedup_threshold=None, area=None):
+    """
+    The fetch / analyze pair behind /analyze, for result_cache.cached_result
+    and result_cache.warm.
+
+    The result keeps every review's detailed sentiment, so one cache entry
+    serves all pages (see detail_page).
+
+    Returns:
+        (callable, callable): fetch() -> (place, review fingerprint) and
+        analyze(place) -> full result with LLM insights and word clouds
+    """
+    def fetch():
+        place = fetch_place(location_id, dedup_threshold, area)
+        return place, review_fingerprint(place["all_reviews"])
+
+    def analyze(place):
+        result = analyze_place(place, detail_limit=None)
+        add_llm_insights(place, result)
+        add_word_clouds(place, result)
+        return result
+
+    return fetch, analyze
+
+
+def detail_page(result, detail_offset=0, detail_limit=SENTIMENT_DETAIL_LIMIT):
+    """
+    Shallow copy of an analysis_job result with one page of
+    detailed_sentiments per source, described by detailed_page
+    {offset, limit, total}.
+    """
+    page = dict(result)
+    for source in ("google_sentiment", "tripadvisor_sentiment"):
+        sentiment = result[source]
+        detailed = sentiment.get("detailed_sentiments", [])
+        page[source] = dict(
+            sentiment,
+            detailed_sentiments=detailed[detail_offset:detail_offset + detail_limit],
+            detailed_page={"offset": detail_offset, "limit": detail_limit, "total": len(detailed)},
+        )
+    return page
+
+
+def add_word_clouds(place, result):
+    """Attach the review and aspect word clouds to an analysis result (skipped when out of budget)."""
+    if remaining_budget() < WORD_CLOUD_MIN_BUDGET_SEC:
+        result["word_cloud"] = None
+        result["aspect_analysis"]["word_cloud"] = None
+        mark_degraded(result, "word_cloud", DeadlineExceeded.reason)
+        return result
+    result["word_cloud"] = generate_word_cloud(place["all_reviews"], terms=place_terms(place))
+    result["aspect_analysis"]["word_cloud"] = generate_word_cloud(result["aspect_analysis"]["summary"])
+    return result
+
+
+def submit_llm_calls(calls):
+    """
+    Start RapidAPI-backed calls on the bounded LLM pool.
+
+    Args:
+        calls (dict): key -> (fn, args)
+
+    Returns:
+        (dict, dict): outcomes already known (skipped calls) and
+        key -> Future for the submitted ones; see collect_llm_calls.
+    """
+    results, futures = {}, {}
+    for key, (fn, args) in calls.items():
+        if remaining_budget() < LLM_MIN_BUDGET_SEC:
+            results[key] = DeadlineExceeded("not enough budget left for an LLM call")
+            continue
+        if not _llm_slots.acquire(blocking=False):
+            results[key] = Saturated("all LLM slots busy")
+            continue
+        future = _llm_pool.submit(contextvars.copy_context().run, fn, *args)
+        future.add_done_callback(lambda _: _llm_slots.release())
+        futures[key] = future
+    return results, futures
+
+
+def collect_llm_calls(pending, timeout=None):
+    """
+    Wait for calls started by submit_llm_calls, at most until the request
+    deadline (or `timeout` seconds, whichever comes first). A call that
+    is still running keeps its slot until it finishes.
+
+    Returns:
+        dict: key -> the call's return value, or an UpstreamUnavailable
+        instance if it was skipped, timed out or short-circuited.
+    """
+    results, futures = pending
+    results = dict(results)
+    give_up_at = time.monotonic() + min(timeout if timeout is not None else float("inf"), remaining_budget())
+    for key, future in futures.items():
+        wait = give_up_at - time.monotonic()
+        try:
+            results[key] = future.result(timeout=max(0.0, wait) if wait != float("inf") else None)
+        except FutureTimeout:
+            if timeout is not None and remaining_budget() > 0:
+                results[key] = StageTimeout(f"slower than {timeout:g}s")
+            else:
+                results[key] = DeadlineExceeded("LLM call outlived the request deadline")
+        except UpstreamUnavailable as e:
+            results[key] = e
+    return results
+
+
+def run_llm_calls(calls):
+    """Run RapidAPI-backed calls concurrently within the request deadline (see collect_llm_calls)."""
+    return collect_llm_calls(submit_llm_calls(calls))
+
+
+def _llm_failed(outcome):
+    """True for skipped calls and for the error values the RapidAPI helpers return instead of raising."""
+    if isinstance(outcome, UpstreamUnavailable):
+        return True
+    if isinstance(outcome, str):
+        return outcome in _LLM_ERROR_TEXTS
+    if isinstance(outcome, dict):
+        if outcome.get("title") in _LLM_ERROR_TITLES:
+            return True
+        verdict = outcome.get("comparison", {}).get("overall_sentiment", {})
+        return verdict.get("better_business") == "N/A" and verdict.get("business1") == "N/A"
+    return False
+
+
+def run_summary_calls(calls, local):
+    """
+    Run the LLM summary calls according to SUMMARY_MODE (see
+    app.services.summarizer), building local summaries where needed.
+
+    Args:
+        calls (dict): key -> (fn, args) for RapidAPI
+        local (dict): key -> zero-argument callable building the local
+            summary; keys without one always use RapidAPI
+
+    Returns:
+        dict: key -> (LLM outcome or None, local summary or None)
+    """
+    if SUMMARY_MODE == "local":
+        llm_calls = {key: call for key, call in calls.items() if key not in local}
+    else:
+        llm_calls = calls
+    pending = submit_llm_calls(llm_calls)
+
+    local_values = {}
+    if SUMMARY_MODE in ("local", "race"):
+        # built while the RapidAPI calls are in flight
+        local_values = {key: build() for key, build in local.items() if key in calls}
+    outcomes = collect_llm_calls(pending, timeout=SUMMARY_RACE_TIMEOUT_SEC if SUMMARY_MODE == "race" else None)
+    if SUMMARY_MODE == "fallback":
+        local_values = {key: local[key]() for key, outcome in outcomes.items()
+                        if key in local and _llm_failed(outcome)}
+    return {key: (outcomes.get(key), local_values.get(key)) for key in calls}
+
+
+def apply_llm_outcome(result, field, outcome, cache_key, placeholder, local=None):
+    """
+    Store an LLM outcome on result[field]. If the call failed, use the
+    local summary when there is one; otherwise fall back to the last good
+    value for cache_key (or the placeholder) and mark the result degraded.
+    The source used is recorded under result["summary_sources"].
+    """
+    sources = result.setdefault("summary_sources", {})
+    if outcome is not None and not _llm_failed(outcome):
+        with _last_good_lock:
+            _last_good[cache_key] = outcome
+            _last_good.move_to_end(cache_key)
+            while len(_last_good) > _LAST_GOOD_MAX:
+                _last_good.popitem(last=False)
+        result[field] = outcome
+        sources[field] = "llm"
+    elif local is not None:
+        result[field] = local
+        sources[field] = "local"
+    else:
+        reason = outcome.reason if isinstance(outcome, UpstreamUnavailable) else "error"
+        with _last_good_lock:
+            cached = _last_good.get(cache_key)
+        if cached is not None:
+            result[field] = cached
+            sources[field] = "cached"
+            mark_degraded(result, field, f"{reason}:cached")
+        else:
+            result[field] = copy.deepcopy(placeholder)
+            sources[field] = "placeholder"
+            mark_degraded(result, field, reason)
+    SUMMARY_SOURCE.inc(field=field, source=sources[field])
+    return result
+
+
+def add_llm_insights(place, result):
+    """
+    Attach the recommendations and emotion summary (RapidAPI and/or local)
+    to an analysis result of the place (see analyze_places). The local
+    summaries read every review, not the detailed_sentiments page.
+    """
+    reviews = place["all_reviews"]
+    outcomes = run_summary_calls(
+        {
+            "recommendations": (post_to_rapidapi, (place["google_reviews"],)),
+            "what_emotions_says": (post_emotions_to_chatgpt, (result["emotions"],)),
+        },
+        local={
+            "recommendations": lambda: local_recommendations(result, reviews, review_categories(place)),
+            "what_emotions_says": lambda: summarize_emotions(
+                result["emotions"], reviews, review_categories(place), result["frequent_phrases_analysis"]),
+        },
+    )
+    for field, (outcome, local) in outcomes.items():
+        apply_llm_outcome(result, field, outcome, (place["location_id"], field), LLM_PLACEHOLDERS[field], local)
+    return result
+
+
+def compare_places(place1, place2):
+    """
+    Side-by-side comparison of two fetched places: one shared DistilBERT
+    pass, emotions per place and the three RapidAPI calls run concurrently.
+
+    Returns:
+        dict: the LLM comparison plus location1 / location2 summaries
+    """
+    sentiments = analyze_sentiment_many([
+        place1["google_reviews"], place1["tripadvisor_reviews"],
+        place2["google_reviews"], place2["tripadvisor_reviews"],
+    ])
+    summaries = []
+    for i, place in enumerate((place1, place2)):
+        google_sentiment, tripadvisor_sentiment = sentiments[2 * i], sentiments[2 * i + 1]
+        overall_sentiment = google_sentiment['average_sentiment']
+        if place["tripadvisor_reviews"]:
+            overall_sentiment = (google_sentiment['average_sentiment'] + tripadvisor_sentiment['average_sentiment']) / 2
+        summaries.append({
+            "name": place["location_name"],
+            "google_sentiment": google_sentiment,
+            "overall_sentiment": overall_sentiment,
+            "emotions": detect_emotions(place["all_reviews"], terms=place_terms(place)),
+        })
+
+    def local_emotions(i):
+        detailed = sentiments[2 * i]["detailed_sentiments"] + sentiments[2 * i + 1]["detailed_sentiments"]
+        return lambda: summarize_emotions(summaries[i]["emotions"], [d["review_text"] for d in detailed],
+                                          [d["sentiment_category"] for d in detailed])
+
+    outcomes = run_summary_calls(
+        {
+            "comparison": (post_comparison_to_rapidapi, (
+                place1["all_reviews"], place2["all_reviews"], place1["location_name"], place2["location_name"])),
+            "what_emotions_says1": (post_emotions_to_chatgpt, (summaries[0]["emotions"],)),
+            "what_emotions_says2": (post_emotions_to_chatgpt, (summaries[1]["emotions"],)),
+        },
+        local={"what_emotions_says1": local_emotions(0), "what_emotions_says2": local_emotions(1)},
+    )
+    llm = {"degraded": False}
+    pair = (place1["location_id"], place2["location_id"])
+    outcome, _ = outcomes["comparison"]
+    apply_llm_outcome(llm, "comparison", outcome, (pair, "comparison"), LLM_PLACEHOLDERS["comparison"])
+    for n, place in ((1, place1), (2, place2)):
+        outcome, local = outcomes[f"what_emotions_says{n}"]
+        apply_llm_outcome(llm, f"what_emotions_says{n}", outcome,
+                          (place["location_id"], "what_emotions_says"), LLM_PLACEHOLDERS["what_emotions_says"], local)
+
+    comparison_result = llm["comparison"]
+    for n, (place, summary) in enumerate(((place1, summaries[0]), (place2, summaries[1])), start=1):
+        summary[f"what_emotions_says{n}"] = llm[f"what_emotions_says{n}"]
+        summary["deduplication"] = place["deduplication"]
+        comparison_result[f"location{n}"] = summary
+    comparison_result["summary_sources"] = llm["summary_sources"]
+    comparison_result["degraded"] = llm["degraded"]
+    if llm["degraded"]:
+        comparison_result["degraded_stages"] = llm["degraded_stages"]
+    return comparison_result
+
+
+def _benchmark_text(benchmark):
+    """Compact text rendering of the benchmark matrices for the LLM prompt."""
+    names = [p["name"] for p in benchmark["places"]]
+    lines = ["Places: " + "; ".join(
+        f"{p['name']} ({p['review_count']} reviews, {p['avg_star_count']:.1f} stars)" for p in benchmark["places"])]
+    lines.append("Aspect scores from -1 (negative) to 1 (positive), '-' = too few mentions:")
+    lines.append("aspect | " + " | ".join(names))
+    for aspect, column in zip(benchmark["aspects"], zip(*benchmark["aspect_scores"])):
+        lines.append(f"{aspect} | " + " | ".join("-" if v is None else f"{v:+.2f}" for v in column))
+    lines.append("Emotion words per review:")
+    lines.append("emotion | " + " | ".join(names))
+    for emotion, column in zip(benchmark["emotions"], zip(*benchmark["emotion_matrix"])):
+        lines.append(f"{emotion} | " + " | ".join(f"{v:.2f}" for v in column))
+    return "\n".join(lines)
+
+
+def compare_many(places, top_aspects=10, min_mentions=3, include_llm=True):
+    """
+    Benchmark N fetched places against each other with one DistilBERT
+    pass and one spaCy pass over the union of their reviews.
+
+    Aspect scores are the mean review sentiment of the reviews that
+    mention the aspect, computed for every place at once from a sparse
+    review x aspect matrix.
+
+    Args:
+        places (list[dict]): output of fetch_place
+        top_aspects (int): aspects (by total mentions) in the matrix
+        min_mentions (int): mentions a place needs for an aspect score
+        include_llm (bool): add one LLM summary of the matrices
+
+    Returns:
+        dict: places, aspects, aspect_scores / aspect_mentions
+        (place x aspect), emotions, emotion_matrix (place x emotion,
+        emotion words per review), rankings and summary
+    """
+    sentiments = analyze_sentiment_many([place["all_reviews"] for place in places])
+    emotion_counts = [detect_emotions(place["all_reviews"], terms=place_terms(place)) for place in places]
+
+    lengths = [len(place["all_reviews"]) for place in places]
+    flat = [str(r) for place in places for r in place["all_reviews"]]
+    review_scores = np.array([d["sentiment_score"] for s in sentiments for d in s["detailed_sentiments"]])
+
+    # sparse review x aspect incidence, then place x aspect via one product
+    vocab, rows, cols = {}, [], []
+    for i, doc in enumerate(load_spacy_once().pipe(flat, disable=["ner"])):
+        for aspect in set(chunk_aspects(doc)):
+            rows.append(i)
+            cols.append(vocab.setdefault(aspect, len(vocab)))
+    A = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(flat), len(vocab)))
+    P = csr_matrix((np.ones(len(flat)), (np.repeat(np.arange(len(places)), lengths), np.arange(len(flat)))),
+                   shape=(len(places), len(flat)))
+    mentions = (P @ A).toarray()
+    sums = (P @ diags(review_scores) @ A).toarray()
+
+    # aspects discussed at more than one place, most mentioned first
+    shared = ((mentions >= min_mentions).sum(axis=0) >= min(2, len(places)))
+    candidates = np.flatnonzero(shared)
+    chosen = candidates[np.argsort(-mentions[:, candidates].sum(axis=0), kind="stable")][:top_aspects]
+    terms = np.empty(len(vocab), dtype=object)
+    for aspect, j in vocab.items():
+        terms[j] = aspect
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = np.where(mentions[:, chosen] >= min_mentions, sums[:, chosen] / mentions[:, chosen], np.nan)
+
+    counts = np.array([[e.get(emotion, 0) for emotion in EMOTIONS] for e in emotion_counts], dtype=np.float64)
+    emotion_matrix = counts / np.maximum(1, np.array(lengths))[:, None]
+
+    ids = [place["location_id"] for place in places]
+    averages = np.array([s["average_sentiment"] for s in sentiments])
+
+    def ranking(column):
+        valid = np.flatnonzero(~np.isnan(column))
+        return [ids[i] for i in valid[np.argsort(-column[valid], kind="stable")]]
+
+    benchmark = {
+        "places": [
+            {
+                "location_id": place["location_id"],
+                "name": place["location_name"],
+                "review_count": lengths[i],
+                "average_sentiment": sentiments[i]["average_sentiment"],
+                "avg_star_count": sentiments[i]["avg_star_count"],
+                "sentiment_category_group": sentiments[i]["sentiment_category_group"],
+                "deduplication": place["deduplication"],
+            }
+            for i, place in enumerate(places)
+        ],
+        "aspects": terms[chosen].tolist(),
+        "aspect_scores": [[None if np.isnan(v) else float(v) for v in row] for row in scores],
+        "aspect_mentions": mentions[:, chosen].astype(int).tolist(),
+        "emotions": list(EMOTIONS),
+        "emotion_matrix": np.round(emotion_matrix, 4).tolist(),
+        "rankings": {
+            "overall": ranking(averages),
+            "by_aspect": {terms[j]: ranking(scores[:, k]) for k, j in enumerate(chosen)},
+            "by_emotion": {emotion: ranking(emotion_matrix[:, k]) for k, emotion in enumerate(EMOTIONS)},
+        },
+        "degraded": False,
+    }
+
+    if include_llm:
+        outcomes = run_summary_calls(
+            {"summary": (post_multi_comparison_to_rapidapi, (_benchmark_text(benchmark),))},
+            local={"summary": lambda: local_multi_comparison(benchmark)},
+        )
+        outcome, local = outcomes["summary"]
+        apply_llm_outcome(benchmark, "summary", outcome, (tuple(ids), "benchmark"),
+                          LLM_PLACEHOLDERS["benchmark"], local)
+    return benchmark
+
+
+def analyze_batch(location_ids, dedup_threshold=None, include_llm=False, include_word_clouds=False, area=None):
+    """
+    Analyze many locations with shared inference batches.
+
+    A failure for one location (no reviews, fetch error, analysis error)
+    is reported in that location's entry and does not fail the batch.
+
+    Returns:
+        dict: location_id -> analysis result or {"error": message}
+    """
+    location_ids = list(dict.fromkeys(location_ids))
+    results, places = {}, []
+    for location_id, place in zip(location_ids, fetch_places(location_ids, dedup_threshold, area=area)):
+        if isinstance(place, Exception):
+            results[location_id] = {"error": str(place)}
+        else:
+            places.append(place)
+
+    try:
+        analyses = analyze_places(places)
+    except Exception:
+        # isolate the failing location(s) by falling back to one pass per place
+        analyses = []
+        for place in places:
+            try:
+                analyses.append(analyze_place(place))
+            except Exception as e:
+                analyses.append(e)
+
+    for place, result in zip(places, analyses):
+        if isinstance(result, Exception):
+            results[place["location_id"]] = {"error": f"Analysis failed: {result}"}
+            continue
+        if include_word_clouds:
+            add_word_clouds(place, result)
+        if include_llm:
+            add_llm_insights(place, result)
+        results[place["location_id"]] = result
+
+    return {location_id: results[location_id] for location_id in location_ids}
@@ -1,7 +1,11 @@
 import requests
 import json
 import os
+import logging
 from dotenv import load_dotenv
+from app.utils.log import log_event, log_payload
+from app.utils.metrics import timed_stage
+from app.utils.resilience import UpstreamUnavailable, guarded_post
 
 # Load environment variables from .env file
 load_dotenv()
@@ -17,6 +21,9 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+logger = logging.getLogger(__name__)
+
+@timed_stage("llm_recommendations")
 def post_to_rapidapi(reviews):
     # url = "https://open-ai21.p.rapidapi.com/conversationllama"
     content = (
@@ -46,18 +53,20 @@ def post_to_rapidapi(reviews):
         "web_access": False
     }
  
-    print("content:", content)
+    log_payload(logger, "rapidapi request", stage="llm_recommendations", content=content)
 
     try:
-        response = requests.post(RAPIDAPI_URL, json=payload, headers=HEADERS)
-        print("Status Code:", response.status_code)
-        print("Response Headers:", response.headers)
-        print("Raw Text Response:", response.text)
+        response = guarded_post(RAPIDAPI_URL, json=payload, headers=HEADERS)
+        log_event(logger, logging.DEBUG, "rapidapi response", stage="llm_recommendations",
+                  status=response.status_code, bytes=len(response.content))
+        log_payload(logger, "rapidapi response body", stage="llm_recommendations",
+                    headers=dict(response.headers), body=response.text)
 
         try:
             response_data = response.json()
         except json.JSONDecodeError as e:
-            print(f"JSON decoding error: {e}")
+            log_event(logger, logging.WARNING, "rapidapi response is not JSON",
+                      stage="llm_recommendations", error=str(e), body=response.text)
             return {
                 "title": "Invalid JSON response",
                 "overall_aspect": "N/A",
@@ -75,8 +84,8 @@ def post_to_rapidapi(reviews):
                     parsed_result = json.loads(raw_result_cleaned)
                     return parsed_result
                 except json.JSONDecodeError as e:
-                    print(f"JSON decoding error: {e}")
-                    print("Raw result for debugging:", raw_result)
+                    log_event(logger, logging.WARNING, "rapidapi result is not valid JSON",
+                              stage="llm_recommendations", error=str(e), result=raw_result)
                     return {
                         "title": "Invalid JSON response",
                         "overall_aspect": "N/A",
@@ -86,7 +95,7 @@ def post_to_rapidapi(reviews):
             else:
                 return raw_result
         else:
-            print("API responded but 'status' is False or 'result' key is missing.")
+            log_event(logger, logging.WARNING, "rapidapi returned no result", stage="llm_recommendations")
             return {
                 "title": "Failed to fetch recommendations",
                 "overall_aspect": "N/A",
@@ -95,7 +104,7 @@ def post_to_rapidapi(reviews):
             }
 
     except requests.exceptions.RequestException as e:
-        print(f"Request exception: {e}")
+        log_event(logger, logging.WARNING, "rapidapi request failed", stage="llm_recommendations", error=str(e))
         return {
             "title": "Request failed",
             "overall_aspect": "N/A",
@@ -104,6 +113,7 @@ def post_to_rapidapi(reviews):
         }
 
 
+@timed_stage("llm_comparison")
 def post_comparison_to_rapidapi(reviews1, reviews2, location_name1, location_name2):
     # url = "https://open-ai21.p.rapidapi.com/conversationllama"
     content = (
@@ -168,7 +178,7 @@ def post_comparison_to_rapidapi(reviews1, reviews2, location_name1, location_nam
     # }
 
     try:
-        response = requests.post(RAPIDAPI_URL, json=payload, headers=HEADERS)
+        response = guarded_post(RAPIDAPI_URL, json=payload, headers=HEADERS)
         response_data = response.json()
 
         if response_data.get("status") and "result" in response_data:
@@ -184,8 +194,8 @@ def post_comparison_to_rapidapi(reviews1, reviews2, location_name1, location_nam
                     parsed_result = json.loads(raw_result_cleaned)
                     return parsed_result
                 except json.JSONDecodeError as e:
-                    print(f"JSON decoding error: {e}")
-                    print("Raw result for debugging:", raw_result)
+                    log_event(logger, logging.WARNING, "rapidapi result is not valid JSON",
+                              stage="llm_comparison", error=str(e), result=raw_result)
                     return {
                         "comparison": {
                             "overall_sentiment": {
@@ -204,7 +214,7 @@ def post_comparison_to_rapidapi(reviews1, reviews2, location_name1, location_nam
                 # If raw_result is already a parsed object
                 return raw_result
         else:
-            print("API responded but status is False or 'result' key is missing.")
+            log_event(logger, logging.WARNING, "rapidapi returned no result", stage="llm_comparison")
             return {
                 "comparison": {
                     "overall_sentiment": {
@@ -220,8 +230,10 @@ def post_comparison_to_rapidapi(reviews1, reviews2, location_name1, location_nam
                 }
             }
 
-    except Exception as e:
-        print(f"Error posting to RapidAPI: {e}")
+    except UpstreamUnavailable:
+        raise
+    except Exception:
+        log_event(logger, logging.ERROR, "rapidapi request failed", stage="llm_comparison", exc_info=True)
         return {
             "comparison": {
                 "overall_sentiment": {
@@ -235,4 +247,66 @@ def post_comparison_to_rapidapi(reviews1, reviews2, location_name1, location_nam
                 "for_business1": [],
                 "for_business2": []
             }
-        }
\ No newline at end of file
+        }
+
+@timed_stage("llm_comparison")
+def post_multi_comparison_to_rapidapi(summary):
+    """
+    Ask for a competitor benchmark based on a compact summary of the
+    place x aspect and place x emotion matrices (see pipeline.compare_many).
+
+    Args:
+        summary (str): one block per place plus the aspect score table.
+
+    Returns:
+        dict: title, overall_aspect and for_places recommendations.
+    """
+    content = (
+        f"The following table summarises customer reviews of competing businesses:\n\n"
+        f"{summary}\n\n"
+        "Benchmark the businesses against each other and provide actionable recommendations in JSON format as follows:\n\n"
+        "{\n"
+        "  \"title\": \"A summary title\",\n"
+        "  \"overall_aspect\": \"Who leads overall and on which aspects, and why\",\n"
+        "  \"for_places\": [\n"
+        "    {\n"
+        "      \"name\": \"Business name\",\n"
+        "      \"position\": \"Leader/Contender/Lagging\",\n"
+        "      \"recommendation\": \"The most important improvement for this business\",\n"
+        "      \"priority\": \"High/Medium/Low\"\n"
+        "    }\n"
+        "  ]\n"
+        "}\n\n"
+        "Ensure the response strictly follows this JSON structure."
+    )
+    payload = {
+        "messages": [{"role": "user", "content": content}],
+        "web_access": False
+    }
+    failed = {"title": "Failed to fetch recommendations", "overall_aspect": "N/A", "for_places": []}
+
+    try:
+        response = guarded_post(RAPIDAPI_URL, json=payload, headers=HEADERS)
+        response_data = response.json()
+
+        if response_data.get("status") and "result" in response_data:
+            raw_result = response_data["result"]
+            if isinstance(raw_result, str):
+                try:
+                    raw_result_cleaned = raw_result.strip("`").strip()
+                    if raw_result_cleaned.startswith("json\n"):
+                        raw_result_cleaned = raw_result_cleaned[5:].strip()
+                    return json.loads(raw_result_cleaned)
+                except json.JSONDecodeError as e:
+                    log_event(logger, logging.WARNING, "rapidapi result is not valid JSON",
+                              stage="llm_comparison", error=str(e), result=raw_result)
+                    return dict(failed, title="Invalid JSON response")
+            return raw_result
+        log_event(logger, logging.WARNING, "rapidapi returned no result", stage="llm_comparison")
+        return failed
+
+    except UpstreamUnavailable:
+        raise
+    except Exception:
+        log_event(logger, logging.ERROR, "rapidapi request failed", stage="llm_comparison", exc_info=True)
+        return dict(failed, title="Request failed")
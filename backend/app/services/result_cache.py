@@ -0,0 +1,219 @@
+# Whole-result cache for /analyze and /compare
+# -------------------------------------------------------------------
+# Entries are keyed by (endpoint, location id(s), model version) and
+# remember the fingerprint of the review set they were computed from.
+#
+#   fresh  (age < RESULT_CACHE_TTL_SEC)        served as is
+#   stale  (age < TTL + RESULT_CACHE_STALE_SEC) served as is while one
+#          background refresh re-fetches the reviews; if the review
+#          fingerprint did not change the entry is just re-dated,
+#          otherwise the analysis is recomputed
+#   expired / missing                           computed in the request;
+#          concurrent misses for the same key share one computation
+#
+# Degraded results (see app.utils.resilience) are kept for
+# RESULT_CACHE_DEGRADED_TTL_SEC only, so a recovered upstream is picked
+# up quickly.
+#
+# warm() lets a background job (app.services.watchlist) precompute an
+# entry with its own TTL; such entries are pinned, i.e. never evicted
+# to make room for request-driven ones.
+# -------------------------------------------------------------------
+
+import os
+import time
+import logging
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from app.services.sentiment import model_version
+from app.utils.log import log_event
+from app.utils.metrics import record_cache
+from app.utils.resilience import REQUEST_DEADLINE_SEC, DeadlineExceeded, deadline_scope, remaining_budget
+
+RESULT_CACHE_TTL_SEC = float(os.getenv("RESULT_CACHE_TTL_SEC", "600"))
+RESULT_CACHE_STALE_SEC = float(os.getenv("RESULT_CACHE_STALE_SEC", "3600"))
+RESULT_CACHE_DEGRADED_TTL_SEC = float(os.getenv("RESULT_CACHE_DEGRADED_TTL_SEC", "30"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+
+_entries = OrderedDict()    # key -> _Entry, LRU order
+_inflight = {}              # key -> Future of the running computation
+_lock = threading.Lock()
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("value", "fingerprint", "ttl", "pinned", "fresh_until", "stale_until")
+
+    def __init__(self, value, fingerprint, ttl=None, pinned=False):
+        self.value = value
+        self.fingerprint = fingerprint
+        self.ttl = ttl
+        self.pinned = pinned
+        self.touch()
+
+    def touch(self):
+        now = time.monotonic()
+        if self.value.get("degraded"):
+            ttl = RESULT_CACHE_DEGRADED_TTL_SEC
+        else:
+            ttl = self.ttl or RESULT_CACHE_TTL_SEC
+        self.fresh_until = now + ttl
+        self.stale_until = self.fresh_until + RESULT_CACHE_STALE_SEC
+
+
+def review_fingerprint(*review_lists):
+    """Order-sensitive digest of one or more review lists."""
+    h = hashlib.sha1()
+    for reviews in review_lists:
+        for review in reviews:
+            h.update(str(review).encode("utf-8"))
+            h.update(b"\x1e")
+        h.update(b"\x1d")
+    return h.hexdigest()
+
+
+def cache_key(kind, *location_ids):
+    return (kind, *location_ids, model_version())
+
+
+def _store(key, entry):
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > RESULT_CACHE_MAX_ENTRIES:
+            victim = next((k for k, e in _entries.items() if not e.pinned), None)
+            if victim is None:
+                break
+            del _entries[victim]
+
+
+def _compute(key, fetch, analyze, previous, ttl=None, pinned=False):
+    """Fetch, and re-analyze if the review fingerprint changed or the previous result was degraded."""
+    if previous is not None:
+        # a request-driven refresh keeps a warmed entry's TTL and pin
+        ttl, pinned = ttl or previous.ttl, pinned or previous.pinned
+    fetched, fingerprint = fetch()
+    if previous is not None and previous.fingerprint == fingerprint and not previous.value.get("degraded"):
+        previous.ttl, previous.pinned = ttl, pinned
+        previous.touch()
+        _store(key, previous)
+        return previous.value
+    value = analyze(fetched)
+    _store(key, _Entry(value, fingerprint, ttl, pinned))
+    return value
+
+
+def _single_flight(key, fetch, analyze, previous, ttl=None, pinned=False):
+    """Run _compute once per key; concurrent callers wait for the same result."""
+    with _lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        try:
+            return future.result(timeout=remaining_budget(default=None))
+        except FutureTimeout:
+            raise DeadlineExceeded("request deadline exceeded while waiting for a shared computation") from None
+
+    try:
+        future.set_result(_compute(key, fetch, analyze, previous, ttl, pinned))
+    except BaseException as e:
+        future.set_exception(e)
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+    return future.result()
+
+
+def _refresh(key, fetch, analyze, previous):
+    with deadline_scope(REQUEST_DEADLINE_SEC):
+        try:
+            _single_flight(key, fetch, analyze, previous)
+        except Exception:
+            log_event(logger, logging.WARNING, "background refresh failed", key=key, exc_info=True)
+
+
+def cached_result(key, fetch, analyze, bypass=False):
+    """
+    Serve an analysis result from the cache or compute it.
+
+    Args:
+        key (tuple): see cache_key
+        fetch (callable): () -> (fetched data, review fingerprint)
+        analyze (callable): fetched data -> result dict
+        bypass (bool): skip the lookup and recompute (the new result is stored)
+
+    Returns:
+        (dict, str): the result and the cache status
+        ("hit", "stale", "revalidated", "miss" or "bypass")
+    """
+    if bypass:
+        record_cache("result", False)
+        with _lock:
+            previous = _entries.get(key)
+        fetched, fingerprint = fetch()
+        value = analyze(fetched)
+        _store(key, _Entry(value, fingerprint, previous and previous.ttl,
+                           previous is not None and previous.pinned))
+        return value, "bypass"
+
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+        refreshing = key in _inflight
+
+    if entry is not None and now < entry.fresh_until:
+        record_cache("result", True)
+        return entry.value, "hit"
+    if entry is not None and now < entry.stale_until:
+        record_cache("result", True)
+        if not refreshing:
+            _refresh_pool.submit(_refresh, key, fetch, analyze, entry)
+        return entry.value, "stale"
+
+    record_cache("result", False)
+    value = _single_flight(key, fetch, analyze, entry)
+    return value, "revalidated" if entry is not None and value is entry.value else "miss"
+
+
+def warm(key, fetch, analyze, ttl=None):
+    """
+    Recompute (or revalidate) one entry ahead of demand and pin it.
+
+    Args:
+        key, fetch, analyze: as for cached_result
+        ttl (float | None): freshness of the stored result; defaults to
+            RESULT_CACHE_TTL_SEC
+
+    Returns:
+        dict: the stored result
+    """
+    with _lock:
+        previous = _entries.get(key)
+    return _single_flight(key, fetch, analyze, previous, ttl, pinned=True)
+
+
+def entry_status(key):
+    """Status of one key: "fresh", "stale" or None (missing / expired). Does not touch LRU order."""
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+    if entry is None or now >= entry.stale_until:
+        return None
+    return "fresh" if now < entry.fresh_until else "stale"
+
+
+def invalidate(kind=None, location_id=None):
+    """Drop cached results, optionally only those of one endpoint and/or location."""
+    with _lock:
+        for key in list(_entries):
+            if (kind is None or key[0] == kind) and (location_id is None or location_id in key[1:-1]):
+                del _entries[key]
@@ -6,12 +6,19 @@
 # -------------------------------------------------------------------
 
 from collections import Counter
+from itertools import chain, islice
 from pathlib import Path
 import os
+import hashlib
+import logging
 import torch
 from torch.nn.functional import softmax
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
+from app.utils.helpers import chunked
+from app.utils.inference_profile import load_inference_profile
+from app.utils.metrics import BATCH_SIZE, TOKENS_PROCESSED, timed_stage
+
 _MODEL_DIR = Path("models/bert_sentiment")
 _HF_FALLBACK = "distilbert-base-uncased"
 _LABELS = ["Negative", "Neutral", "Positive"]
@@ -24,10 +31,31 @@ _INFER_DEVICE = torch.device("cpu") if _USE_CPU_INFERENCE else (
     else torch.device("mps") if torch.backends.mps.is_available()
     else torch.device("cpu")
 )
+# decided once here rather than probing torch.backends after every batch
+_EMPTY_MPS_CACHE = _INFER_DEVICE.type == "mps"
+
+# Batch size, token budget, threads and inference_mode for this host
+# (written by python -m benchmarks.autotune)
+_PROFILE = load_inference_profile()
 
 # Lazy singletons
 _tokenizer = None
 _model = None
+_model_version = None
+
+logger = logging.getLogger(__name__)
+
+
+def apply_thread_settings(settings):
+    """Set torch's intra-/inter-op thread counts from profile settings (None = torch default)."""
+    if settings["inter_op_threads"]:
+        try:
+            torch.set_num_interop_threads(settings["inter_op_threads"])
+        except RuntimeError as e:
+            # only possible before torch runs its first parallel work
+            logger.warning("Could not set inter-op threads: %s", e)
+    if settings["intra_op_threads"]:
+        torch.set_num_threads(settings["intra_op_threads"])
 
 
 def _load_model_once():
@@ -36,6 +64,7 @@ def _load_model_once():
     if _tokenizer is not None and _model is not None:
         return _tokenizer, _model
 
+    apply_thread_settings(_PROFILE)
     if (_MODEL_DIR / "config.json").exists():
         # load your fine-tuned model
         _tokenizer = AutoTokenizer.from_pretrained(_MODEL_DIR.as_posix())
@@ -50,43 +79,142 @@ def _load_model_once():
     return _tokenizer, _model
 
 
-def _predict_batched(texts, batch_size=16, max_len=256):
+def model_version():
     """
-    Predict class-probs in small batches. Returns a list of dicts with
-    keys: {'neg': p0, 'neu': p1, 'pos': p2} for each text.
+    Short identifier of the sentiment model on disk (config plus weight
+    file sizes and mtimes), used to invalidate cached analysis results
+    when the model is retrained.
     """
-    tokenizer, model = _load_model_once()
+    global _model_version
+    if _model_version is not None:
+        return _model_version
+    if (_MODEL_DIR / "config.json").exists():
+        h = hashlib.sha1((_MODEL_DIR / "config.json").read_bytes())
+        for path in sorted(_MODEL_DIR.iterdir()):
+            if path.is_file() and path.name != "config.json":
+                st = path.stat()
+                h.update(f"{path.name}:{st.st_size}:{st.st_mtime_ns}".encode())
+        _model_version = h.hexdigest()[:12]
+    else:
+        _model_version = _HF_FALLBACK
+    return _model_version
+
+
+def iter_predictions(texts, batch_size=None, max_len=None, inference_mode=None):
+    """
+    Lazily predict class-probs for any iterable of texts, one batch at a
+    time. Yields a dict with keys {'neg': p0, 'neu': p1, 'pos': p2} per text.
 
-    # ensure safe max length
-    try:
-        tokenizer.model_max_length = max_len
-    except Exception:
-        pass
+    batch_size, max_len and inference_mode default to the host's
+    inference profile (see app.utils.inference_profile).
+    """
+    tokenizer, model = _load_model_once()
+    batch_size = batch_size or _PROFILE["batch_size"]
+    max_len = max_len or _PROFILE["max_len"]
+    if inference_mode is None:
+        inference_mode = _PROFILE["inference_mode"]
+    grad_context = torch.inference_mode if inference_mode else torch.no_grad
 
-    probs_out = []
-    for i in range(0, len(texts), batch_size):
-        chunk = [str(t) if t is not None else "" for t in texts[i:i + batch_size]]
-        enc = tokenizer(chunk, truncation=True, padding=True, return_tensors='pt')
+    for batch in chunked(texts, batch_size):
+        chunk = [str(t) if t is not None else "" for t in batch]
+        enc = tokenizer(chunk, truncation=True, max_length=max_len, padding=True, return_tensors='pt')
         enc = {k: v.to(_INFER_DEVICE) for k, v in enc.items()}
-        with torch.no_grad():
+        BATCH_SIZE.observe(len(chunk), model="sentiment")
+        TOKENS_PROCESSED.inc(int(enc["input_ids"].numel()), model="sentiment")
+        with grad_context():
             logits = model(**enc).logits  # [B, 3]
             ps = softmax(logits, dim=-1).cpu().numpy()
+        # free
+        del enc, logits
+        if _EMPTY_MPS_CACHE:
+            torch.mps.empty_cache()
         for row in ps:
             # map to consistent keys (neg, neu, pos)
-            probs_out.append({
+            yield {
                 "neg": float(row[0]),
                 "neu": float(row[1]),
                 "pos": float(row[2]),
+            }
+
+
+@timed_stage("distilbert_sentiment")
+def _predict_batched(texts, batch_size=None, max_len=None):
+    """
+    Predict class-probs in small batches. Returns a list of dicts with
+    keys: {'neg': p0, 'neu': p1, 'pos': p2} for each text.
+    """
+    return list(iter_predictions(texts, batch_size, max_len))
+
+
+def _empty_sentiment():
+    return {
+        "average_sentiment": 0.0,
+        "avg_star_count": 2.5,
+        "sentiment_category_group": {"Positive": 0, "Neutral": 0, "Negative": 0},
+        "detailed_sentiments": []
+    }
+
+
+def _category(p):
+    # decision: argmax
+    if p["pos"] >= p["neu"] and p["pos"] >= p["neg"]:
+        return "Positive"
+    if p["neu"] >= p["pos"] and p["neu"] >= p["neg"]:
+        return "Neutral"
+    return "Negative"
+
+
+def summarize_sentiment(reviews, probs, detail_offset=0, detail_limit=None, labels=None):
+    """
+    Fold per-review class probabilities into the analyze_sentiment result.
+
+    Both inputs are consumed once, so they may be generators: only the
+    running sums and the requested page of detailed_sentiments are kept.
+
+    Args:
+        reviews (iterable[str])
+        probs (iterable[dict]): predictions for the same reviews (see iter_predictions)
+        detail_offset (int): first review of the detailed_sentiments page
+        detail_limit (int | None): page size; None keeps every review
+        labels (bytearray | None): if given, the index of each review's
+            category in _LABELS is appended to it
+
+    Returns:
+        dict: see analyze_sentiment; with a detail_limit it also has
+        detailed_page = {offset, limit, total}
+    """
+    count, score_sum = 0, 0.0
+    cats = Counter()
+    detailed = []
+    detail_end = None if detail_limit is None else detail_offset + detail_limit
+
+    for text, p in zip(reviews, probs):
+        cat = _category(p)
+
+        # continuous sentiment score in [-1, 1] using (p_pos - p_neg)
+        score = float(p["pos"] - p["neg"])
+
+        if count >= detail_offset and (detail_end is None or count < detail_end):
+            detailed.append({
+                "review_text": text,
+                "sentiment_score": score,
+                "sentiment_category": cat
             })
-        # free
-        del enc, logits
-        if torch.backends.mps.is_available():
-            try:
-                torch.mps.empty_cache()
-            except Exception:
-                pass
+        if labels is not None:
+            labels.append(_LABELS.index(cat))
+        cats[cat] += 1
+        score_sum += score
+        count += 1
 
-    return probs_out
+    result = _empty_sentiment() if count == 0 else {
+        "average_sentiment": score_sum / count,
+        "avg_star_count": float((score_sum / count + 1.0) * 2.5),
+        "sentiment_category_group": dict(cats),
+        "detailed_sentiments": detailed
+    }
+    if detail_limit is not None:
+        result["detailed_page"] = {"offset": detail_offset, "limit": detail_limit, "total": count}
+    return result
 
 
 def analyze_sentiment(reviews):
@@ -104,50 +232,32 @@ def analyze_sentiment(reviews):
         - detailed_sentiments (list of {review_text, sentiment_score, sentiment_category})
     """
     if not reviews:
-        return {
-            "average_sentiment": 0.0,
-            "avg_star_count": 2.5,
-            "sentiment_category_group": {"Positive": 0, "Neutral": 0, "Negative": 0},
-            "detailed_sentiments": []
-        }
+        return _empty_sentiment()
 
     # Predict
-    probs = _predict_batched(reviews, batch_size=16, max_len=256)
-
-    detailed = []
-    cats = []
-    scores = []
-
-    for text, p in zip(reviews, probs):
-        # decision: argmax
-        if p["pos"] >= p["neu"] and p["pos"] >= p["neg"]:
-            cat = "Positive"
-        elif p["neu"] >= p["pos"] and p["neu"] >= p["neg"]:
-            cat = "Neutral"
-        else:
-            cat = "Negative"
-
-        # continuous sentiment score in [-1, 1] using (p_pos - p_neg)
-        score = float(p["pos"] - p["neg"])
+    probs = _predict_batched(reviews)
+    return summarize_sentiment(reviews, probs)
 
-        detailed.append({
-            "review_text": text,
-            "sentiment_score": score,
-            "sentiment_category": cat
-        })
-        cats.append(cat)
-        scores.append(score)
 
-    # aggregate
-    avg_sentiment = float(sum(scores) / max(1, len(scores)))
+@timed_stage("distilbert_sentiment")
+def analyze_sentiment_many(review_lists, detail_offset=0, detail_limit=None, labels=None):
+    """
+    Run analyze_sentiment over several review lists with one shared
+    DistilBERT stream, so small lists still fill whole batches.
 
-    avg_star_count = float((avg_sentiment + 1.0) * 2.5)
+    Predictions are folded into each list's result as they are produced;
+    see summarize_sentiment for the detail page and labels arguments
+    (labels, if given, holds one bytearray per list).
 
-    sentiment_category_group = dict(Counter(cats))
+    Args:
+        review_lists (list[list[str]])
 
-    return {
-        "average_sentiment": avg_sentiment,
-        "avg_star_count": avg_star_count,
-        "sentiment_category_group": sentiment_category_group,
-        "detailed_sentiments": detailed
-    }
+    Returns:
+        list[dict]: one analyze_sentiment result per input list
+    """
+    probs = iter_predictions(chain.from_iterable(review_lists))
+    return [
+        summarize_sentiment(reviews, islice(probs, len(reviews)), detail_offset, detail_limit,
+                            None if labels is None else labels[i])
+        for i, reviews in enumerate(review_lists)
+    ]
@@ -1,13 +1,14 @@
-import spacy
-from collections import defaultdict
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 import io
 import base64
+from app.utils.nlp import chunk_aspects, load_spacy_once
+from app.utils.metrics import timed_stage
 
-# Load SpaCy's English model
-nlp = spacy.load("en_core_web_sm")
+# Load SpaCy's English model (shared with the other spaCy-based stages)
+nlp = load_spacy_once()
 
+@timed_stage("spacy_aspects")
 def aspect_based_sentiment_analysis(reviews):
     """
     Perform Aspect-Based Sentiment Analysis (ABSA) on reviews using SpaCy for aspect extraction.
@@ -18,31 +19,52 @@ def aspect_based_sentiment_analysis(reviews):
     Returns:
         dict: Sentiment scores grouped by aspect, including thresholds.
     """
-    # Initialize results
-    aspect_sentiments = defaultdict(list)
-
-    for review in reviews:
-        # Extract aspects (noun chunks) using SpaCy
-        doc = nlp(review)
-        aspects = [chunk.text.lower() for chunk in doc.noun_chunks]
-        
-        # Analyze sentiment for each aspect
-        for aspect in aspects:
-            sentiment_score = doc.sentiment
-            aspect_sentiments[aspect].append(sentiment_score)
-    
-    # Aggregate results: Calculate average sentiment per aspect and classify them
-    aspect_sentiment_summary = {
+    return summarize_aspects(nlp.pipe(str(review) for review in reviews))
+
+
+def summarize_aspects(docs):
+    """
+    Aggregate noun-chunk aspects and their sentiment over parsed spaCy docs.
+
+    Args:
+        docs (iterable[spacy.tokens.Doc]): Parsed reviews.
+
+    Returns:
+        dict: Sentiment scores grouped by aspect, including thresholds.
+    """
+    totals = {}
+    for doc in docs:
+        update_aspect_totals(doc, totals)
+    return aspect_summary(totals)
+
+
+def update_aspect_totals(doc, totals):
+    """
+    Fold the noun-chunk aspects of one parsed review into running totals.
+
+    Args:
+        doc (spacy.tokens.Doc): Parsed review.
+        totals (dict): aspect -> [sentiment sum, mention count], updated in place.
+    """
+    # Extract aspects (noun chunks) using SpaCy
+    sentiment_score = doc.sentiment
+    for aspect in chunk_aspects(doc):
+        entry = totals.setdefault(aspect, [0.0, 0])
+        entry[0] += sentiment_score
+        entry[1] += 1
+
+
+def aspect_summary(totals):
+    """Average sentiment and category per aspect from update_aspect_totals totals."""
+    return {
         aspect: {
-            "average_sentiment": sum(scores) / len(scores),
-            "mention_count": len(scores),
-            "sentiment_category": categorize_sentiment(sum(scores) / len(scores))
+            "average_sentiment": total / count,
+            "mention_count": count,
+            "sentiment_category": categorize_sentiment(total / count)
         }
-        for aspect, scores in aspect_sentiments.items()
+        for aspect, (total, count) in totals.items()
     }
 
-    return aspect_sentiment_summary
-
 def categorize_sentiment(score):
     """
     Categorize sentiment score into human-readable labels.
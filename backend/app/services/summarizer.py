@@ -0,0 +1,280 @@
+# Local extractive summariser for the LLM summary stages
+# -------------------------------------------------------------------
+# Builds the "what emotions say" paragraph and a recommendations
+# structure from data the pipeline has already computed (emotion
+# counts, compliment/complaint phrases, aspect mentions, per-review
+# sentiment) plus a few representative sentences picked with a
+# TextRank-style ranking over a TF-IDF similarity graph. No network,
+# a few tens of milliseconds per place.
+#
+# SUMMARY_MODE selects how it is combined with RapidAPI:
+#   llm       RapidAPI only (last-good value / placeholder on failure)
+#   fallback  RapidAPI, local summary when the call fails (default)
+#   race      RapidAPI with SUMMARY_RACE_TIMEOUT_SEC, local if slower
+#   local     local summary only, no RapidAPI calls
+# -------------------------------------------------------------------
+
+import os
+import re
+import logging
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app.utils.metrics import Counter, register, timed_stage
+
+SUMMARY_MODES = ("llm", "fallback", "race", "local")
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "fallback").strip().lower()
+SUMMARY_RACE_TIMEOUT_SEC = float(os.getenv("SUMMARY_RACE_TIMEOUT_SEC", "3"))
+
+SUMMARY_SOURCE = register(Counter(
+    "revunet_summary_source", "Summaries served, by field and source (llm/local/cached/placeholder)."))
+
+logger = logging.getLogger(__name__)
+
+if SUMMARY_MODE not in SUMMARY_MODES:
+    logger.warning("Ignoring unknown SUMMARY_MODE %r (expected one of %s); using 'fallback'",
+                   SUMMARY_MODE, ", ".join(SUMMARY_MODES))
+    SUMMARY_MODE = "fallback"
+
+_MAX_SENTENCES = 300       # TextRank graph size cap per polarity
+_MIN_SENTENCE_CHARS = 20
+_MAX_SENTENCE_CHARS = 300
+_DAMPING = 0.85
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_sentences(texts, limit=None):
+    """
+    Split review texts into trimmed sentences of a quotable length.
+
+    Args:
+        texts (iterable[str]): review texts
+        limit (int | None): stop after this many sentences, so the
+            remaining texts are never split
+
+    Returns:
+        list[str]: the sentences, in text order
+    """
+    sentences = []
+    for text in texts:
+        for s in _SENTENCE_SPLIT.split(str(text)):
+            s = s.strip()
+            if _MIN_SENTENCE_CHARS <= len(s) <= _MAX_SENTENCE_CHARS:
+                sentences.append(s)
+                if limit is not None and len(sentences) >= limit:
+                    return sentences
+    return sentences
+
+
+def textrank_scores(sentences, iterations=50, tol=1e-6):
+    """
+    TextRank centrality of each sentence: PageRank over the cosine
+    similarity graph of their TF-IDF vectors.
+
+    Returns:
+        np.ndarray: one score per sentence (uniform if there is no signal)
+    """
+    n = len(sentences)
+    if n == 0:
+        return np.zeros(0)
+    try:
+        X = TfidfVectorizer(stop_words="english", sublinear_tf=True).fit_transform(sentences)
+    except ValueError:
+        # empty vocabulary (only stop words)
+        return np.full(n, 1.0 / n)
+
+    sim = (X @ X.T).toarray()            # rows are l2-normalised -> cosine similarity
+    np.fill_diagonal(sim, 0.0)
+    out_weight = sim.sum(axis=1)
+    out_weight[out_weight == 0] = 1.0
+    transition = sim / out_weight[:, None]
+
+    rank = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        updated = (1.0 - _DAMPING) / n + _DAMPING * (transition.T @ rank)
+        if np.abs(updated - rank).sum() < tol:
+            rank = updated
+            break
+        rank = updated
+    return rank
+
+
+def _ranked(texts):
+    """Candidate sentences of texts with their TextRank scores, best first."""
+    sentences = split_sentences(texts, limit=_MAX_SENTENCES)
+    scores = textrank_scores(sentences)
+    order = np.argsort(-scores, kind="stable")
+    return [sentences[i] for i in order]
+
+
+def _quote_for(phrase, ranked):
+    """Most central sentence mentioning phrase, if any."""
+    phrase = phrase.lower()
+    return next((s for s in ranked if phrase in s.lower()), None)
+
+
+def _split_by_polarity(reviews, categories):
+    """Review texts split into (positive, negative) by their sentiment category."""
+    positive, negative = [], []
+    for review, category in zip(reviews, categories):
+        if category == "Positive":
+            positive.append(review)
+        elif category == "Negative":
+            negative.append(review)
+    return positive, negative
+
+
+def _join(items):
+    items = [str(i) for i in items]
+    if len(items) <= 1:
+        return "".join(items)
+    return ", ".join(items[:-1]) + " and " + items[-1]
+
+
+@timed_stage("local_summary")
+def summarize_emotions(emotions, reviews=(), categories=(), phrases=None):
+    """
+    Local counterpart of post_emotions_to_chatgpt.
+
+    Args:
+        emotions (dict): NRC emotion counts (see detect_emotions)
+        reviews (list[str]): the reviews the counts come from
+        categories (iterable[str]): sentiment category of each review
+        phrases (dict | None): frequent_phrases_analysis output
+
+    Returns:
+        str: a short paragraph on how customers feel
+    """
+    feelings = {e: n for e, n in emotions.items() if e not in ("positive", "negative") and n}
+    total = sum(feelings.values())
+    if not total and not reviews:
+        return "There is not enough review text yet to describe how customers feel."
+
+    parts = []
+    if total:
+        top = sorted(feelings.items(), key=lambda kv: kv[1], reverse=True)[:3]
+        parts.append("Customers mostly express " + _join(f"{e} ({100 * n / total:.0f}%)" for e, n in top) + ".")
+    pos, neg = emotions.get("positive", 0), emotions.get("negative", 0)
+    if pos or neg:
+        if pos >= neg:
+            parts.append(f"Positive language outweighs negative language by about {pos / max(neg, 1):.1f} to 1.")
+        else:
+            parts.append(f"Negative language outweighs positive language by about {neg / max(pos, 1):.1f} to 1.")
+
+    if phrases:
+        compliments = [p["phrase"] for p in phrases.get("top_compliments", [])[:3]]
+        complaints = [p["phrase"] for p in phrases.get("top_complaints", [])[:3]]
+        if compliments:
+            parts.append(f"Reviewers most often praise {_join(compliments)}.")
+        if complaints:
+            parts.append(f"The most frequent complaints concern {_join(complaints)}.")
+
+    positive, negative = _split_by_polarity(reviews, categories)
+    quotes = [q for q in (next(iter(_ranked(positive)), None), next(iter(_ranked(negative)), None)) if q]
+    if quotes:
+        parts.append("Representative comments: " + " / ".join(f'"{q}"' for q in quotes))
+    return " ".join(parts)
+
+
+def _priority(rank):
+    return "High" if rank == 0 else "Medium" if rank < 3 else "Low"
+
+
+@timed_stage("local_summary")
+def local_recommendations(result, reviews, categories, top_n=5):
+    """
+    Local counterpart of post_to_rapidapi, built from an analysis result
+    (see pipeline.analyze_places). Same JSON shape as the LLM response.
+
+    Args:
+        reviews (list[str]): every review of the place, not just the
+            detailed_sentiments page
+        categories (iterable[str]): sentiment category of each review
+    """
+    positive, negative = _split_by_polarity(reviews, categories)
+    ranked_pos, ranked_neg = _ranked(positive), _ranked(negative)
+    phrases = result.get("frequent_phrases_analysis") or {}
+    aspects = result.get("aspect_analysis", {}).get("summary", {})
+    discussed = sorted(aspects, key=lambda a: aspects[a]["mention_count"], reverse=True)[:3]
+
+    groups = [result["google_sentiment"].get("sentiment_category_group", {}),
+              result["tripadvisor_sentiment"].get("sentiment_category_group", {})]
+    n_positive, n_negative = (sum(g.get(c, 0) for g in groups) for c in ("Positive", "Negative"))
+    n = sum(sum(g.values()) for g in groups)
+    overall = [f"{n_positive} of {n} reviews are positive and {n_negative} negative "
+               f"(average rating about {(result['overall_sentiment'] + 1.0) * 2.5:.1f} stars)."]
+    if discussed:
+        overall.append(f"Most discussed: {_join(discussed)}.")
+
+    for_owners = []
+    for rank, item in enumerate(phrases.get("top_complaints", [])[:top_n]):
+        quote = _quote_for(item["phrase"], ranked_neg)
+        for_owners.append({
+            "title": f"Address \"{item['phrase']}\"",
+            "recommendation": f"\"{item['phrase']}\" comes up {item['count']} times in negative reviews."
+                              + (f" For example: \"{quote}\"" if quote else ""),
+            "priority": _priority(rank),
+        })
+    if not for_owners and ranked_neg:
+        for_owners.append({
+            "title": "Review recent negative feedback",
+            "recommendation": f"Typical complaint: \"{ranked_neg[0]}\"",
+            "priority": "Medium",
+        })
+
+    for_customers = []
+    for item in phrases.get("top_compliments", [])[:top_n]:
+        quote = _quote_for(item["phrase"], ranked_pos)
+        for_customers.append({
+            "title": f"Known for {item['phrase']}",
+            "insights": f"Mentioned {item['count']} times in positive reviews."
+                        + (f" \"{quote}\"" if quote else ""),
+        })
+
+    return {
+        "title": f"What reviewers say about {result.get('location_name') or 'this place'}",
+        "overall_aspect": " ".join(overall),
+        "for_owners": for_owners,
+        "for_customers": for_customers,
+    }
+
+
+@timed_stage("local_summary")
+def local_multi_comparison(benchmark):
+    """
+    Local counterpart of post_multi_comparison_to_rapidapi, built from the
+    matrices of pipeline.compare_many.
+    """
+    places = benchmark["places"]
+    names = {p["location_id"]: p["name"] for p in places}
+    overall = benchmark["rankings"]["overall"]
+    parts = [f"{names[overall[0]]} leads on overall review sentiment"
+             + (f", {names[overall[-1]]} trails." if len(overall) > 1 else ".")]
+    leads = {}
+    for aspect, ranking in benchmark["rankings"]["by_aspect"].items():
+        if ranking:
+            leads.setdefault(ranking[0], []).append(aspect)
+    for location_id, aspects in leads.items():
+        parts.append(f"{names[location_id]} is rated best for {_join(aspects[:3])}.")
+
+    aspects = benchmark["aspects"]
+    for_places = []
+    for rank, location_id in enumerate(overall):
+        i = next(j for j, p in enumerate(places) if p["location_id"] == location_id)
+        row = benchmark["aspect_scores"][i]
+        scored = [(s, a) for s, a in zip(row, aspects) if s is not None]
+        weakest = min(scored)[1] if scored else None
+        position = "Leader" if rank == 0 else "Lagging" if rank == len(overall) - 1 else "Contender"
+        for_places.append({
+            "name": names[location_id],
+            "position": position,
+            "recommendation": (f"Reviews are least positive about {weakest}; focus improvements there."
+                               if weakest else "Not enough aspect mentions to single out a weakness."),
+            "priority": "High" if position == "Lagging" else "Medium" if position == "Contender" else "Low",
+        })
+    return {
+        "title": f"Benchmark of {len(places)} places",
+        "overall_aspect": " ".join(parts),
+        "for_places": for_places,
+    }
@@ -0,0 +1,93 @@
+# Shared tokenisation and term counts of a review set
+# -------------------------------------------------------------------
+# The lexical stages (NRC emotion lookup, word cloud, most common words,
+# n-gram phrases) all read one sparse [n_reviews, n_terms] count matrix
+# instead of tokenising the reviews again each. Reviews are normalised
+# with phrases.clean_for_ngrams and split with CountVectorizer's token
+# pattern. The terms are every unigram plus the bigrams of the
+# non-stop-word tokens, which is how the corpus phrase vocabulary forms
+# its 1-2 grams, so phrase counts are a column mapping onto that
+# vocabulary rather than another transform. Stop words are column
+# masks applied by each consumer, never a re-scan of the text.
+# -------------------------------------------------------------------
+
+import re
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, CountVectorizer
+
+from app.services.phrases import clean_for_ngrams
+from app.utils.metrics import timed_stage
+
+_TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")   # CountVectorizer's default
+
+
+def tokenize(text):
+    """Normalised tokens of one review."""
+    return _TOKEN_PATTERN.findall(clean_for_ngrams(str(text)))
+
+
+def _analyze(text):
+    tokens = tokenize(text)
+    content = [t for t in tokens if t not in ENGLISH_STOP_WORDS]
+    return tokens + [f"{a} {b}" for a, b in zip(content, content[1:])]
+
+
+class TermMatrix:
+    """Term counts of one review set; see build_term_matrix."""
+
+    def __init__(self, counts, vocabulary):
+        self.counts = counts.tocsr()
+        self.vocabulary = vocabulary
+        self.terms = np.empty(len(vocabulary), dtype=object)
+        for term, j in vocabulary.items():
+            self.terms[j] = term
+        self.unigram = np.fromiter((" " not in t for t in self.terms), dtype=bool, count=len(self.terms))
+        self._column_maps = {}
+
+    def __len__(self):
+        return self.counts.shape[0]
+
+    def totals(self, rows=None):
+        """
+        Per-term counts summed over all reviews, or over `rows` (indices or
+        a boolean mask).
+        """
+        counts = self.counts if rows is None else self.counts[rows]
+        return np.asarray(counts.sum(axis=0)).ravel()
+
+    def column_map(self, vocabulary):
+        """Index of each term in another vocabulary (term -> index), -1 where absent."""
+        key = id(vocabulary)
+        if key not in self._column_maps:
+            self._column_maps[key] = np.fromiter((vocabulary.get(t, -1) for t in self.terms),
+                                                 dtype=np.int64, count=len(self.terms))
+        return self._column_maps[key]
+
+    def word_counts(self, rows=None, stop_words=ENGLISH_STOP_WORDS):
+        """{word: count} of the unigrams that are not stop words."""
+        totals = self.totals(rows)
+        keep = np.flatnonzero(self.unigram & (totals > 0))
+        return {self.terms[j]: int(totals[j]) for j in keep if self.terms[j] not in stop_words}
+
+
+@timed_stage("term_matrix")
+def build_term_matrix(reviews):
+    """
+    Tokenise reviews once into a sparse term-count matrix.
+
+    Args:
+        reviews (iterable): review texts, consumed once
+
+    Returns:
+        TermMatrix: one row per review
+    """
+    texts = [str(r) for r in reviews]
+    vec = CountVectorizer(analyzer=_analyze, dtype=np.int32)
+    try:
+        counts = vec.fit_transform(texts)
+    except ValueError:
+        # no review has a single token
+        return TermMatrix(csr_matrix((len(texts), 0), dtype=np.int32), {})
+    return TermMatrix(counts, vec.vocabulary_)
@@ -0,0 +1,209 @@
+# Corpus-wide trending aspects from streaming heavy-hitter sketches
+# -------------------------------------------------------------------
+# Every analysed review, from /analyze (and /analyze/batch) as well as
+# from ingestion, feeds its noun-chunk aspects into Space-Saving
+# sketches (app.utils.sketches), one pair per time window:
+#   aspects     every mention, with positive / negative mention tallies
+#   complaints  mentions in reviews classified as Negative
+# Windows are TRENDING_WINDOW_SEC long and the last TRENDING_WINDOWS of
+# them are kept, globally and for up to TRENDING_MAX_AREAS areas (least
+# recently fed area dropped first), so memory is bounded by
+#   (1 + areas) * windows * 2 * TRENDING_CAPACITY
+# counters no matter how many reviews go through. /trending merges the
+# windows of the requested period and of the period before it.
+#
+# A place that is re-analysed (cache refresh, watchlist) returns mostly
+# the same reviews, so reviews are de-duplicated per scope by a hash of
+# (area, restaurant, text) over the last TRENDING_SEEN_MAX such keys; a
+# review first fed without an area still counts once for its area later,
+# and the same short text ("Great food!") at two restaurants counts twice.
+# Restaurants are keyed by name, which /analyze and ingestion share. When the
+# preceding period reaches past the retained windows its counts are
+# reported as None rather than as a partial total. The sketches live in
+# the serving process and start empty on restart.
+# -------------------------------------------------------------------
+
+import os
+import time
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+from app.utils.sketches import SpaceSaving
+
+TRENDING_CAPACITY = int(os.getenv("TRENDING_CAPACITY", "200"))
+TRENDING_WINDOW_SEC = int(os.getenv("TRENDING_WINDOW_SEC", str(6 * 3600)))
+TRENDING_WINDOWS = int(os.getenv("TRENDING_WINDOWS", "28"))
+TRENDING_MAX_AREAS = int(os.getenv("TRENDING_MAX_AREAS", "32"))
+TRENDING_SEEN_MAX = int(os.getenv("TRENDING_SEEN_MAX", "100000"))
+
+_POSITIVE, _NEGATIVE = 0, 1     # tally indices of the aspects sketch
+
+_lock = threading.Lock()
+_scopes = OrderedDict()         # area (None = global) -> {window start: (aspects, complaints, reviews)}
+_seen = OrderedDict()           # (area, restaurant, text) digest -> None, LRU
+
+
+def _digest(area, restaurant, text):
+    h = hashlib.blake2b(digest_size=8)
+    for part in (area, restaurant):
+        h.update(b"" if part is None else str(part).encode("utf-8"))
+        h.update(b"\x1f")
+    h.update(str(text).encode("utf-8"))
+    return h.digest()
+
+
+def _window_start(ts):
+    return int(ts // TRENDING_WINDOW_SEC) * TRENDING_WINDOW_SEC
+
+
+def _window(area, start):
+    """The (aspects, complaints, review count) window of one scope; callers hold _lock."""
+    scope = _scopes.get(area)
+    if scope is None:
+        scope = _scopes[area] = {}
+        areas = [a for a in _scopes if a is not None]
+        if len(areas) > TRENDING_MAX_AREAS:
+            del _scopes[areas[0]]
+    _scopes.move_to_end(area)
+    window = scope.get(start)
+    if window is None:
+        window = scope[start] = [SpaceSaving(TRENDING_CAPACITY, n_tallies=2), SpaceSaving(TRENDING_CAPACITY), 0]
+        oldest = _window_start(time.time()) - (TRENDING_WINDOWS - 1) * TRENDING_WINDOW_SEC
+        for expired in [s for s in scope if s < oldest]:
+            del scope[expired]
+    return window
+
+
+def _mark_seen(area, restaurant, text):
+    """True if the review was not fed to this scope before (and remember it); callers hold _lock."""
+    key = _digest(area, restaurant, text)
+    if key in _seen:
+        _seen.move_to_end(key)
+        return False
+    _seen[key] = None
+    while len(_seen) > TRENDING_SEEN_MAX:
+        _seen.popitem(last=False)
+    return True
+
+
+def record_reviews(reviews, aspects, categories, area=None, timestamps=None, restaurants=None):
+    """
+    Feed analysed reviews into the global (and area) sketches.
+
+    Args:
+        reviews (list[str]): review texts, only used to skip reviews fed before
+        aspects (iterable[list[str]]): aspect mentions of each review
+        categories (iterable[str]): "Positive" | "Neutral" | "Negative" per review
+        area (str | None): area the reviews belong to, if known
+        timestamps (iterable[float | None] | None): epoch seconds of each
+            review (e.g. its post time); None means now
+        restaurants (iterable[str | None] | None): restaurant name of each
+            review, only used to skip reviews fed before
+
+    Returns:
+        int: number of reviews that were new to the global sketches
+    """
+    now = time.time()
+    oldest = _window_start(now) - (TRENDING_WINDOWS - 1) * TRENDING_WINDOW_SEC
+    timestamps = timestamps if timestamps is not None else [None] * len(reviews)
+    restaurants = restaurants if restaurants is not None else [None] * len(reviews)
+    scopes = [None] if area is None else [None, area]
+    batches = {}    # (scope, window start) -> (mention counts, tallies, complaint counts, reviews)
+
+    with _lock:
+        for review, review_aspects, category, ts, restaurant in zip(
+                reviews, aspects, categories, timestamps, restaurants):
+            start = _window_start(now if ts is None else min(ts, now))
+            if start < oldest:
+                continue
+            for scope in scopes:
+                if not _mark_seen(scope, restaurant, review):
+                    continue
+                counts, tallies, complaints, n = batches.setdefault((scope, start), (Counter(), {}, Counter(), [0]))
+                n[0] += 1
+                for aspect in review_aspects:
+                    counts[aspect] += 1
+                    tally = tallies.setdefault(aspect, [0, 0])
+                    if category == "Positive":
+                        tally[_POSITIVE] += 1
+                    elif category == "Negative":
+                        tally[_NEGATIVE] += 1
+                        complaints[aspect] += 1
+
+        for (scope, start), (counts, tallies, complaints, n) in batches.items():
+            window = _window(scope, start)
+            window[0].update(counts, tallies)
+            window[1].update(complaints)
+            window[2] += n[0]
+    return sum(n[0] for (scope, _), (_, _, _, n) in batches.items() if scope is None)
+
+
+def _merged(scope, start, end):
+    """Merge the windows of a scope with start <= window start < end; callers hold _lock."""
+    aspects, complaints, reviews = SpaceSaving(TRENDING_CAPACITY, n_tallies=2), SpaceSaving(TRENDING_CAPACITY), 0
+    for window_start, (a, c, n) in scope.items():
+        if start <= window_start < end:
+            aspects.merge(a)
+            complaints.merge(c)
+            reviews += n
+    return aspects, complaints, reviews
+
+
+def trending(area=None, hours=24, top_n=10):
+    """
+    Approximate top aspects and complaints of the last `hours`, compared
+    with the period of the same length before it.
+
+    Args:
+        area (str | None): None for all areas
+        hours (float): period length, at most the retained history
+        top_n (int): items per list
+
+    Returns:
+        dict | None: None if nothing was recorded for the area. Counts are
+        upper bounds; count - max_error is a guaranteed lower bound.
+        previous_count is the (upper bound) count of the preceding period;
+        previous_reviews and previous_count are None when that period
+        reaches past the retained windows.
+    """
+    now = time.time()
+    span = max(1, round(hours * 3600 / TRENDING_WINDOW_SEC)) * TRENDING_WINDOW_SEC
+    span = min(span, TRENDING_WINDOWS * TRENDING_WINDOW_SEC)
+    end = _window_start(now) + TRENDING_WINDOW_SEC
+    previous_retained = 2 * span <= TRENDING_WINDOWS * TRENDING_WINDOW_SEC
+    with _lock:
+        scope = _scopes.get(area)
+        if scope is None and area is not None:
+            return None
+        scope = scope or {}
+        aspects, complaints, reviews = _merged(scope, end - span, end)
+        previous_aspects, previous_complaints, previous_reviews = _merged(scope, end - 2 * span, end - span)
+
+    def rows(sketch, previous, with_sentiment):
+        out = []
+        for item, count, error, *tallies in sketch.top(top_n):
+            row = {"aspect": item, "count": count, "max_error": error,
+                   "previous_count": previous.estimate(item) if previous_retained else None}
+            if with_sentiment:
+                known = count - error
+                positive, negative = tallies
+                row["net_sentiment"] = (positive - negative) / known if known > 0 else None
+            out.append(row)
+        return out
+
+    return {
+        "area": area,
+        "hours": span / 3600,
+        "window_sec": TRENDING_WINDOW_SEC,
+        "reviews": reviews,
+        "previous_reviews": previous_reviews if previous_retained else None,
+        "top_aspects": rows(aspects, previous_aspects, True),
+        "top_complaints": rows(complaints, previous_complaints, False),
+    }
+
+
+def areas():
+    """Areas with recorded reviews, most recently fed first."""
+    with _lock:
+        return [a for a in reversed(_scopes) if a is not None]
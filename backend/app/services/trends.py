@@ -0,0 +1,175 @@
+# Time-windowed sentiment, emotion and aspect trends per restaurant
+# -------------------------------------------------------------------
+# Works off the per-review scores kept by app.services.ingestion
+# (store/review_scores.csv), so no model runs per request. The scores
+# are bucketed by week or month with one vectorised groupby per
+# granularity; the bucket aggregates are cached and only rebuilt when
+# the scores file changes. A request slices one restaurant out of the
+# aggregates and computes rolling averages over that slice.
+# -------------------------------------------------------------------
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from app.services.ingestion import _SCORES_PATH, parse_review_times
+from app.utils.nrc_lexicon import EMOTIONS
+from app.utils.metrics import record_cache, timed_stage
+
+GRANULARITIES = {"week": ("W", "W-MON"), "month": ("M", "MS")}   # period alias, bucket frequency
+_CATEGORIES = ["Positive", "Neutral", "Negative"]
+
+_lock = threading.Lock()
+_cache = {}             # granularity -> (buckets DataFrame, aspects Series)
+_cache_fingerprint = None
+
+
+def _scores_fingerprint():
+    if not _SCORES_PATH.exists():
+        return None
+    st = _SCORES_PATH.stat()
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def _build(granularity):
+    """
+    Bucket aggregates for one granularity.
+
+    Returns:
+        (pd.DataFrame, pd.Series): per (Restaurant, period_start) review
+        count, sentiment sum, category counts and emotion sums; and aspect
+        mention counts per (Restaurant, period_start, aspect).
+    """
+    columns = ["Restaurant", "Time", "sentiment_score", "sentiment_category", *EMOTIONS, "aspects"]
+    scores = pd.read_csv(_SCORES_PATH, usecols=columns)
+    scores["Time"] = parse_review_times(scores["Time"])
+    scores = scores.dropna(subset=["Time", "Restaurant"])
+
+    period, _ = GRANULARITIES[granularity]
+    scores["period_start"] = scores["Time"].dt.to_period(period).dt.start_time
+    for category in _CATEGORIES:
+        scores[category] = (scores["sentiment_category"] == category).astype(np.int64)
+
+    keys = ["Restaurant", "period_start"]
+    buckets = scores.groupby(keys, sort=True).agg(
+        review_count=("sentiment_score", "size"),
+        sentiment_sum=("sentiment_score", "sum"),
+        **{c: (c, "sum") for c in _CATEGORIES + EMOTIONS},
+    )
+
+    aspects = scores[keys + ["aspects"]].dropna(subset=["aspects"])
+    aspects = aspects.assign(aspect=aspects["aspects"].astype(str).str.split("|")).explode("aspect")
+    aspects = aspects[aspects["aspect"] != ""]
+    aspect_counts = aspects.groupby(keys + ["aspect"], sort=True).size()
+    return buckets, aspect_counts
+
+
+def _aggregates(granularity):
+    global _cache_fingerprint
+    fingerprint = _scores_fingerprint()
+    with _lock:
+        if fingerprint != _cache_fingerprint:
+            _cache.clear()
+            _cache_fingerprint = fingerprint
+        cached = _cache.get(granularity)
+        record_cache("trend_buckets", hit=cached is not None)
+        if cached is None and fingerprint is not None:
+            cached = _cache[granularity] = _build(granularity)
+    return cached
+
+
+def _direction(period_sentiment, counts, recent=12, threshold=0.01):
+    """Least-squares slope of the last `recent` non-empty buckets (sentiment per bucket)."""
+    mask = counts > 0
+    y = period_sentiment[mask][-recent:]
+    if len(y) < 3:
+        return None, "insufficient_data"
+    x = np.flatnonzero(mask)[-recent:].astype(np.float64)
+    slope = float(np.polyfit(x, y, 1, w=np.sqrt(counts[mask][-recent:]))[0])
+    if slope > threshold:
+        return slope, "improving"
+    if slope < -threshold:
+        return slope, "declining"
+    return slope, "stable"
+
+
+@timed_stage("trends")
+def restaurant_trends(restaurant, granularity="month", window=3, top_aspects=5, since=None):
+    """
+    Sentiment, emotion and aspect time series for one restaurant.
+
+    Args:
+        restaurant (str): name as in the review data
+        granularity (str): "week" or "month"
+        window (int): buckets in the rolling average
+        top_aspects (int): aspects (by total mentions) to return series for
+        since (str | None): ISO date or datetime (an offset is converted
+            to UTC); drop buckets starting before it
+
+    Returns:
+        dict | None: None if the restaurant has no dated, scored reviews.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {sorted(GRANULARITIES)}")
+    cached = _aggregates(granularity)
+    if cached is None:
+        return None
+    buckets, aspect_counts = cached
+    if restaurant not in buckets.index.get_level_values(0):
+        return None
+
+    # one row per bucket, including empty ones, so rolling windows span real time
+    rows = buckets.loc[restaurant]
+    _, freq = GRANULARITIES[granularity]
+    rows = rows.reindex(pd.date_range(rows.index.min(), rows.index.max(), freq=freq), fill_value=0)
+    if since:
+        since = pd.Timestamp(since)
+        if since.tzinfo is not None:
+            # bucket starts are naive UTC
+            since = since.tz_convert("UTC").tz_localize(None)
+        rows = rows[rows.index >= since]
+    if rows.empty:
+        return None
+
+    counts = rows["review_count"].to_numpy(dtype=np.float64)
+    sums = rows["sentiment_sum"].to_numpy(dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average = np.where(counts > 0, sums / counts, np.nan)
+        rolling_counts = rows["review_count"].rolling(window, min_periods=1).sum().to_numpy(dtype=np.float64)
+        rolling_sums = rows["sentiment_sum"].rolling(window, min_periods=1).sum().to_numpy()
+        rolling = np.where(rolling_counts > 0, rolling_sums / rolling_counts, np.nan)
+    slope, direction = _direction(average, counts)
+
+    def clean(x):
+        return None if np.isnan(x) else float(x)
+
+    series = []
+    for i, (start, row) in enumerate(rows.iterrows()):
+        series.append({
+            "period_start": start.date().isoformat(),
+            "review_count": int(row["review_count"]),
+            "average_sentiment": clean(average[i]),
+            "rolling_sentiment": clean(rolling[i]),
+            "sentiment_category_group": {c: int(row[c]) for c in _CATEGORIES},
+            "emotions": {e: int(row[e]) for e in EMOTIONS if row[e]},
+        })
+
+    aspect_series = {}
+    if restaurant in aspect_counts.index.get_level_values(0):
+        mentions = aspect_counts.loc[restaurant].unstack("aspect", fill_value=0)
+        mentions = mentions.reindex(rows.index, fill_value=0)
+        for aspect in mentions.sum().nlargest(top_aspects).index:
+            aspect_series[aspect] = [
+                {"period_start": start.date().isoformat(), "mentions": int(n)}
+                for start, n in mentions[aspect].items()
+            ]
+
+    return {
+        "restaurant": restaurant,
+        "granularity": granularity,
+        "window": window,
+        "trend": {"direction": direction, "slope_per_bucket": slope},
+        "buckets": series,
+        "aspects": aspect_series,
+    }
@@ -0,0 +1,312 @@
+# Background refresh of a watchlist of places
+# -------------------------------------------------------------------
+# Client restaurants are re-analysed ahead of demand so that /analyze
+# for them is served from the result cache. During the off-peak window
+# (WATCHLIST_OFFPEAK_HOURS, local time) the scheduler thread ranks the
+# due places by
+#   priority = (1 + demand) * staleness
+#   demand     /analyze requests for the place, exponentially decayed
+#              with WATCHLIST_DEMAND_HALF_LIFE_SEC
+#   staleness  seconds since its last successful refresh
+# and runs the regular /analyze job for each through result_cache.warm,
+# under the key of a default /analyze request, pinned and fresh for
+# WATCHLIST_RESULT_TTL_SEC. A place is due once its last refresh is
+# WATCHLIST_REFRESH_SEC old or its cached result is gone (restart, new
+# model version). The scheduler's Google and RapidAPI calls are paced
+# by token buckets; failed or degraded refreshes back off for
+# WATCHLIST_RETRY_SEC.
+#
+# The result cache lives in the serving process, so the scheduler runs
+# there too (WATCHLIST_ENABLED); the watchlist and per-place state are
+# kept in WATCHLIST_PATH across restarts.
+# -------------------------------------------------------------------
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.services.pipeline import PlaceNotFound, analysis_job
+from app.services.result_cache import cache_key, entry_status, invalidate, warm
+from app.services.summarizer import SUMMARY_MODE
+from app.utils.log import log_event
+from app.utils.metrics import Counter, register
+from app.utils.resilience import (
+    BATCH_DEADLINE_SEC, REQUEST_DEADLINE_SEC, RateLimiter, UpstreamUnavailable, deadline_scope,
+)
+
+WATCHLIST_ENABLED = os.getenv("WATCHLIST_ENABLED", "false").lower() in ("1", "true", "yes")
+WATCHLIST_PATH = Path(os.getenv("WATCHLIST_PATH", "store/watchlist.json"))
+WATCHLIST_OFFPEAK_HOURS = os.getenv("WATCHLIST_OFFPEAK_HOURS", "1-6")
+WATCHLIST_REFRESH_SEC = float(os.getenv("WATCHLIST_REFRESH_SEC", str(6 * 3600)))
+WATCHLIST_RESULT_TTL_SEC = float(os.getenv("WATCHLIST_RESULT_TTL_SEC", str(24 * 3600)))
+WATCHLIST_RETRY_SEC = float(os.getenv("WATCHLIST_RETRY_SEC", "900"))
+WATCHLIST_POLL_SEC = float(os.getenv("WATCHLIST_POLL_SEC", "60"))
+WATCHLIST_DEMAND_HALF_LIFE_SEC = float(os.getenv("WATCHLIST_DEMAND_HALF_LIFE_SEC", str(7 * 24 * 3600)))
+WATCHLIST_GOOGLE_PER_MIN = float(os.getenv("WATCHLIST_GOOGLE_PER_MIN", "30"))
+WATCHLIST_RAPIDAPI_PER_MIN = float(os.getenv("WATCHLIST_RAPIDAPI_PER_MIN", "12"))
+WATCHLIST_MAX_PLACES = int(os.getenv("WATCHLIST_MAX_PLACES", "1000"))
+
+WATCHLIST_REFRESHES = register(Counter(
+    "revunet_watchlist_refreshes", "Background watchlist refreshes, by outcome."))
+
+_LLM_CALLS_PER_PLACE = 2        # recommendations + emotion summary (see pipeline.add_llm_insights)
+
+_google_limit = RateLimiter("google_places", WATCHLIST_GOOGLE_PER_MIN)
+_rapidapi_limit = RateLimiter("rapidapi", WATCHLIST_RAPIDAPI_PER_MIN, burst=_LLM_CALLS_PER_PLACE)
+
+_lock = threading.Lock()
+_places = None                  # place_id -> state dict, loaded lazily
+_stop = threading.Event()
+_wake = threading.Event()
+_refresh_now = threading.Event()
+_thread = None
+
+logger = logging.getLogger(__name__)
+
+
+def parse_hours(spec):
+    """Set of local hours covered by a spec like "1-6" or "22-24,0-5" (end exclusive, may wrap)."""
+    hours = set()
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        start, _, end = part.partition("-")
+        start = int(start)
+        end = int(end) if end else start + 1
+        hours.update(h % 24 for h in range(start, end if end > start else end + 24))
+    return hours
+
+
+_OFFPEAK = parse_hours(WATCHLIST_OFFPEAK_HOURS)
+
+
+def in_offpeak_window(now=None):
+    return time.localtime(now).tm_hour in _OFFPEAK
+
+
+def _analyze_key(place_id):
+    # the key a default /analyze request uses (see routes.analyze)
+    return cache_key("analyze", place_id, None)
+
+
+def _load_once():
+    global _places
+    if _places is None:
+        _places = {}
+        if WATCHLIST_PATH.exists():
+            with open(WATCHLIST_PATH) as f:
+                _places = json.load(f)
+    return _places
+
+
+def _save():
+    with _lock:
+        snapshot = json.dumps(_load_once(), indent=2)
+    WATCHLIST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = WATCHLIST_PATH.with_suffix(".json.tmp")
+    tmp.write_text(snapshot)
+    os.replace(tmp, WATCHLIST_PATH)
+
+
+def _demand(state, now):
+    """Request count decayed to now."""
+    age = max(0.0, now - state["demand_at"])
+    return state["demand"] * 0.5 ** (age / WATCHLIST_DEMAND_HALF_LIFE_SEC)
+
+
+def _priority(place_id, state, now):
+    """(due, priority) of one watched place."""
+    cached = entry_status(_analyze_key(place_id))
+    last = state["last_refreshed"]
+    staleness = now - last if last else WATCHLIST_RESULT_TTL_SEC
+    if cached is None:
+        staleness = max(staleness, WATCHLIST_REFRESH_SEC)
+    due = now >= state["retry_after"] and (cached != "fresh" or staleness >= WATCHLIST_REFRESH_SEC)
+    return due, (1.0 + _demand(state, now)) * staleness
+
+
+def add_places(place_ids):
+    """Watch place_ids; returns the ones that were not watched yet."""
+    now = time.time()
+    added = []
+    with _lock:
+        places = _load_once()
+        for place_id in dict.fromkeys(place_ids):
+            if place_id in places or len(places) >= WATCHLIST_MAX_PLACES:
+                continue
+            places[place_id] = {"added": now, "last_refreshed": None, "last_error": None,
+                                "retry_after": 0.0, "demand": 0.0, "demand_at": now}
+            added.append(place_id)
+    if added:
+        _save()
+        _wake.set()
+    return added
+
+
+def remove_place(place_id):
+    """Stop watching place_id and drop its cached results; False if it was not watched."""
+    with _lock:
+        removed = _load_once().pop(place_id, None) is not None
+    if removed:
+        _save()
+        invalidate("analyze", place_id)
+    return removed
+
+
+def record_request(place_id):
+    """Count one /analyze request towards a watched place's demand (no-op for others)."""
+    now = time.time()
+    with _lock:
+        state = _load_once().get(place_id)
+        if state is not None:
+            state["demand"] = _demand(state, now) + 1.0
+            state["demand_at"] = now
+
+
+def refresh_place(place_id):
+    """
+    Re-analyse one place into the result cache, paced by the rate limits.
+
+    Returns:
+        str: outcome ("refreshed", "degraded", "not_found", "unavailable" or "failed")
+    """
+    fetch, analyze = analysis_job(place_id)
+
+    def paced_fetch():
+        _google_limit.acquire()
+        with deadline_scope(REQUEST_DEADLINE_SEC):
+            return fetch()
+
+    def paced_analyze(place):
+        # only re-analysed when the reviews changed, so LLM tokens are spent here
+        if SUMMARY_MODE != "local":
+            _rapidapi_limit.acquire(_LLM_CALLS_PER_PLACE)
+        with deadline_scope(BATCH_DEADLINE_SEC):
+            return analyze(place)
+
+    error = None
+    try:
+        result = warm(_analyze_key(place_id), paced_fetch, paced_analyze, ttl=WATCHLIST_RESULT_TTL_SEC)
+        outcome = "degraded" if result.get("degraded") else "refreshed"
+        if outcome == "degraded":
+            error = f"degraded: {sorted(result.get('degraded_stages', {}))}"
+    except PlaceNotFound as e:
+        outcome, error = "not_found", str(e)
+    except UpstreamUnavailable as e:
+        outcome, error = "unavailable", str(e)
+    except Exception as e:
+        outcome, error = "failed", str(e)
+        log_event(logger, logging.ERROR, "watchlist refresh failed", place_id=place_id, exc_info=True)
+    WATCHLIST_REFRESHES.inc(outcome=outcome)
+
+    now = time.time()
+    with _lock:
+        state = _load_once().get(place_id)
+        if state is not None:
+            state["last_error"] = error
+            if outcome == "refreshed":
+                state["last_refreshed"] = now
+                state["retry_after"] = 0.0
+            else:
+                state["retry_after"] = now + WATCHLIST_RETRY_SEC
+    return outcome
+
+
+def due_places(now=None):
+    """Watched place ids that are due for a refresh, highest priority first."""
+    now = now or time.time()
+    with _lock:
+        places = dict(_load_once())
+    ranked = []
+    for place_id, state in places.items():
+        due, priority = _priority(place_id, state, now)
+        if due:
+            ranked.append((priority, place_id))
+    return [place_id for _, place_id in sorted(ranked, reverse=True)]
+
+
+def refresh_due(ignore_window=False):
+    """
+    One scheduler pass: refresh due places in priority order until none
+    are left, the off-peak window closes or the scheduler is stopped.
+
+    Returns:
+        dict: place_id -> outcome
+    """
+    outcomes = {}
+    for place_id in due_places():
+        if _stop.is_set() or not (ignore_window or in_offpeak_window()):
+            break
+        outcomes[place_id] = refresh_place(place_id)
+    if outcomes:
+        _save()
+    return outcomes
+
+
+def _loop():
+    while not _stop.is_set():
+        _wake.clear()
+        ignore_window = _refresh_now.is_set()
+        _refresh_now.clear()
+        if ignore_window or in_offpeak_window():
+            try:
+                refresh_due(ignore_window)
+            except Exception:
+                log_event(logger, logging.ERROR, "watchlist pass failed", exc_info=True)
+        _wake.wait(WATCHLIST_POLL_SEC)
+
+
+def start_scheduler():
+    """Start the background scheduler thread (once per process)."""
+    global _thread
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        _stop.clear()
+        _thread = threading.Thread(target=_loop, name="watchlist", daemon=True)
+        _thread.start()
+
+
+def stop_scheduler():
+    _stop.set()
+    _wake.set()
+
+
+def trigger_refresh():
+    """Ask the running scheduler for one pass now, outside the off-peak window."""
+    _refresh_now.set()
+    _wake.set()
+    return _thread is not None and _thread.is_alive()
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec="seconds") if ts else None
+
+
+def watchlist_status():
+    """Watched places with their priority and cache state, plus the scheduler settings."""
+    now = time.time()
+    with _lock:
+        places = dict(_load_once())
+    rows = []
+    for place_id, state in places.items():
+        due, priority = _priority(place_id, state, now)
+        rows.append({
+            "place_id": place_id,
+            "cached": entry_status(_analyze_key(place_id)),
+            "due": due,
+            "priority": priority,
+            "demand": _demand(state, now),
+            "last_refreshed": _iso(state["last_refreshed"]),
+            "last_error": state["last_error"],
+            "retry_after": _iso(state["retry_after"]),
+        })
+    rows.sort(key=lambda r: r["priority"], reverse=True)
+    return {
+        "scheduler_running": _thread is not None and _thread.is_alive(),
+        "offpeak_hours": sorted(_OFFPEAK),
+        "in_offpeak_window": in_offpeak_window(now),
+        "places": rows,
+    }
@@ -0,0 +1,154 @@
+# Near-duplicate review detection (MinHash + LSH banding)
+# -------------------------------------------------------------------
+# Reviews syndicated between Google and TripAdvisor, or copied with
+# small edits, are collapsed before the expensive inference stages.
+# Signatures are computed with vectorised NumPy universal hashing over
+# word 3-gram shingles; candidate pairs come from LSH band buckets and
+# are confirmed against the similarity threshold before merging.
+# -------------------------------------------------------------------
+
+import os
+import re
+import zlib
+
+import numpy as np
+
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+
+_SHINGLE_SIZE = 3
+_PRIME = np.uint64((1 << 31) - 1)      # Mersenne prime, keeps a*x+b inside uint64
+_MAX_HASH = np.uint64((1 << 31) - 2)
+_BLOCK = 1 << 14                        # shingles hashed per vectorised block (~16 MB temporaries at 128 perms)
+_SEED = 42
+
+
+def _shingles(text):
+    tokens = re.findall(r"[a-z0-9]+", str(text).lower())
+    if len(tokens) < _SHINGLE_SIZE:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + _SHINGLE_SIZE]) for i in range(len(tokens) - _SHINGLE_SIZE + 1)}
+
+
+def _permutations(num_perm):
+    rng = np.random.RandomState(_SEED)
+    a = rng.randint(1, int(_PRIME), size=num_perm).astype(np.uint64)
+    b = rng.randint(0, int(_PRIME), size=num_perm).astype(np.uint64)
+    return a[:, None], b[:, None]
+
+
+def minhash_signatures(texts, num_perm=DEDUP_NUM_PERM):
+    """
+    Compute MinHash signatures for a list of texts.
+
+    Returns:
+        (np.ndarray, np.ndarray): uint64 signatures of shape [n, num_perm]
+        and a boolean mask of texts that produced at least one shingle.
+    """
+    shingle_hashes = [
+        np.fromiter((zlib.crc32(s.encode()) for s in _shingles(t)), dtype=np.uint64)
+        for t in texts
+    ]
+    lengths = np.array([len(h) for h in shingle_hashes], dtype=np.int64)
+    has_shingles = lengths > 0
+    sigs = np.full((len(texts), num_perm), _MAX_HASH, dtype=np.uint64)
+    if not has_shingles.any():
+        return sigs, has_shingles
+
+    a, b = _permutations(num_perm)
+    docs = np.flatnonzero(has_shingles)
+    # hash blocks of whole documents so each block is one vectorised pass
+    start = 0
+    while start < len(docs):
+        end, total = start, 0
+        while end < len(docs) and (total == 0 or total + lengths[docs[end]] <= _BLOCK):
+            total += lengths[docs[end]]
+            end += 1
+        block = docs[start:end]
+        x = np.concatenate([shingle_hashes[i] for i in block]) % _PRIME
+        hashed = (a * x[None, :] + b) % _PRIME                  # [num_perm, total]
+        offsets = np.concatenate(([0], np.cumsum(lengths[block])[:-1]))
+        sigs[block] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        start = end
+    return sigs, has_shingles
+
+
+def _lsh_params(threshold, num_perm):
+    """Pick (bands, rows) whose S-curve midpoint (1/b)^(1/r) is closest to threshold."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        err = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or err < best[0]:
+            best = (err, bands, rows)
+    return best[1], best[2]
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def deduplicate_reviews(reviews, threshold=None, num_perm=DEDUP_NUM_PERM):
+    """
+    Drop near-duplicate reviews, keeping the first review of each cluster.
+
+    Args:
+        reviews (list[str]): Review texts (exact duplicates already removed).
+        threshold (float): Estimated Jaccard similarity at or above which two
+            reviews are considered duplicates. Defaults to DEDUP_THRESHOLD.
+
+    Returns:
+        (list[str], dict): The surviving reviews in input order, and stats
+        about the duplicate clusters that were collapsed.
+    """
+    threshold = DEDUP_THRESHOLD if threshold is None else float(threshold)
+    n = len(reviews)
+    stats = {
+        "threshold": threshold,
+        "input_reviews": n,
+        "unique_reviews": n,
+        "duplicates_removed": 0,
+        "duplicate_clusters": 0,
+        "largest_cluster": 1 if n else 0,
+    }
+    if n < 2:
+        return list(reviews), stats
+
+    sigs, has_shingles = minhash_signatures(reviews, num_perm)
+    bands, rows = _lsh_params(threshold, num_perm)
+
+    parent = list(range(n))
+    idx = np.flatnonzero(has_shingles)
+    for band in range(bands):
+        buckets = {}
+        band_sigs = np.ascontiguousarray(sigs[idx, band * rows:(band + 1) * rows])
+        for i, row in zip(idx, band_sigs):
+            buckets.setdefault(row.tobytes(), []).append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            first = members[0]
+            # confirm candidates with the full-signature similarity estimate
+            sim = (sigs[members[1:]] == sigs[first]).mean(axis=1)
+            for j, s in zip(members[1:], sim):
+                if s >= threshold:
+                    ri, rj = _find(parent, first), _find(parent, j)
+                    if ri != rj:
+                        parent[max(ri, rj)] = min(ri, rj)
+
+    roots = np.array([_find(parent, i) for i in range(n)])
+    keep = roots == np.arange(n)
+    sizes = np.bincount(roots, minlength=n)[keep]
+
+    stats.update({
+        "unique_reviews": int(keep.sum()),
+        "duplicates_removed": int(n - keep.sum()),
+        "duplicate_clusters": int((sizes > 1).sum()),
+        "largest_cluster": int(sizes.max()),
+    })
+    return [r for r, k in zip(reviews, keep) if k], stats
@@ -1,3 +1,58 @@
+import os
+from collections import Counter
+from itertools import chain, islice
+
+from app.utils.dedup import deduplicate_reviews
+from app.utils.metrics import timed_stage
+
+
+# Reviews per chunk for the streaming analysis stages; bounds their
+# working memory independently of how many reviews a place has
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+
+
+def chunked(iterable, size=STREAM_CHUNK_SIZE):
+    """Yield lists of up to size items from any iterable, without materialising it."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
 def combine_reviews(tripadvisor_reviews, google_reviews):
-    combined_reviews = list(set(tripadvisor_reviews + google_reviews))
+    # dict.fromkeys drops exact duplicates but keeps the input order stable;
+    # chain avoids building the concatenated list first
+    combined_reviews = list(dict.fromkeys(chain(tripadvisor_reviews, google_reviews)))
     return combined_reviews
+
+
+@timed_stage("dedup")
+def dedupe_sources(tripadvisor_reviews, google_reviews, threshold=None):
+    """
+    Combine both review sources and collapse exact and near duplicates.
+
+    Args:
+        tripadvisor_reviews (list[str]): Reviews matched from the CSV.
+        google_reviews (list[str]): Reviews fetched from Google Places.
+        threshold (float): Near-duplicate similarity threshold (see app.utils.dedup).
+
+    Returns:
+        tuple: (tripadvisor_kept, google_kept, all_reviews, stats) where each
+        surviving review is attributed to exactly one source.
+    """
+    all_reviews, stats = deduplicate_reviews(combine_reviews(tripadvisor_reviews, google_reviews), threshold)
+    stats["exact_duplicates_removed"] = len(tripadvisor_reviews) + len(google_reviews) - stats["input_reviews"]
+
+    remaining = Counter(all_reviews)
+
+    def take(reviews):
+        kept = []
+        for review in reviews:
+            if remaining[review] > 0:
+                remaining[review] -= 1
+                kept.append(review)
+        return kept
+
+    return take(tripadvisor_reviews), take(google_reviews), all_reviews, stats
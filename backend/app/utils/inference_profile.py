@@ -0,0 +1,69 @@
+# Per-host DistilBERT inference settings
+# -------------------------------------------------------------------
+# benchmarks/autotune.py sweeps batch size, max token length, torch
+# thread counts and inference_mode on the current machine and writes
+# the fastest configuration that still agrees with the reference
+# predictions to INFERENCE_PROFILE. The sentiment engine reads it once
+# at import. A profile recorded on a different host shape (CPU count,
+# architecture) is ignored, so a file copied across the fleet cannot
+# pin a small machine to a big machine's settings.
+# -------------------------------------------------------------------
+
+import os
+import json
+import logging
+import platform
+from functools import lru_cache
+
+INFERENCE_PROFILE_PATH = os.getenv("INFERENCE_PROFILE", "models/inference_profile.json")
+
+logger = logging.getLogger(__name__)
+
+# Used when there is no (matching) profile; None leaves torch's own default
+DEFAULT_SETTINGS = {
+    "batch_size": 16,
+    "max_len": 256,
+    "intra_op_threads": None,
+    "inter_op_threads": None,
+    "inference_mode": True,
+}
+
+
+def host_fingerprint():
+    """The host properties a profile is only valid for."""
+    return {"machine": platform.machine(), "cpu_count": os.cpu_count()}
+
+
+@lru_cache(maxsize=1)
+def load_inference_profile(path=INFERENCE_PROFILE_PATH):
+    """
+    Settings from the profile file merged over DEFAULT_SETTINGS.
+
+    Returns:
+        dict: batch_size, max_len, intra_op_threads, inter_op_threads,
+        inference_mode
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    if not path or not os.path.exists(path):
+        return settings
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable inference profile %s: %s", path, e)
+        return settings
+    if profile.get("host") != host_fingerprint():
+        logger.warning("Ignoring inference profile %s: tuned for %s, this host is %s; "
+                       "re-run python -m benchmarks.autotune", path, profile.get("host"), host_fingerprint())
+        return settings
+    settings.update({k: v for k, v in profile.get("settings", {}).items() if k in DEFAULT_SETTINGS})
+    return settings
+
+
+def save_inference_profile(profile, path=INFERENCE_PROFILE_PATH):
+    """Atomically write a profile ({host, settings, ...}) for load_inference_profile."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, path)
@@ -0,0 +1,150 @@
+# Structured, non-blocking logging
+# -------------------------------------------------------------------
+# Application loggers ("app.*") hand records to a bounded in-memory
+# queue (QueueHandler); one listener thread formats them as JSON lines
+# (or plain text) and writes them to stderr. A request thread never
+# waits on console I/O: when the queue is full the record is dropped
+# and counted in revunet_log_dropped.
+#
+# log_event() attaches key/value fields, each capped at
+# LOG_MAX_FIELD_CHARS, plus the current request id (taken from the
+# X-Request-ID header or generated, and echoed in the response).
+# log_payload() is for full prompts / response bodies: DEBUG level and
+# only for a LOG_PAYLOAD_SAMPLE_RATE share of calls.
+# -------------------------------------------------------------------
+
+import os
+import sys
+import copy
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+
+from app.utils.metrics import Counter, register
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()          # json | text
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "500"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.05"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+LOG_DROPPED = register(Counter(
+    "revunet_log_dropped", "Log records dropped because the log queue was full."))
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_FORMATTER = logging.Formatter()
+_setup_lock = threading.Lock()
+_listener = None
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def start_request_id(request_id=None):
+    """Bind a request id (given or new) to the current context; returns (id, token)."""
+    request_id = (request_id or uuid.uuid4().hex[:16])[:64]
+    return request_id, _request_id.set(request_id)
+
+
+def end_request_id(token):
+    _request_id.reset(token)
+
+
+def cap(value, limit=None):
+    """str(value), truncated to limit (default LOG_MAX_FIELD_CHARS) characters."""
+    limit = limit or LOG_MAX_FIELD_CHARS
+    text = value if isinstance(value, str) else str(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...(+{len(text) - limit} chars)"
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that tags the request id and drops records instead of blocking."""
+
+    def prepare(self, record):
+        # resolve everything that depends on the caller (args, traceback,
+        # request id) here; the listener only serialises
+        record = copy.copy(record)
+        record.request_id = _request_id.get()
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = cap(_FORMATTER.formatException(record.exc_info), 4 * LOG_MAX_FIELD_CHARS)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = getattr(record, "fields", None) or {}
+        line = f"{self.formatTime(record)} {record.levelname} {record.name} " \
+               f"[{getattr(record, 'request_id', None) or '-'}] {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Route the "app" loggers through the queue and listener thread (idempotent)."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        _listener = QueueListener(log_queue, stream, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)     # flush what is queued on shutdown
+
+        logger = logging.getLogger("app")
+        logger.setLevel(level)
+        logger.addHandler(_DroppingQueueHandler(log_queue))
+        logger.propagate = False
+
+
+def log_event(logger, level, event, exc_info=False, **fields):
+    """
+    Log `event` with size-capped key/value fields. Nothing is formatted
+    when the level is disabled.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, exc_info=exc_info,
+                   extra={"fields": {k: cap(v) if isinstance(v, str) else v for k, v in fields.items()}})
+
+
+def log_payload(logger, event, **fields):
+    """Log a verbose payload (prompt, raw response) at DEBUG for a sampled share of calls."""
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_PAYLOAD_SAMPLE_RATE:
+        log_event(logger, logging.DEBUG, event, sampled=True, **fields)
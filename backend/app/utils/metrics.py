@@ -0,0 +1,177 @@
+# In-process metrics with Prometheus text exposition
+# -------------------------------------------------------------------
+# Counters, gauges and fixed-bucket histograms guarded by one lock
+# each; recording a sample is a dict lookup plus a bisect, cheap enough
+# to leave on in production. render_prometheus() serialises everything
+# for the /metrics endpoint.
+# -------------------------------------------------------------------
+
+import time
+import threading
+from functools import wraps
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# seconds; covers sub-ms lexicon stages up to multi-second LLM calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    @property
+    def family(self):
+        """Name used in the HELP / TYPE lines."""
+        return self.name
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    @property
+    def family(self):
+        # the text format names a counter family after its _total sample
+        return self.name + "_total"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield self.family + _format_labels(key), value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield self.name + _format_labels(key), value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _samples(self):
+        for key, (counts, total, n) in self._values.items():
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                yield self.name + "_bucket" + _format_labels(key, [("le", bound)]), cumulative
+            yield self.name + "_bucket" + _format_labels(key, [("le", "+Inf")]), n
+            yield self.name + "_sum" + _format_labels(key), total
+            yield self.name + "_count" + _format_labels(key), n
+
+
+_registry = []
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+# ---------------- Application metrics ----------------
+STAGE_LATENCY = register(Histogram(
+    "revunet_stage_latency_seconds", "Latency of each analysis stage."))
+REQUEST_LATENCY = register(Histogram(
+    "revunet_request_latency_seconds", "End-to-end latency per endpoint."))
+BATCH_SIZE = register(Histogram(
+    "revunet_inference_batch_size", "Texts per model forward pass.", buckets=SIZE_BUCKETS))
+TOKENS_PROCESSED = register(Counter(
+    "revunet_tokens_processed", "Tokens fed to transformer models (incl. padding)."))
+CACHE_REQUESTS = register(Counter(
+    "revunet_cache_requests", "Cache lookups by cache and result (hit/miss)."))
+IN_FLIGHT = register(Gauge(
+    "revunet_requests_in_flight", "Requests currently being served."))
+STAGE_ERRORS = register(Counter(
+    "revunet_stage_errors", "Exceptions raised inside instrumented stages."))
+
+
+@contextmanager
+def stage_timer(stage):
+    """Record the wall time of a block under revunet_stage_latency_seconds{stage=...}."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - t0, stage=stage)
+
+
+def timed_stage(stage):
+    """Decorator form of stage_timer."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def render_prometheus():
+    """Serialise all registered metrics in the Prometheus text format (0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.family} {metric.help}")
+        lines.append(f"# TYPE {metric.family} {metric.kind}")
+        with metric._lock:
+            samples = list(metric._samples())
+        for name, value in samples:
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,36 @@
+import spacy
+
+# Lazy singleton: spaCy's English pipeline takes ~1s to load, so every
+# stage that needs it shares one instance instead of loading per request.
+_nlp = None
+
+_ASPECT_SKIP_POS = {"DET", "PRON"}
+
+
+def load_spacy_once(model="en_core_web_sm"):
+    """
+    Load the spaCy English model once and return the shared instance.
+
+    Returns:
+        spacy.language.Language: The loaded pipeline.
+    """
+    global _nlp
+    if _nlp is None:
+        _nlp = spacy.load(model)
+    return _nlp
+
+
+def aspect_key(chunk):
+    """
+    Aspect name of a noun chunk: lowercased, without determiners and
+    pronouns, so "the food" and "food" count as one aspect.
+
+    Returns:
+        str: the name, "" if nothing is left (e.g. the chunk "it")
+    """
+    return " ".join(t.lower_ for t in chunk if t.pos_ not in _ASPECT_SKIP_POS)
+
+
+def chunk_aspects(span):
+    """Aspect names (see aspect_key) of the noun chunks of a doc or sentence, in order."""
+    return [key for key in (aspect_key(chunk) for chunk in span.noun_chunks) if key]
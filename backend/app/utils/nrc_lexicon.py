@@ -1,8 +1,14 @@
 import os
+from functools import lru_cache
 
+# The ten NRC categories (eight emotions plus positive/negative sentiment)
+EMOTIONS = ["anger", "anticipation", "disgust", "fear", "joy",
+            "negative", "positive", "sadness", "surprise", "trust"]
+
+@lru_cache(maxsize=1)
 def load_nrc_lexicon():
     """
-    Load the NRC Emotion Lexicon into a dictionary.
+    Load the NRC Emotion Lexicon into a dictionary (parsed once per process).
 
     Returns:
         dict: A dictionary where keys are words and values are lists of associated emotions.
@@ -22,3 +28,11 @@ def load_nrc_lexicon():
                 nrc_lexicon.setdefault(word, []).append(emotion)
     
     return nrc_lexicon
+
+
+@lru_cache(maxsize=1)
+def load_lexicon_ids():
+    """NRC lexicon with emotion names replaced by EMOTIONS column indices."""
+    index = {emotion: i for i, emotion in enumerate(EMOTIONS)}
+    return {word: [index[e] for e in emotions if e in index]
+            for word, emotions in load_nrc_lexicon().items()}
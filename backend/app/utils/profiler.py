@@ -0,0 +1,172 @@
+# On-demand sampling profiler for individual requests
+# -------------------------------------------------------------------
+# A daemon thread snapshots the request thread's Python stack every
+# PROFILE_INTERVAL_MS and counts identical stacks. The result is saved
+# in the folded format understood by flamegraph.pl / speedscope /
+# inferno, and optionally summarised into the JSON response.
+#
+# Profiling is opt-in: hooks are only registered when PROFILE_ENABLED
+# is set, so it costs nothing when disabled. A request is profiled when
+# it sends "X-Profile: <PROFILE_TOKEN>" or falls in the randomly sampled
+# PROFILE_SAMPLE_RATE share of /analyze and /compare traffic. Only the
+# newest PROFILE_MAX_FILES dumps are kept in PROFILE_DIR (0 keeps all).
+# -------------------------------------------------------------------
+
+import os
+import sys
+import hmac
+import json
+import time
+import random
+import threading
+from collections import Counter
+from pathlib import Path
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() == "true"
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000.0
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILED_ENDPOINTS = {"main.analyze", "main.compare"}
+
+_prune_lock = threading.Lock()
+
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        # removed meanwhile (e.g. by another worker)
+        return 0.0
+
+
+def _prune(directory, keep):
+    """Delete the oldest .folded dumps in directory beyond the newest `keep`."""
+    with _prune_lock:
+        dumps = sorted(directory.glob("*.folded"), key=_mtime)
+        for old in dumps[:max(0, len(dumps) - keep)]:
+            old.unlink(missing_ok=True)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Statistical profiler for one thread."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = self.stopped = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+        return self
+
+    def folded(self):
+        """Collapsed stacks, one 'frame;frame;frame count' line per unique stack."""
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def summary(self, top=15):
+        """Top functions by self and inclusive sample share."""
+        total = sum(self.stacks.values())
+        self_counts, incl_counts = Counter(), Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += n
+            for frame in set(frames):
+                incl_counts[frame] += n
+
+        def share(counts):
+            return [{"function": f, "samples": n, "percent": round(100.0 * n / total, 1)}
+                    for f, n in counts.most_common(top)]
+
+        return {
+            "duration_sec": round(self.stopped - self.started, 4),
+            "interval_ms": self.interval * 1000.0,
+            "samples": total,
+            "top_self": share(self_counts) if total else [],
+            "top_inclusive": share(incl_counts) if total else [],
+        }
+
+    def save(self, name):
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / f"{name}.folded"
+        path.write_text(self.folded())
+        if PROFILE_MAX_FILES > 0:
+            _prune(PROFILE_DIR, PROFILE_MAX_FILES)
+        return path
+
+
+def _requested_mode(request):
+    """'summary' if an authorised caller asked for a profile, 'sampled' for random sampling, else None."""
+    if request.endpoint not in PROFILED_ENDPOINTS:
+        return None
+    header = request.headers.get("X-Profile")
+    if header and PROFILE_TOKEN and hmac.compare_digest(header, PROFILE_TOKEN):
+        return "summary"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def init_profiler(app):
+    """Register the per-request profiling hooks on app (no-op unless PROFILE_ENABLED)."""
+    if not PROFILE_ENABLED:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        mode = _requested_mode(request)
+        if mode:
+            g._profile_mode = mode
+            g._profiler = SamplingProfiler(threading.get_ident()).start()
+
+    @app.after_request
+    def _finish_profile(response):
+        profiler = g.pop("_profiler", None)
+        if profiler is None:
+            return response
+        profiler.stop()
+        name = f"{request.endpoint.split('.')[-1]}-{time.strftime('%Y%m%d-%H%M%S')}-{random.getrandbits(32):08x}"
+        path = profiler.save(name)
+        response.headers["X-Profile-File"] = path.name
+        if g.pop("_profile_mode", None) == "summary" and response.is_json:
+            body = response.get_json()
+            if isinstance(body, dict):
+                body["_profile"] = dict(profiler.summary(), file=path.name)
+                response.set_data(json.dumps(body))
+        return response
+
+    @app.teardown_request
+    def _abort_profile(exc):
+        # after_request is skipped on unhandled errors; don't leak the sampler thread
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            profiler.stop()
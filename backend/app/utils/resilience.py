@@ -0,0 +1,241 @@
+# Request deadlines, stage timeouts, circuit breakers and rate limits
+# -------------------------------------------------------------------
+# A Deadline is attached to the current request through a context
+# variable, so every stage can ask how much budget is left without
+# threading it through each call. External calls go through
+# guarded_post / a CircuitBreaker: timeouts are capped by both the
+# stage limit and the remaining request budget, and an upstream that
+# keeps failing is short-circuited instead of holding worker threads.
+# -------------------------------------------------------------------
+
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import requests
+
+from app.utils.metrics import Counter, Gauge, register
+
+REQUEST_DEADLINE_SEC = float(os.getenv("REQUEST_DEADLINE_SEC", "25"))
+BATCH_DEADLINE_SEC = float(os.getenv("BATCH_DEADLINE_SEC", "120"))
+LLM_TIMEOUT_SEC = float(os.getenv("LLM_TIMEOUT_SEC", "10"))
+GOOGLE_TIMEOUT_SEC = float(os.getenv("GOOGLE_TIMEOUT_SEC", "5"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SEC = float(os.getenv("BREAKER_RESET_SEC", "30"))
+
+BREAKER_STATE = register(Gauge(
+    "revunet_circuit_breaker_open", "1 while a circuit breaker is open or half-open."))
+BREAKER_REJECTIONS = register(Counter(
+    "revunet_circuit_breaker_rejections", "Calls short-circuited by an open breaker."))
+DEGRADED_STAGES = register(Counter(
+    "revunet_degraded_stages", "Optional stages skipped or replaced, by stage and reason."))
+
+
+class UpstreamUnavailable(Exception):
+    """Base class for 'this stage could not run in time' conditions."""
+
+    reason = "unavailable"
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    reason = "deadline"
+
+
+class StageTimeout(UpstreamUnavailable):
+    reason = "timeout"
+
+
+class CircuitOpen(UpstreamUnavailable):
+    reason = "circuit_open"
+
+
+class Saturated(UpstreamUnavailable):
+    reason = "saturated"
+
+
+class Deadline:
+    """Absolute point in time by which the current request should finish."""
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0.0
+
+
+_current_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline():
+    return _current_deadline.get()
+
+
+def remaining_budget(default=float("inf")):
+    """Seconds left in the current request's deadline (default if there is none)."""
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline is not None else default
+
+
+def start_deadline(seconds):
+    """Attach a new deadline to the current context; returns a token for end_deadline."""
+    return _current_deadline.set(Deadline(seconds))
+
+
+def end_deadline(token):
+    _current_deadline.reset(token)
+
+
+@contextmanager
+def deadline_scope(seconds=REQUEST_DEADLINE_SEC):
+    token = _current_deadline.set(Deadline(seconds))
+    try:
+        yield _current_deadline.get()
+    finally:
+        _current_deadline.reset(token)
+
+
+def stage_timeout(cap):
+    """Timeout for the next call: the stage cap, shortened to the remaining budget."""
+    budget = remaining_budget()
+    if budget <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return min(cap, budget)
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker. After `failures` consecutive
+    failures calls are rejected for `reset_timeout` seconds, then a single
+    trial call decides whether to close again. Every call let through by
+    check() must end in record_success or record_failure, or the trial
+    slot stays taken.
+    """
+
+    def __init__(self, name, failures=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_SEC):
+        self.name = name
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+        BREAKER_REJECTIONS.inc(upstream=self.name)
+        return False
+
+    def check(self):
+        if not self.allow():
+            raise CircuitOpen(f"{self.name} circuit open")
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+        BREAKER_STATE.set(0, upstream=self.name)
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+        if self._opened_at is not None:
+            BREAKER_STATE.set(1, upstream=self.name)
+
+
+class RateLimiter:
+    """
+    Token bucket: `rate_per_min` tokens per minute (0 = unlimited), at
+    most `burst` saved up. acquire() blocks until enough tokens have
+    accumulated, so it is meant for background work that may wait, not
+    for request threads.
+    """
+
+    def __init__(self, name, rate_per_min, burst=1):
+        self.name = name
+        self.rate = rate_per_min / 60.0
+        self.burst = max(1.0, float(burst))
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1, timeout=None):
+        """Take `tokens` (capped at burst); returns False if that would take longer than timeout."""
+        if self.rate <= 0:
+            return True
+        tokens = min(float(tokens), self.burst)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(min(wait, 1.0))
+
+
+RAPIDAPI_BREAKER = CircuitBreaker("rapidapi")
+GOOGLE_BREAKER = CircuitBreaker("google_places")
+
+
+def guarded_post(url, breaker=RAPIDAPI_BREAKER, timeout=LLM_TIMEOUT_SEC, **kwargs):
+    """
+    requests.post bounded by the stage timeout, the request deadline and
+    the upstream's circuit breaker.
+
+    Raises:
+        CircuitOpen, DeadlineExceeded, StageTimeout: the call should be
+        treated as skipped; other request errors propagate unchanged.
+    """
+    timeout = stage_timeout(timeout)  # may raise DeadlineExceeded before touching the breaker
+    breaker.check()
+    try:
+        response = requests.post(url, timeout=timeout, **kwargs)
+    except requests.exceptions.Timeout as e:
+        breaker.record_failure()
+        raise StageTimeout(f"{breaker.name} timed out: {e}") from e
+    except Exception:
+        breaker.record_failure()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+def mark_degraded(result, stage, reason):
+    """Flag an analysis result as partial because `stage` was skipped or replaced."""
+    result["degraded"] = True
+    result.setdefault("degraded_stages", {})[stage] = reason
+    DEGRADED_STAGES.inc(stage=stage, reason=reason)
@@ -0,0 +1,96 @@
+# Space-Saving heavy-hitter sketch (Metwally et al., 2005)
+# -------------------------------------------------------------------
+# Keeps at most `capacity` counters. Every tracked item has a count
+# that overestimates its true frequency by at most its recorded error,
+# and every error is at most N / capacity for a stream of total weight
+# N, so any item more frequent than N / capacity is tracked. Sketches
+# are mergeable (Agarwal et al., 2012): an item missing from a full
+# sketch is assumed to have that sketch's minimum count, the counts are
+# summed and the top `capacity` kept. Updates are applied in batches of
+# exact local counts, which is a merge with an error-free sketch.
+#
+# Each entry can carry extra tallies (e.g. positive / negative mentions)
+# that are only summed while the item is tracked, so they describe the
+# (count - error) occurrences that are known for sure.
+# -------------------------------------------------------------------
+
+import heapq
+
+
+class SpaceSaving:
+    """Mergeable top-k sketch; see the module comment."""
+
+    def __init__(self, capacity, n_tallies=0):
+        self.capacity = capacity
+        self.n_tallies = n_tallies
+        self.entries = {}       # item -> [count, error, *tallies]
+        self.total = 0          # stream weight seen, exact
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _floor(self):
+        """Count assumed for an untracked item (the minimum, once the sketch is full)."""
+        if len(self.entries) < self.capacity:
+            return 0
+        return min(entry[0] for entry in self.entries.values())
+
+    def _truncate(self):
+        if len(self.entries) > self.capacity:
+            keep = heapq.nlargest(self.capacity, self.entries.items(), key=lambda kv: kv[1][0])
+            self.entries = dict(keep)
+
+    def update(self, counts, tallies=None):
+        """
+        Add a batch of exact counts.
+
+        Args:
+            counts (dict): item -> weight
+            tallies (dict | None): item -> list of n_tallies extra weights
+        """
+        floor = self._floor()
+        zero = [0] * self.n_tallies
+        for item, weight in counts.items():
+            entry = self.entries.get(item)
+            if entry is None:
+                entry = self.entries[item] = [floor, floor, *zero]
+            entry[0] += weight
+            if tallies is not None and item in tallies:
+                for i, value in enumerate(tallies[item]):
+                    entry[2 + i] += value
+            self.total += weight
+        self._truncate()
+
+    def merge(self, other):
+        """Fold another sketch (same n_tallies) into this one."""
+        floor, other_floor = self._floor(), other._floor()
+        for item, (count, error, *tallies) in other.entries.items():
+            entry = self.entries.get(item)
+            if entry is None:
+                entry = self.entries[item] = [floor, floor, *([0] * self.n_tallies)]
+            entry[0] += count
+            entry[1] += error
+            for i, value in enumerate(tallies):
+                entry[2 + i] += value
+        for item, entry in self.entries.items():
+            if item not in other.entries:
+                entry[0] += other_floor
+                entry[1] += other_floor
+        self.total += other.total
+        self._truncate()
+        return self
+
+    def estimate(self, item):
+        """Upper bound on the count of item."""
+        entry = self.entries.get(item)
+        return entry[0] if entry is not None else self._floor()
+
+    def top(self, n):
+        """
+        The n heaviest items.
+
+        Returns:
+            list[tuple]: (item, count, error, *tallies), heaviest first
+        """
+        best = heapq.nlargest(n, self.entries.items(), key=lambda kv: kv[1][0])
+        return [(item, *entry) for item, entry in best]
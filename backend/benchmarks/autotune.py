@@ -0,0 +1,199 @@
+# Inference autotuner for the DistilBERT sentiment engine
+# -------------------------------------------------------------------
+# Measures, on this machine and against a fixed-seed sample of
+# trip_res_reviews.csv, the sentiment throughput of:
+#   - intra-op threads (powers of two up to the CPU count)
+#   - torch.inference_mode vs no_grad
+#   - batch size
+#   - max tokens per review (the token budget of a batch)
+# one setting at a time, keeping the best value of each before moving
+# on to the next. Inter-op threads can only be set before torch starts
+# its thread pools, so every inter-op candidate runs in its own worker
+# process.
+#
+# A configuration only qualifies if its labels agree with the reference
+# run (batch 16, 256 tokens, no_grad, torch's default threads) on at
+# least --min-agreement of the sample, so a shorter token budget cannot
+# win by truncating away the verdict. The best qualifying configuration
+# is written to the inference profile (app.utils.inference_profile),
+# which the sentiment engine loads at startup.
+#
+# Usage (from backend/):
+#   python -m benchmarks.autotune
+#   python -m benchmarks.autotune --sample 256 --batch-sizes 16,32 --dry-run
+# -------------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from app.utils.inference_profile import INFERENCE_PROFILE_PATH, host_fingerprint, save_inference_profile
+
+SEED = 42
+_REFERENCE = {"intra_op_threads": None, "inference_mode": False, "batch_size": 16, "max_len": 256}
+
+
+def _sample_reviews(n, path="trip_res_reviews.csv"):
+    reviews = pd.read_csv(path, usecols=["Review"])["Review"].dropna().astype(str)
+    return reviews.sample(n=min(n, len(reviews)), random_state=SEED).tolist()
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def _default_threads():
+    cpus = os.cpu_count() or 1
+    threads = {cpus}
+    n = 1
+    while n < cpus:
+        threads.add(n)
+        n *= 2
+    return sorted(threads)
+
+
+def _measure(sentiment, texts, settings, repeats):
+    """Median reviews/sec and the predicted label ids of one configuration."""
+    import torch
+
+    torch.set_num_threads(settings["intra_op_threads"])
+    run = lambda: list(sentiment.iter_predictions(
+        texts, settings["batch_size"], settings["max_len"], settings["inference_mode"]))
+    run()  # warm-up: allocator and oneDNN caches for this shape mix
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        probs = run()
+        timings.append(time.perf_counter() - t0)
+    labels = np.array([max(("neg", "neu", "pos"), key=p.get) for p in probs])
+    return len(texts) / float(np.median(timings)), labels
+
+
+def _worker(args):
+    """Sweep everything but inter-op threads in this process; write the trials to args.result_file."""
+    import torch
+
+    if args.inter_op:
+        torch.set_num_interop_threads(args.inter_op)
+    from app.services import sentiment
+
+    texts = _sample_reviews(args.sample)
+    sentiment._load_model_once()
+    default_threads = torch.get_num_threads()
+
+    baseline = dict(_REFERENCE, intra_op_threads=default_threads)
+    baseline_rate, reference = _measure(sentiment, texts, baseline, args.repeats)
+    trials = [dict(baseline, inter_op_threads=args.inter_op or None,
+                   reviews_per_sec=baseline_rate, agreement=1.0, baseline=True)]
+
+    best = dict(baseline)
+    sweeps = [
+        ("intra_op_threads", _int_list(args.threads) if args.threads else _default_threads()),
+        ("inference_mode", [False, True]),
+        ("batch_size", _int_list(args.batch_sizes)),
+        ("max_len", _int_list(args.max_lens)),
+    ]
+    for key, candidates in sweeps:
+        qualifying = []
+        for value in candidates:
+            settings = dict(best, **{key: value})
+            rate, labels = _measure(sentiment, texts, settings, args.repeats)
+            agreement = float((labels == reference).mean())
+            trials.append(dict(settings, inter_op_threads=args.inter_op or None,
+                               reviews_per_sec=rate, agreement=agreement))
+            print(f"  inter_op={args.inter_op or 'default'} {key}={value}: "
+                  f"{rate:.1f} reviews/s, agreement {agreement:.3f}", flush=True)
+            if agreement >= args.min_agreement:
+                qualifying.append((rate, value))
+        if qualifying:
+            best[key] = max(qualifying, key=lambda rv: rv[0])[1]
+
+    with open(args.result_file, "w") as f:
+        json.dump({"trials": trials, "default_threads": default_threads}, f)
+
+
+def _run_worker(args, inter_op):
+    """Run one worker process with inter_op inter-op threads (0 = torch default)."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result_file = f.name
+    cmd = [sys.executable, "-m", "benchmarks.autotune", "--worker",
+           "--inter-op", str(inter_op), "--result-file", result_file,
+           "--sample", str(args.sample), "--repeats", str(args.repeats),
+           "--batch-sizes", args.batch_sizes, "--max-lens", args.max_lens,
+           "--min-agreement", str(args.min_agreement)]
+    if args.threads:
+        cmd += ["--threads", args.threads]
+    # the worker must not pick up an existing profile's thread settings
+    env = dict(os.environ, INFERENCE_PROFILE="")
+    try:
+        subprocess.run(cmd, env=env, check=True)
+        with open(result_file) as f:
+            return json.load(f)
+    finally:
+        os.unlink(result_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune DistilBERT inference settings for this host.")
+    parser.add_argument("--sample", type=int, default=512, help="reviews sampled from trip_res_reviews.csv")
+    parser.add_argument("--repeats", type=int, default=3, help="timed passes per configuration (median)")
+    parser.add_argument("--threads", default="", help="intra-op thread counts (default: 1, 2, 4, ... CPUs)")
+    parser.add_argument("--inter-op-threads", default="0,1,2", help="inter-op thread counts; 0 = torch default")
+    parser.add_argument("--batch-sizes", default="8,16,32,64")
+    parser.add_argument("--max-lens", default="128,192,256")
+    parser.add_argument("--min-agreement", type=float, default=0.99,
+                        help="minimum label agreement with the reference configuration")
+    parser.add_argument("--output", default=INFERENCE_PROFILE_PATH, help="profile file to write")
+    parser.add_argument("--dry-run", action="store_true", help="report the best configuration without saving it")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--inter-op", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args)
+        return
+
+    trials, baseline = [], None
+    for inter_op in _int_list(args.inter_op_threads):
+        print(f"Sweeping with inter-op threads = {inter_op or 'default'}")
+        result = _run_worker(args, inter_op)
+        trials.extend(result["trials"])
+        if inter_op == 0:
+            baseline = result["trials"][0]
+
+    qualifying = [t for t in trials if t["agreement"] >= args.min_agreement]
+    best = max(qualifying, key=lambda t: t["reviews_per_sec"])
+    settings = {k: best[k] for k in ("batch_size", "max_len", "intra_op_threads",
+                                     "inter_op_threads", "inference_mode")}
+    print(f"Best: {settings} at {best['reviews_per_sec']:.1f} reviews/s (agreement {best['agreement']:.3f})")
+    if baseline is not None:
+        print(f"Reference settings: {baseline['reviews_per_sec']:.1f} reviews/s "
+              f"({best['reviews_per_sec'] / baseline['reviews_per_sec'] - 1.0:+.0%})")
+    if args.dry_run:
+        return
+
+    import torch
+    save_inference_profile({
+        "host": host_fingerprint(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "torch": torch.__version__,
+        "sample_size": args.sample,
+        "settings": settings,
+        "reviews_per_sec": best["reviews_per_sec"],
+        "baseline_reviews_per_sec": baseline["reviews_per_sec"] if baseline else None,
+        "trials": trials,
+    }, args.output)
+    print(f"Saved inference profile to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
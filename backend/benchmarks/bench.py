@@ -0,0 +1,235 @@
+# Offline benchmark suite for the analysis stages
+# -------------------------------------------------------------------
+# Samples review sets (default 10 / 100 / 1k / 10k) from
+# trip_res_reviews.csv with a fixed seed and measures, per stage and
+# for the whole /analyze pipeline (Google and RapidAPI stubbed out):
+#   - throughput (reviews/sec at the median run)
+#   - p50 / p95 latency over --repeats runs
+#   - peak Python heap (tracemalloc, in one extra untimed run, since
+#     tracing slows allocation-heavy stages) and process RSS high-water mark
+# The request deadline is lifted so that large pipeline runs are measured
+# in full instead of coming back degraded.
+#
+# Usage (from backend/):
+#   python -m benchmarks.bench --output bench_results.json
+#   python -m benchmarks.bench --compare bench_baseline.json --tolerance 0.15
+# -------------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tracemalloc
+import subprocess
+from unittest import mock
+
+import numpy as np
+
+from app.services import reviews as review_source
+from app.services.sentiment import analyze_sentiment
+from app.services.emotions import detect_emotions
+from app.services.sentiment_by_aspect import aspect_based_sentiment_analysis
+from app.services.analytics import frequent_phrases_analysis
+from app.utils.helpers import dedupe_sources
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+SEED = 42
+PIPELINE_DEADLINE_SEC = 24 * 3600    # replaces the serving deadline for /analyze runs
+
+
+class _FakeResponse:
+    status_code = 200
+    headers = {"Content-Type": "application/json"}
+
+    def __init__(self, payload):
+        self._payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+
+def _fake_rapidapi_post(url, json=None, headers=None, **kwargs):
+    result = ('{"title": "Benchmark", "overall_aspect": "N/A", '
+              '"for_owners": [], "for_customers": []}')
+    return _FakeResponse({"status": True, "result": result})
+
+
+def _sample_reviews(n):
+    df = review_source.reviews_df.dropna(subset=["Review"])
+    replace = n > len(df)
+    return df["Review"].astype(str).sample(n=n, replace=replace, random_state=SEED).tolist()
+
+
+def _restaurant_names(n):
+    names = review_source.reviews_df["Restaurant"].dropna().unique()
+    rng = np.random.RandomState(SEED)
+    return rng.choice(names, size=min(n, 50), replace=True).tolist()
+
+
+_client = None
+
+
+def _test_client():
+    """Flask test client, created once so app setup is not timed."""
+    global _client
+    if _client is None:
+        from app import create_app
+        _client = create_app().test_client()
+    return _client
+
+
+def _run_pipeline(reviews):
+    """Full /analyze through the Flask test client, network calls stubbed."""
+    client = _test_client()
+    with mock.patch("app.services.pipeline.fetch_google_reviews",
+                    return_value=("Benchmark Place", list(reviews))), \
+         mock.patch("requests.post", side_effect=_fake_rapidapi_post), \
+         mock.patch("app.REQUEST_DEADLINE_SEC", PIPELINE_DEADLINE_SEC):
+        # bypass the result cache, or every run after the first would time a hit
+        resp = client.post("/analyze", json={"location_id": "benchmark", "bypass_cache": True})
+    if resp.status_code != 200:
+        raise RuntimeError(f"/analyze returned {resp.status_code}: {resp.get_data(as_text=True)[:200]}")
+    body = resp.get_json()
+    if body.get("degraded"):
+        raise RuntimeError(f"/analyze came back degraded: {body.get('degraded_stages')}")
+
+
+STAGES = {
+    "sentiment": lambda reviews: analyze_sentiment(reviews),
+    "emotions": lambda reviews: detect_emotions(reviews),
+    "aspects": lambda reviews: aspect_based_sentiment_analysis(reviews),
+    "phrases": lambda reviews: frequent_phrases_analysis(reviews),
+    "dedup": lambda reviews: dedupe_sources(reviews[: len(reviews) // 2], reviews[len(reviews) // 2:]),
+    "tripadvisor_match": lambda names: [review_source.fetch_tripadvisor_reviews(n) for n in names],
+    "pipeline": _run_pipeline,
+}
+
+
+def _max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def bench_stage(name, size, repeats):
+    fn = STAGES[name]
+    data = _restaurant_names(size) if name == "tripadvisor_match" else _sample_reviews(size)
+    fn(data)  # warm-up: lazy model loads, caches, app setup
+
+    latencies = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(data)
+        latencies.append(time.perf_counter() - t0)
+
+    # heap in a separate run: tracing every allocation would inflate the timings
+    tracemalloc.start()
+    try:
+        fn(data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    p50 = float(np.percentile(latencies, 50))
+    return {
+        "stage": name,
+        "size": size,
+        "items": len(data),
+        "repeats": repeats,
+        "p50_sec": p50,
+        "p95_sec": float(np.percentile(latencies, 95)),
+        "throughput_per_sec": len(data) / p50 if p50 > 0 else None,
+        "peak_heap_mb": peak / (1024.0 * 1024.0),
+        "max_rss_mb": _max_rss_mb(),
+    }
+
+
+def _environment():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        commit = None
+    try:
+        import torch
+        torch_version, threads = torch.__version__, torch.get_num_threads()
+    except Exception:
+        torch_version, threads = None, None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch_version,
+        "torch_threads": threads,
+        "seed": SEED,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return rows whose p50 latency or peak heap grew by more than tolerance."""
+    base = {(r["stage"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results["results"]:
+        b = base.get((r["stage"], r["size"]))
+        if b is None:
+            continue
+        for metric in ("p50_sec", "peak_heap_mb"):
+            if b[metric] and r[metric] > b[metric] * (1.0 + tolerance):
+                regressions.append({
+                    "stage": r["stage"], "size": r["size"], "metric": metric,
+                    "baseline": b[metric], "current": r[metric],
+                    "change": r[metric] / b[metric] - 1.0,
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the review analysis stages.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of: " + ", ".join(STAGES))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--max-repeats-large", type=int, default=2, help="repeats for sizes >= 10k")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="baseline JSON produced by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown vs baseline")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {"environment": _environment(), "results": []}
+    for stage in stages:
+        for size in sizes:
+            repeats = min(args.repeats, args.max_repeats_large) if size >= 10000 else args.repeats
+            row = bench_stage(stage, size, repeats)
+            results["results"].append(row)
+            print(f"{stage:>18} n={size:<6} p50={row['p50_sec']:.4f}s p95={row['p95_sec']:.4f}s "
+                  f"{row['throughput_per_sec'] or 0:.1f}/s heap={row['peak_heap_mb']:.1f}MB")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['stage']} n={r['size']} {r['metric']}: "
+                  f"{r['baseline']:.4f} -> {r['current']:.4f} ({r['change']:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
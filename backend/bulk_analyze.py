@@ -0,0 +1,19 @@
+import argparse
+
+from app.services.bulk import run_bulk
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Score a large review CSV (sentiment, emotions, aspects) into Parquet parts "
+                    "plus per-restaurant aggregates. Re-run with the same arguments to resume.")
+    parser.add_argument("csv", help="review export (needs Restaurant and Review columns; Time optional)")
+    parser.add_argument("--output", default="bulk_output", help="output directory (also holds the checkpoint)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per chunk / Parquet part")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes for the emotion and aspect stages (default: CPUs - 1)")
+    args = parser.parse_args()
+
+    result = run_bulk(args.csv, args.output, chunk_size=args.chunk_size, workers=args.workers)
+    print(f"[✅] {result['rows']} reviews in {args.output} "
+          f"({result['chunks_processed']} chunks processed, {result['chunks_skipped']} resumed from checkpoint), "
+          f"{result['restaurants']} restaurants aggregated")
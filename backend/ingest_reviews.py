@@ -0,0 +1,29 @@
+import argparse
+
+import pandas as pd
+
+from app.services.ingestion import ingest_reviews, rebuild_store
+
+parser = argparse.ArgumentParser(
+    description="Append new reviews to trip_res_reviews.csv and update the per-restaurant aggregates.")
+parser.add_argument("csv", nargs="?", help="CSV of new reviews (needs Restaurant and Review columns)")
+parser.add_argument("--chunk-size", type=int, default=1000, help="rows scored per batch")
+parser.add_argument("--rebuild", action="store_true",
+                    help="score the whole existing review CSV into an empty store (one-off bootstrap)")
+args = parser.parse_args()
+
+if args.rebuild:
+    rebuild_store(chunk_size=args.chunk_size)
+    print("[✅] Rebuilt review store from trip_res_reviews.csv")
+elif args.csv:
+    totals = {"received": 0, "ingested": 0, "skipped": 0}
+    restaurants = set()
+    for chunk in pd.read_csv(args.csv, chunksize=args.chunk_size):
+        result = ingest_reviews(chunk)
+        for k in totals:
+            totals[k] += result[k]
+        restaurants.update(result["restaurants"])
+    print(f"[✅] Ingested {totals['ingested']} of {totals['received']} reviews "
+          f"({totals['skipped']} duplicates skipped) across {len(restaurants)} restaurants")
+else:
+    parser.error("pass a CSV of new reviews or --rebuild")
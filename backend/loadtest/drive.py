@@ -0,0 +1,111 @@
+# Load driver for /analyze and /compare
+# -------------------------------------------------------------------
+# Steps through increasing concurrency levels; at each level N worker
+# threads send back-to-back requests for --duration seconds. Reports
+# throughput, error rate and latency percentiles per level, and flags
+# the level where throughput stops scaling (the saturation point).
+#
+#   python -m loadtest.drive --target http://localhost:5000 \
+#       --fake http://localhost:8099 --concurrency 1,2,4,8,16 --duration 30
+# -------------------------------------------------------------------
+
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+
+def _payload(endpoint, place_ids, rng, bypass_cache=False):
+    if endpoint == "compare":
+        a, b = rng.sample(place_ids, 2)
+        payload = {"location_id1": a, "location_id2": b}
+    else:
+        payload = {"location_id": rng.choice(place_ids)}
+    if bypass_cache:
+        payload["bypass_cache"] = True
+    return payload
+
+
+def run_level(target, endpoint, place_ids, concurrency, duration, timeout, bypass_cache=False):
+    url = f"{target.rstrip('/')}/{endpoint}"
+    deadline = time.perf_counter() + duration
+    lock = threading.Lock()
+    latencies, statuses = [], {}
+
+    def worker(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                status = session.post(url, json=_payload(endpoint, place_ids, rng, bypass_cache), timeout=timeout).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - started
+
+    lat = np.array(latencies) if latencies else np.array([np.nan])
+    ok = statuses.get(200, 0)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / wall,
+        "ok_rps": ok / wall,
+        "error_rate": 1.0 - ok / max(1, len(latencies)),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "p50_sec": float(np.nanpercentile(lat, 50)),
+        "p90_sec": float(np.nanpercentile(lat, 90)),
+        "p99_sec": float(np.nanpercentile(lat, 99)),
+        "max_sec": float(np.nanmax(lat)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Step-load the review analysis API.")
+    parser.add_argument("--target", default="http://localhost:5000")
+    parser.add_argument("--endpoint", choices=["analyze", "compare"], default="analyze")
+    parser.add_argument("--fake", default="http://localhost:8099", help="fake_services URL (for place ids)")
+    parser.add_argument("--place-ids", help="comma-separated ids instead of asking --fake")
+    parser.add_argument("--concurrency", default="1,2,4,8,16")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per concurrency level")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--bypass-cache", action="store_true", help="measure full computation, not result-cache hits")
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    if args.place_ids:
+        place_ids = args.place_ids.split(",")
+    else:
+        place_ids = requests.get(f"{args.fake.rstrip('/')}/_fake/place_ids", timeout=10).json()
+
+    levels, best = [], 0.0
+    for c in [int(x) for x in args.concurrency.split(",") if x]:
+        row = run_level(args.target, args.endpoint, place_ids, c, args.duration, args.timeout, args.bypass_cache)
+        # saturated once extra concurrency buys < 5% more successful throughput
+        row["saturated"] = bool(levels) and row["ok_rps"] < best * 1.05
+        best = max(best, row["ok_rps"])
+        levels.append(row)
+        print(f"c={c:<4} {row['throughput_rps']:7.2f} req/s  ok={row['ok_rps']:7.2f}/s  "
+              f"err={row['error_rate']:.1%}  p50={row['p50_sec']:.2f}s p90={row['p90_sec']:.2f}s "
+              f"p99={row['p99_sec']:.2f}s max={row['max_sec']:.2f}s"
+              + ("  <- saturated" if row["saturated"] else ""))
+
+    with open(args.output, "w") as f:
+        json.dump({"target": args.target, "endpoint": args.endpoint, "levels": levels}, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
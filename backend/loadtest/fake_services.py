@@ -0,0 +1,128 @@
+# Local stand-ins for Google Places and the RapidAPI chat endpoint
+# -------------------------------------------------------------------
+# Google:   GET  /maps/api/place/details/json?placeid=fake-place-<n>
+#           -> name + up to 5 reviews of the n-th restaurant in
+#              trip_res_reviews.csv, shaped like gmaps.place()
+# RapidAPI: POST /chat  -> {"status": true, "result": "<json>"}
+# Helper:   GET  /_fake/place_ids -> ids the load driver can use
+#
+# Each service has a log-normal latency (median + sigma) and an error
+# rate. Run from backend/:
+#   python -m loadtest.fake_services --port 8099 --google-latency-ms 150 --llm-latency-ms 2500
+# then start the API with
+#   GOOGLE_PLACES_BASE_URL=http://localhost:8099 GOOGLE_MAPS_API_KEY=AIza-fake \
+#   RAPIDAPI_URL=http://localhost:8099/chat python run.py
+# -------------------------------------------------------------------
+
+import json
+import time
+import random
+import argparse
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+_RECOMMENDATION = json.dumps({
+    "title": "Fake recommendations",
+    "overall_aspect": "Generated by loadtest.fake_services",
+    "for_owners": [{"title": "Speed up service", "recommendation": "Add staff at peak hours", "priority": "High"}],
+    "for_customers": [{"title": "Try the biryani", "insights": "Most praised dish"}],
+})
+
+
+def load_places(csv_path, reviews_per_place):
+    df = pd.read_csv(csv_path).dropna(subset=["Restaurant", "Review"])
+    places = {}
+    for i, (name, group) in enumerate(df.groupby("Restaurant", sort=True)):
+        places[f"fake-place-{i}"] = {
+            "name": name,
+            "reviews": [{"text": t} for t in group["Review"].astype(str).head(reviews_per_place)],
+        }
+    return places
+
+
+class LatencyModel:
+    """Log-normal latency with the given median (ms) and sigma, plus an error rate."""
+
+    def __init__(self, median_ms, sigma, error_rate):
+        self.mu = np.log(max(median_ms, 0.001) / 1000.0)
+        self.sigma = sigma
+        self.error_rate = error_rate
+
+    def wait(self):
+        time.sleep(random.lognormvariate(self.mu, self.sigma) if self.sigma > 0 else np.exp(self.mu))
+        return random.random() >= self.error_rate
+
+
+def make_handler(places, google, llm):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/_fake/place_ids":
+                return self._send(200, sorted(places))
+            if url.path != "/maps/api/place/details/json":
+                return self._send(404, {"status": "NOT_FOUND"})
+            ok = google.wait()
+            if not ok:
+                # 200 + error status: googlemaps raises ApiError without retrying
+                return self._send(200, {"status": "UNKNOWN_ERROR", "error_message": "injected failure"})
+            query = parse_qs(url.query)
+            # googlemaps sends "placeid"; the REST docs use "place_id"
+            place = places.get((query.get("place_id") or query.get("placeid") or [""])[0])
+            if place is None:
+                return self._send(200, {"status": "NOT_FOUND"})
+            return self._send(200, {"status": "OK", "result": place})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            if not llm.wait():
+                return self._send(503, {"status": False, "message": "injected failure"})
+            return self._send(200, {"status": True, "result": _RECOMMENDATION})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Google Places + RapidAPI servers for load testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--csv", default="trip_res_reviews.csv")
+    parser.add_argument("--reviews-per-place", type=int, default=5, help="Google returns at most 5")
+    parser.add_argument("--google-latency-ms", type=float, default=150)
+    parser.add_argument("--google-sigma", type=float, default=0.4)
+    parser.add_argument("--google-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=2500)
+    parser.add_argument("--llm-sigma", type=float, default=0.6)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    places = load_places(args.csv, args.reviews_per_place)
+    handler = make_handler(
+        places,
+        LatencyModel(args.google_latency_ms, args.google_sigma, args.google_error_rate),
+        LatencyModel(args.llm_latency_ms, args.llm_sigma, args.llm_error_rate),
+    )
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    print(f"Fake services on http://{args.host}:{args.port} ({len(places)} places)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
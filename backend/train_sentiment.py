@@ -1,18 +1,44 @@
 import os
+import time
+import hashlib
+import argparse
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from transformers import (
     AutoTokenizer,
     AutoModelForSequenceClassification,
+    DataCollatorWithPadding,
     Trainer,
+    TrainerCallback,
     TrainingArguments
 )
 import torch
-from datasets import Dataset
+from datasets import Dataset, DatasetDict, load_from_disk
 
 
 DATA_PATH = "trip_res_reviews.csv"
 SAVE_DIR  = "models/bert_sentiment"
+BASE_MODEL = "distilbert-base-uncased"
+CACHE_DIR = ".cache/tokenized"
+
+parser = argparse.ArgumentParser(description="Fine-tune DistilBERT on the TripAdvisor reviews.")
+parser.add_argument("--padding", choices=["dynamic", "max_length"], default="dynamic",
+                    help="dynamic: pad per batch (fast on CPU); max_length: pad every example to --max-length")
+parser.add_argument("--max-length", type=int, default=128)
+parser.add_argument("--batch-size", type=int, default=16)
+parser.add_argument("--epochs", type=float, default=2)
+parser.add_argument("--no-group-by-length", action="store_true",
+                    help="disable length-grouped sampling of training batches")
+parser.add_argument("--workers", type=int, default=0, help="data-loader worker processes")
+parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+parser.add_argument("--interop-threads", type=int, default=None, help="torch inter-op threads")
+parser.add_argument("--no-cache", action="store_true", help="re-tokenise even if a cached dataset exists")
+args = parser.parse_args()
+
+if args.threads:
+    torch.set_num_threads(args.threads)
+if args.interop_threads:
+    torch.set_num_interop_threads(args.interop_threads)
 
 assert os.path.exists(DATA_PATH), f"CSV not found at {DATA_PATH}"
 df = pd.read_csv(DATA_PATH).dropna(subset=["Review", "Rating"]).copy()
@@ -32,33 +58,56 @@ label2id = {"neg":0, "neu":1, "pos":2}
 id2label = {v:k for k,v in label2id.items()}
 df["label_id"] = df["label"].map(label2id)
 
-train_texts, val_texts, train_labels, val_labels = train_test_split(
-    df["Review"].tolist(),
-    df["label_id"].tolist(),
-    test_size=0.2,
-    stratify=df["label_id"],
-    random_state=42
-)
 
+# 2) Tokenization (cached on disk, keyed by CSV contents + tokenizer + padding settings)
+tok = AutoTokenizer.from_pretrained(BASE_MODEL)
 
-# 2) Tokenization
-tok = AutoTokenizer.from_pretrained("distilbert-base-uncased")
+def dataset_cache_key():
+    h = hashlib.sha256()
+    with open(DATA_PATH, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    h.update(f"{BASE_MODEL}|{type(tok).__name__}|{len(tok)}".encode())
+    h.update(f"{args.padding}|{args.max_length}|split=0.2/42".encode())
+    return h.hexdigest()[:16]
 
-train_ds = Dataset.from_dict({"text": train_texts, "label": train_labels})
-val_ds   = Dataset.from_dict({"text": val_texts, "label": val_labels})
+cache_path = os.path.join(CACHE_DIR, dataset_cache_key())
 
 def tokenize(batch):
-    return tok(batch["text"], padding="max_length", truncation=True, max_length=128)
-
-train_ds = train_ds.map(tokenize, batched=True)
-val_ds   = val_ds.map(tokenize, batched=True)
-
-train_ds.set_format("torch", columns=["input_ids", "attention_mask", "label"])
-val_ds.set_format("torch", columns=["input_ids", "attention_mask", "label"])
+    if args.padding == "max_length":
+        enc = tok(batch["text"], padding="max_length", truncation=True, max_length=args.max_length)
+    else:
+        # no padding here: DataCollatorWithPadding pads each batch to its longest member
+        enc = tok(batch["text"], truncation=True, max_length=args.max_length)
+    enc["length"] = [sum(m) for m in enc["attention_mask"]]
+    return enc
+
+if not args.no_cache and os.path.isdir(cache_path):
+    ds = load_from_disk(cache_path)
+    print(f"[cache] loaded tokenised dataset from {cache_path}")
+else:
+    train_texts, val_texts, train_labels, val_labels = train_test_split(
+        df["Review"].tolist(),
+        df["label_id"].tolist(),
+        test_size=0.2,
+        stratify=df["label_id"],
+        random_state=42
+    )
+    ds = DatasetDict({
+        "train": Dataset.from_dict({"text": train_texts, "label": train_labels}),
+        "validation": Dataset.from_dict({"text": val_texts, "label": val_labels}),
+    })
+    ds = ds.map(tokenize, batched=True, remove_columns=["text"])
+    ds.save_to_disk(cache_path)
+    print(f"[cache] saved tokenised dataset to {cache_path}")
+
+columns = ["input_ids", "attention_mask", "label", "length"]
+ds.set_format("torch", columns=columns)
+train_ds, val_ds = ds["train"], ds["validation"]
 
 # 3) Model
 model = AutoModelForSequenceClassification.from_pretrained(
-    "distilbert-base-uncased",
+    BASE_MODEL,
     num_labels=3,
     id2label=id2label,
     label2id=label2id
@@ -70,15 +119,18 @@ training_args = TrainingArguments(
     evaluation_strategy="epoch",
     save_strategy="epoch",
     learning_rate=2e-5,
-    per_device_train_batch_size=16,
-    per_device_eval_batch_size=16,
-    num_train_epochs=2,
+    per_device_train_batch_size=args.batch_size,
+    per_device_eval_batch_size=args.batch_size,
+    num_train_epochs=args.epochs,
     weight_decay=0.01,
     logging_dir="./logs",
     logging_steps=50,
     save_total_limit=1,
     load_best_model_at_end=True,
     metric_for_best_model="accuracy",
+    group_by_length=not args.no_group_by_length,
+    length_column_name="length",
+    dataloader_num_workers=args.workers,
 )
 
 def compute_metrics(eval_pred):
@@ -89,15 +141,30 @@ def compute_metrics(eval_pred):
     f1m = f1_score(labels, preds, average="macro")
     return {"accuracy": acc, "macro_f1": f1m}
 
+class EpochTimer(TrainerCallback):
+    """Prints wall time and training throughput for every epoch."""
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self._t0 = time.perf_counter()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        elapsed = time.perf_counter() - self._t0
+        print(f"[epoch {state.epoch:.0f}] {elapsed:.1f}s, "
+              f"{len(train_ds) / max(elapsed, 1e-9):.1f} samples/sec")
+
 trainer = Trainer(
     model=model,
     args=training_args,
     train_dataset=train_ds,
     eval_dataset=val_ds,
     tokenizer=tok,
+    data_collator=DataCollatorWithPadding(tok),
     compute_metrics=compute_metrics,
+    callbacks=[EpochTimer()],
 )
 
+print(f"[setup] padding={args.padding}, group_by_length={not args.no_group_by_length}, "
+      f"workers={args.workers}, torch threads={torch.get_num_threads()}")
 trainer.train()
 
 # 5) Save model